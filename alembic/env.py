@@ -16,8 +16,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 # Import your models here
 from app.models.base import Base
-from app.models.events import Event, EventTicketPool
-from app.models.tickets import Ticket
+from app.models.events import Event, EventTicketPool, InventoryLedgerEntry
+from app.models.tickets import Ticket, TicketPoolAllocation
+from app.models.holdings import UserEventHolding
+from app.models.idempotency import IdempotencyKey
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,56 @@
+"""Materialized per-user ticket holdings for quota checks
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '002'
+down_revision: Union[str, None] = '001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_event_holdings',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'event_id', name='uq_user_event_holdings_user_id_event_id')
+    )
+
+    # Backfill from the tickets that currently count against the quota
+    tickets = sa.table('tickets',
+        sa.column('user_id', sa.Integer()),
+        sa.column('event_id', sa.Integer()),
+        sa.column('count', sa.Integer()),
+        sa.column('status', sa.String())
+    )
+    holdings = sa.table('user_event_holdings',
+        sa.column('created_at', sa.DateTime(timezone=True)),
+        sa.column('user_id', sa.Integer()),
+        sa.column('event_id', sa.Integer()),
+        sa.column('ticket_count', sa.Integer())
+    )
+    op.execute(holdings.insert().from_select(
+        ['created_at', 'user_id', 'event_id', 'ticket_count'],
+        sa.select(sa.func.current_timestamp(), tickets.c.user_id, tickets.c.event_id, sa.func.sum(tickets.c.count))
+        .where(tickets.c.status.in_(['booked', 'pending']))
+        .group_by(tickets.c.user_id, tickets.c.event_id)
+    ))
+
+
+def downgrade() -> None:
+    op.drop_table('user_event_holdings')
@@ -0,0 +1,40 @@
+"""Pools each ticket was booked from
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '003'
+down_revision: Union[str, None] = '002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Tickets booked before this revision have no allocations; cancelling
+    # them returns the seats to the event's first pool.
+    op.create_table('ticket_pool_allocations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('pool_id', sa.Integer(), nullable=True),
+    sa.Column('ticket_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ticket_id'], ['tickets.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['pool_id'], ['event_ticket_pools.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ticket_pool_allocations_ticket_id'), 'ticket_pool_allocations', ['ticket_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ticket_pool_allocations_ticket_id'), table_name='ticket_pool_allocations')
+    op.drop_table('ticket_pool_allocations')
@@ -0,0 +1,28 @@
+"""Expiry time of pending tickets (holds)
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '004'
+down_revision: Union[str, None] = '003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tickets', sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_tickets_status_expires_at', 'tickets', ['status', 'expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tickets_status_expires_at', table_name='tickets')
+    op.drop_column('tickets', 'expires_at')
@@ -0,0 +1,28 @@
+"""Composite index for ticket listing and the quota check
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '005'
+down_revision: Union[str, None] = '004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # InnoDB appends the primary key to the index, so pages filtered by
+    # event (and status) come back in id order without a sort. Unfiltered
+    # pages keep using ix_tickets_user_id, which is (user_id, id) the same way.
+    op.create_index('ix_tickets_user_id_event_id_status', 'tickets', ['user_id', 'event_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tickets_user_id_event_id_status', table_name='tickets')
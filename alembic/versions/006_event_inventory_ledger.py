@@ -0,0 +1,39 @@
+"""Append-only seat ledger for INVENTORY_BACKEND=ledger
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rows only live until the compactor folds them into event_ticket_pools,
+    # so the table stays small; (event_id, delta) serves the per-event SUM
+    # from the index alone.
+    op.create_table('event_inventory_ledger',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_event_inventory_ledger_event_id_delta', 'event_inventory_ledger', ['event_id', 'delta'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_inventory_ledger_event_id_delta', table_name='event_inventory_ledger')
+    op.drop_table('event_inventory_ledger')
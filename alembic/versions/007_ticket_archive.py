@@ -0,0 +1,97 @@
+"""Archive tables for finished events, optional range partitioning of tickets
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-18
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# TICKETS_PARTITION_SIZE=N partitions `tickets` by RANGE (id), N ids per
+# partition, with FUTURE_PARTITIONS empty ones ahead of the current ids and
+# p_max catching the rest. 0 leaves the table as it is.
+TICKETS_PARTITION_SIZE = int(os.getenv("TICKETS_PARTITION_SIZE", "0"))
+FUTURE_PARTITIONS = 4
+
+
+def upgrade() -> None:
+    op.create_index('ix_events_event_time', 'events', ['event_time'], unique=False)
+
+    op.create_table('tickets_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('status', sa.Enum('booked', 'cancelled', 'pending', name='ticketstatus'), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('archived_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table('event_ticket_pools_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('event_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_count', sa.Integer(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_event_ticket_pools_archive_event_id'), 'event_ticket_pools_archive', ['event_id'], unique=False)
+
+    if TICKETS_PARTITION_SIZE > 0 and op.get_bind().dialect.name == 'mysql':
+        _partition_tickets(TICKETS_PARTITION_SIZE)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'mysql' and _is_partitioned(bind):
+        op.execute('ALTER TABLE tickets REMOVE PARTITIONING')
+        op.create_foreign_key(None, 'tickets', 'events', ['event_id'], ['id'])
+        op.create_foreign_key(None, 'ticket_pool_allocations', 'tickets', ['ticket_id'], ['id'], ondelete='CASCADE')
+
+    op.drop_index(op.f('ix_event_ticket_pools_archive_event_id'), table_name='event_ticket_pools_archive')
+    op.drop_table('event_ticket_pools_archive')
+    op.drop_table('tickets_archive')
+    op.drop_index('ix_events_event_time', table_name='events')
+
+
+def _partition_tickets(partition_size: int):
+    # InnoDB can't partition a table with foreign keys or one that foreign
+    # keys point at, so tickets.event_id and ticket_pool_allocations.ticket_id
+    # lose theirs; the archiver deletes allocations itself. The table is
+    # rebuilt, so run this in a maintenance window on a large one.
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for table in ('tickets', 'ticket_pool_allocations'):
+        for foreign_key in inspector.get_foreign_keys(table):
+            if table == 'tickets' or foreign_key['referred_table'] == 'tickets':
+                op.drop_constraint(foreign_key['name'], table, type_='foreignkey')
+
+    max_id = bind.execute(sa.text('SELECT COALESCE(MAX(id), 0) FROM tickets')).scalar()
+    bounds = range(partition_size, max_id + partition_size * (FUTURE_PARTITIONS + 1), partition_size)
+    partitions = [f'PARTITION p{number} VALUES LESS THAN ({bound})' for number, bound in enumerate(bounds)]
+    partitions.append('PARTITION p_max VALUES LESS THAN MAXVALUE')
+
+    op.execute(f'ALTER TABLE tickets PARTITION BY RANGE (id) ({", ".join(partitions)})')
+
+
+def _is_partitioned(bind):
+    return bind.execute(sa.text(
+        "SELECT COUNT(*) FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'tickets' AND PARTITION_NAME IS NOT NULL"
+    )).scalar() > 0
@@ -0,0 +1,67 @@
+"""Partition the seat ledger by pool
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '009'
+down_revision: Union[str, None] = '008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Each entry now belongs to one pool, so bookings of an event only
+    # serialize per pool. Entries written before were taken from the event as
+    # a whole; they are folded into the pools here, as the compactor used to
+    # (taken seats out of the fullest pools, returned ones into the emptiest),
+    # which leaves the table empty for the new column.
+    _fold_event_entries(op.get_bind())
+    op.add_column('event_inventory_ledger', sa.Column('pool_id', sa.Integer(), nullable=False))
+    op.create_foreign_key('fk_event_inventory_ledger_pool_id', 'event_inventory_ledger', 'event_ticket_pools',
+                          ['pool_id'], ['id'], ondelete='CASCADE')
+    # (pool_id, delta) serves a pool's SUM from the index alone, as
+    # (event_id, delta) does the event's.
+    op.create_index('ix_event_inventory_ledger_pool_id_delta', 'event_inventory_ledger', ['pool_id', 'delta'], unique=False)
+
+
+def _fold_event_entries(bind):
+    ledger = sa.table('event_inventory_ledger', sa.column('event_id', sa.Integer()), sa.column('delta', sa.Integer()))
+    pools = sa.table('event_ticket_pools',
+                     sa.column('id', sa.Integer()), sa.column('event_id', sa.Integer()), sa.column('ticket_count', sa.Integer()))
+
+    deltas = bind.execute(sa.select(ledger.c.event_id, sa.func.sum(ledger.c.delta)).group_by(ledger.c.event_id)).all()
+    for event_id, delta in deltas:
+        counts = dict(bind.execute(sa.select(pools.c.id, pools.c.ticket_count).where(pools.c.event_id == event_id)).all())
+        # An event without pools has nothing to fold into.
+        if not counts or not delta:
+            continue
+
+        if delta > 0:
+            pool_id = min(counts, key=counts.get)
+            counts[pool_id] += delta
+        else:
+            needed = -delta
+            for pool_id in sorted(counts, key=counts.get, reverse=True):
+                taken = min(max(counts[pool_id], 0), needed)
+                counts[pool_id] -= taken
+                needed -= taken
+
+        for pool_id, ticket_count in counts.items():
+            bind.execute(pools.update().where(pools.c.id == pool_id).values(ticket_count=max(ticket_count, 0)))
+
+    bind.execute(ledger.delete())
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_inventory_ledger_pool_id_delta', table_name='event_inventory_ledger')
+    op.drop_constraint('fk_event_inventory_ledger_pool_id', 'event_inventory_ledger', type_='foreignkey')
+    op.drop_column('event_inventory_ledger', 'pool_id')
@@ -0,0 +1,35 @@
+"""Covering index for the ticket listing
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010'
+down_revision: Union[str, None] = '009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (user_id, event_id, status) from 005 only narrowed the rows: pages
+    # still read every ticket back from the table for amount, count and
+    # expires_at, and sorted them unless both filters were given. With id
+    # second, a page is a backward range scan in id order from the cursor,
+    # and the remaining columns let the event and status filters and the
+    # selected columns come from the index alone. The quota count reads the
+    # same index by its user_id prefix.
+    op.create_index('ix_tickets_user_id_listing', 'tickets',
+                    ['user_id', 'id', 'event_id', 'status', 'count', 'amount', 'expires_at'], unique=False)
+    op.drop_index('ix_tickets_user_id_event_id_status', table_name='tickets')
+
+
+def downgrade() -> None:
+    op.create_index('ix_tickets_user_id_event_id_status', 'tickets', ['user_id', 'event_id', 'status'], unique=False)
+    op.drop_index('ix_tickets_user_id_listing', table_name='tickets')
@@ -1,34 +1,95 @@
 
 
 
-from fastapi import APIRouter, Header, Depends
+from fastapi import APIRouter, Header, Depends, Response
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_db
+from app.core.config import AVAILABILITY_MAX_AGE_SECONDS
+from app.core.db import get_db, get_async_db, get_read_db, get_async_read_db, record_write, DB_MODE
+from app.core.utils import call_service
 from app.repositories.events import EventRepository
+from app.core.responses import ORJSONResponse, success_response
 from app.schemas.response import ApiSuccessResponse
-from app.schemas.events import EventSuccessResponse, EventCreate
+from app.schemas.events import (
+    EventSuccessResponse,
+    EventCreate,
+    EventPoolLayoutResponse,
+    EventAvailabilityResponse,
+    EventBatchCreate,
+    EventBatchResponse,
+)
 from app.services.events import EventService
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
-def get_event_service(db:Session = Depends(get_db)):
-    repo = EventRepository(db)
+def get_event_service(db:Session = Depends(get_db), read_db: Session = Depends(get_read_db)):
+    repo = EventRepository(db, read_db)
     return EventService(repo)
 
+
+def get_async_event_service(db: AsyncSession = Depends(get_async_db),
+                            read_db: AsyncSession = Depends(get_async_read_db)):
+    repo = EventRepository(db, read_db)
+    return EventService(repo)
+
+
+event_service = get_async_event_service if DB_MODE == "async" else get_event_service
+
 @router.post("/events", response_model=ApiSuccessResponse[EventSuccessResponse])
 async def create_event(
         event_data: EventCreate,
         owner_id: int = Header(..., alias="X-User-Id"),
-        service: EventService = Depends(get_event_service)
+        service: EventService = Depends(event_service)
 
 ):
-    response = service.create_event(event_data, owner_id)
+    response = await call_service(service.create_event, event_data, owner_id)
+    record_write(owner_id)
 
-    return ApiSuccessResponse(message="Event Created successfully",
-                              data=response)
+    return success_response("Event Created successfully", response)
+
+
+@router.post("/events/batch", response_model=ApiSuccessResponse[EventBatchResponse])
+async def create_events_batch(
+        batch: EventBatchCreate,
+        owner_id: int = Header(..., alias="X-User-Id"),
+        service: EventService = Depends(event_service)
+):
+    response = await call_service(service.create_events_batch, batch, owner_id)
+    record_write(owner_id)
+
+    return success_response("Event batch processed", response)
+
+
+@router.get("/events/{event_id}/pools", response_model=ApiSuccessResponse[EventPoolLayoutResponse])
+async def get_event_pools(
+        event_id: int,
+        service: EventService = Depends(event_service)
+):
+    response = await call_service(service.get_pool_layout, event_id)
+
+    return success_response("Event pool layout fetched successfully", response)
+
+
+@router.get("/events/{event_id}/availability", response_model=ApiSuccessResponse[EventAvailabilityResponse])
+async def get_event_availability(
+        event_id: int,
+        if_none_match: str | None = Header(None, alias="If-None-Match"),
+        service: EventService = Depends(event_service)
+):
+    availability = await call_service(service.get_availability, event_id)
 
+    # The body is fully determined by these two values.
+    etag = f'"{event_id}-{availability.tickets_remaining}"'
+    headers = {"ETag": etag, "Cache-Control": f"max-age={AVAILABILITY_MAX_AGE_SECONDS}"}
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
 
+    return success_response("Event availability fetched successfully", availability, headers=headers)
 
 
+def _etag_matches(if_none_match: str, etag: str):
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
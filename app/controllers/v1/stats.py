@@ -0,0 +1,31 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from app.core.db import pool_stats, worker_stats
+from app.core.responses import ORJSONResponse, success_response
+from app.schemas.response import ApiSuccessResponse
+from app.services.admission import booking_admission
+from app.services.archival import ticket_archiver
+from app.services.event_cache import event_cache
+from app.services.idempotency import idempotency_store
+from app.services.inventory import ledger_compactor
+from app.services.warmup import warmup
+
+router = APIRouter(default_response_class=ORJSONResponse)
+
+
+@router.get("/stats", response_model=ApiSuccessResponse[Dict[str, Any]])
+async def get_stats():
+    stats = {
+        "event_cache": event_cache.stats(),
+        "idempotency": idempotency_store.stats(),
+        "admission": booking_admission.stats() if booking_admission is not None else None,
+        "archive": ticket_archiver.stats() if ticket_archiver is not None else None,
+        "ledger": ledger_compactor.stats() if ledger_compactor is not None else None,
+        "db_pools": pool_stats(),
+        "warmup": warmup.stats(),
+        "worker": worker_stats()
+    }
+
+    return success_response("Stats fetched successfully", stats)
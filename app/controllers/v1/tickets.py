@@ -1,49 +1,185 @@
 
 
 
-from fastapi import APIRouter, Header, Depends
+from fastapi import APIRouter, Header, Depends, Query
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_db
-from app.repositories.events import EventRepository
+from app.core.config import TICKET_PAGE_DEFAULT_SIZE, TICKET_PAGE_MAX_SIZE
+from app.core.db import get_db, get_async_db, get_read_db, get_async_read_db, record_write, DB_MODE
+from app.core.utils import call_service
+from app.models.tickets import TicketStatus
 from app.repositories.tickets import TicketRepository
+from app.core.responses import ORJSONResponse, success_response
 from app.schemas.response import ApiSuccessResponse
-from app.schemas.tickets import TicketCreate, TicketCreateResponse, TicketCancelledResponse
+from app.schemas.tickets import (
+    TicketCreate,
+    TicketCreateResponse,
+    TicketHoldResponse,
+    TicketListResponse,
+    TicketCancelledResponse,
+    TicketBatchCreate,
+    TicketBatchResponse,
+)
 
-from app.services.tickets import TicketService
+from app.services.admission import booking_admission
+from app.services.idempotency import idempotency_store
+from app.services.tickets import TicketService, booking_coalescer
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
 
 
-def get_ticket_service(db:Session = Depends(get_db)):
-    repo = TicketRepository(db)
+def get_ticket_service(db:Session = Depends(get_db), read_db: Session = Depends(get_read_db)):
+    repo = TicketRepository(db, read_db)
     return TicketService(repo)
 
+
+def get_async_ticket_service(db: AsyncSession = Depends(get_async_db),
+                             read_db: AsyncSession = Depends(get_async_read_db)):
+    repo = TicketRepository(db, read_db)
+    return TicketService(repo, coalescer=booking_coalescer)
+
+
+ticket_service = get_async_ticket_service if DB_MODE == "async" else get_ticket_service
+
+
+async def run_admitted(event_id: int, call):
+    # Runs inside the idempotent call, so a retry whose outcome is replayed
+    # is never shed. The request's DB session only connects on its first
+    # query, so a shed request still never takes a connection.
+    if booking_admission is None:
+        return await call()
+
+    booking_admission.admit(event_id)
+    try:
+        return await call()
+    finally:
+        booking_admission.release(event_id)
+
+
+async def admit_batch(batch: TicketBatchCreate):
+    if booking_admission is None:
+        yield
+        return
+
+    # One admission per event of the group, released again if a later one
+    # is shed.
+    admitted = []
+    try:
+        for event_id in sorted({entry.event_id for entry in batch.bookings}):
+            booking_admission.admit(event_id)
+            admitted.append(event_id)
+        yield
+    finally:
+        for event_id in admitted:
+            booking_admission.release(event_id)
+
+
+async def run_idempotent(idempotency_key: str | None, user_id: int, fingerprint, message: str, call):
+    # The rendered response is the outcome: a retry gets it back byte for
+    # byte, from this worker or, with shared keys, from any other.
+    async def respond():
+        return success_response(message, await call())
+
+    if idempotency_key is None:
+        return await respond()
+    return await idempotency_store.run((user_id, idempotency_key), fingerprint, respond)
+
+
 @router.post("/tickets", response_model=ApiSuccessResponse[TicketCreateResponse])
 async def book_ticket(
         ticket_data: TicketCreate,
         user_id: int = Header(..., alias="X-User-Id"),
-        service: TicketService = Depends(get_ticket_service)
+        idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+        service: TicketService = Depends(ticket_service)
+
+):
+    response = await run_idempotent(
+        idempotency_key, user_id, ("book", ticket_data.event_id, ticket_data.ticket_count),
+        "Ticket booked successfully",
+        lambda: run_admitted(ticket_data.event_id, lambda: call_service(service.book_ticket, ticket_data, user_id))
+    )
+    record_write(user_id)
+
+    return response
+
+
+@router.get("/tickets", response_model=ApiSuccessResponse[TicketListResponse])
+async def list_tickets(
+        user_id: int = Header(..., alias="X-User-Id"),
+        cursor: int | None = Query(None, gt=0),
+        limit: int = Query(TICKET_PAGE_DEFAULT_SIZE, ge=1, le=TICKET_PAGE_MAX_SIZE),
+        event_id: int | None = Query(None),
+        status: TicketStatus | None = Query(None),
+        service: TicketService = Depends(ticket_service)
+):
+    response = await call_service(service.list_tickets, user_id, limit, cursor, event_id, status)
+
+    return success_response("Tickets fetched successfully", response)
+
+
+@router.post("/tickets/holds", response_model=ApiSuccessResponse[TicketHoldResponse])
+async def hold_ticket(
+        ticket_data: TicketCreate,
+        user_id: int = Header(..., alias="X-User-Id"),
+        idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+        service: TicketService = Depends(ticket_service)
+):
+    response = await run_idempotent(
+        idempotency_key, user_id, ("hold", ticket_data.event_id, ticket_data.ticket_count),
+        "Ticket held successfully",
+        lambda: run_admitted(ticket_data.event_id, lambda: call_service(service.hold_ticket, ticket_data, user_id))
+    )
+    record_write(user_id)
+
+    return response
+
+
+@router.post("/tickets/{ticket_id}/confirm", response_model=ApiSuccessResponse[TicketCreateResponse])
+async def confirm_ticket(
+        ticket_id: int,
+        user_id: int = Header(..., alias="X-User-Id"),
+        idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+        service: TicketService = Depends(ticket_service)
+):
+    response = await run_idempotent(
+        idempotency_key, user_id, ("confirm", ticket_id), "Ticket confirmed successfully",
+        lambda: call_service(service.confirm_ticket, ticket_id, user_id)
+    )
+    record_write(user_id)
+
+    return response
+
 
+@router.post("/tickets/batch", response_model=ApiSuccessResponse[TicketBatchResponse])
+async def book_tickets_batch(
+        batch: TicketBatchCreate,
+        user_id: int = Header(..., alias="X-User-Id"),
+        _: None = Depends(admit_batch),
+        service: TicketService = Depends(ticket_service)
 ):
-    response = service.book_ticket(ticket_data, user_id)
+    response = await call_service(service.book_tickets_batch, batch, user_id)
+    for result in response.results:
+        if result.success:
+            record_write(batch.bookings[result.index].user_id)
 
-    return ApiSuccessResponse(message="Ticket booked successfully",
-                              data=response)
+    return success_response("Ticket batch processed", response)
 
 
 @router.delete("/tickets/{ticket_id}", response_model=ApiSuccessResponse[TicketCancelledResponse])
 async def cancel_ticket(
         ticket_id: int,
         user_id: int = Header(..., alias="X-User-Id"),
-        service: TicketService = Depends(get_ticket_service)
+        idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+        service: TicketService = Depends(ticket_service)
 ):
-    response = service.cancel_ticket(ticket_id, user_id)
-    
-    return ApiSuccessResponse(
-        message="Ticket cancelled successfully",
-        data=response
+    response = await run_idempotent(
+        idempotency_key, user_id, ("cancel", ticket_id), "Ticket cancelled successfully",
+        lambda: call_service(service.cancel_ticket, ticket_id, user_id)
     )
+    record_write(user_id)
+
+    return response
 
 
 
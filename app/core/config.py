@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import tempfile
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# "async" serves the API through AsyncSession/aiomysql, "sync" keeps the
+# original blocking Session/pymysql path so both can be benchmarked.
+DB_MODE = os.getenv("DB_MODE", "async").lower()
+
+# Connection pool of every engine. DB_POOL_RECYCLE closes connections older
+# than that many seconds (-1 keeps them), below MySQL's wait_timeout.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# `python -m app.serve` runs API_WORKERS uvicorn worker processes. With
+# DB_CONNECTION_BUDGET set, the connections all workers may open to a
+# database are split evenly between them: BACKGROUND_DB_CONNECTIONS of each
+# share go to the engine of the other DB_MODE (the background jobs' engine
+# in async mode), the rest to the engine serving requests. 0 keeps
+# DB_POOL_SIZE + DB_MAX_OVERFLOW per engine and worker.
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = max(int(os.getenv("API_WORKERS", "1")), 1)
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "0"))
+BACKGROUND_DB_CONNECTIONS = int(os.getenv("BACKGROUND_DB_CONNECTIONS", "2"))
+
+# Start-up warm-up, reported by GET /ready: DB_POOL_WARMUP_CONNECTIONS
+# connections per engine are opened ahead of the first requests and the
+# metadata of up to WARMUP_MAX_EVENTS events starting within
+# WARMUP_EVENT_WINDOW_HOURS is loaded into the event cache. A failed attempt
+# is retried every WARMUP_RETRY_SECONDS.
+DB_POOL_WARMUP_CONNECTIONS = int(os.getenv("DB_POOL_WARMUP_CONNECTIONS", "5"))
+WARMUP_EVENT_WINDOW_HOURS = float(os.getenv("WARMUP_EVENT_WINDOW_HOURS", "24"))
+WARMUP_MAX_EVENTS = int(os.getenv("WARMUP_MAX_EVENTS", "5000"))
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+# Optional read replica (REPLICA_DATABASE_URL or DB_REPLICA_HOST) for the
+# read-only lookups. Users who wrote within READ_YOUR_WRITES_SECONDS, and
+# requests sent with "X-Read-Your-Writes: true", keep reading the primary.
+REPLICA_POOL_SIZE = int(os.getenv("REPLICA_POOL_SIZE", str(DB_POOL_SIZE)))
+REPLICA_MAX_OVERFLOW = int(os.getenv("REPLICA_MAX_OVERFLOW", str(DB_MAX_OVERFLOW)))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_MAX_USERS = int(os.getenv("READ_YOUR_WRITES_MAX_USERS", "100000"))
+
+# "pooled" commits every pool decrement on its own and compensates on failure,
+# "transactional" runs quota check, pool decrements and ticket insert as one
+# transaction with a single commit.
+BOOKING_MODE = os.getenv("BOOKING_MODE", "pooled").lower()
+
+# "sql" decrements event_ticket_pools rows on every booking, "memory" keeps the
+# pool counts in process memory and writes them back in the background.
+# The memory backend assumes a single API process. "ledger" only appends
+# signed seat counts to event_inventory_ledger; every
+# LEDGER_COMPACT_INTERVAL_SECONDS up to LEDGER_COMPACT_BATCH_SIZE entries per
+# transaction are folded into the pool rows.
+INVENTORY_BACKEND = os.getenv("INVENTORY_BACKEND", "sql").lower()
+if INVENTORY_BACKEND == "memory" and API_WORKERS > 1:
+    raise RuntimeError("INVENTORY_BACKEND=memory keeps seat counts in one process and can't run with API_WORKERS > 1")
+INVENTORY_FLUSH_INTERVAL_SECONDS = float(os.getenv("INVENTORY_FLUSH_INTERVAL_SECONDS", "0.5"))
+LEDGER_COMPACT_INTERVAL_SECONDS = float(os.getenv("LEDGER_COMPACT_INTERVAL_SECONDS", "1"))
+LEDGER_COMPACT_BATCH_SIZE = int(os.getenv("LEDGER_COMPACT_BATCH_SIZE", "5000"))
+
+# Per-process index of pools with stock for each event; entries are
+# revalidated against the DB after the TTL. A TTL of 0 disables the index.
+AVAILABILITY_INDEX_TTL_SECONDS = float(os.getenv("AVAILABILITY_INDEX_TTL_SECONDS", "5"))
+AVAILABILITY_INDEX_MAX_EVENTS = int(os.getenv("AVAILABILITY_INDEX_MAX_EVENTS", "10000"))
+
+# GET /events/{id}/availability: remaining seats per event are cached for
+# AVAILABILITY_COUNT_TTL_SECONDS and adjusted by this process's bookings in
+# between. Above AVAILABILITY_APPROXIMATE_ABOVE seats the count is rounded
+# down to a multiple of AVAILABILITY_APPROXIMATE_STEP and marked approximate.
+AVAILABILITY_COUNT_TTL_SECONDS = float(os.getenv("AVAILABILITY_COUNT_TTL_SECONDS", "5"))
+AVAILABILITY_APPROXIMATE_ABOVE = int(os.getenv("AVAILABILITY_APPROXIMATE_ABOVE", "1000"))
+AVAILABILITY_APPROXIMATE_STEP = int(os.getenv("AVAILABILITY_APPROXIMATE_STEP", "100"))
+AVAILABILITY_MAX_AGE_SECONDS = int(os.getenv("AVAILABILITY_MAX_AGE_SECONDS", "1"))
+
+# How a booking picks the pools it tries: "index" samples from the per-event
+# pool id array kept in the availability index, "probe" reads a few non-empty
+# pools from a random point of the event's pool id range on every booking.
+POOL_SELECTION_STRATEGY = os.getenv("POOL_SELECTION_STRATEGY", "index").lower()
+POOL_SAMPLE_SIZE = int(os.getenv("POOL_SAMPLE_SIZE", "8"))
+
+# Tickets per pool row when an event is created.
+POOL_BATCH_SIZE = int(os.getenv("POOL_BATCH_SIZE", "1000"))
+
+# Background re-sharding of event_ticket_pools: pools of events booked faster
+# than POOL_TARGET_BOOKINGS_PER_SECOND per pool are split, pools holding fewer
+# than POOL_MERGE_BELOW_TICKETS seats are merged and empty pools dropped.
+POOL_RESHARDING_ENABLED = os.getenv("POOL_RESHARDING_ENABLED", "false").lower() == "true"
+POOL_RESHARD_INTERVAL_SECONDS = float(os.getenv("POOL_RESHARD_INTERVAL_SECONDS", "10"))
+POOL_TARGET_BOOKINGS_PER_SECOND = float(os.getenv("POOL_TARGET_BOOKINGS_PER_SECOND", "20"))
+POOL_MERGE_BELOW_TICKETS = int(os.getenv("POOL_MERGE_BELOW_TICKETS", "5"))
+POOL_MIN_SPLIT_TICKETS = int(os.getenv("POOL_MIN_SPLIT_TICKETS", "20"))
+POOL_MAX_PER_EVENT = int(os.getenv("POOL_MAX_PER_EVENT", "2000"))
+
+# Bulk event creation: items per request and items validated and inserted
+# per transaction.
+EVENT_BATCH_MAX_ITEMS = int(os.getenv("EVENT_BATCH_MAX_ITEMS", "5000"))
+EVENT_BATCH_CHUNK_SIZE = int(os.getenv("EVENT_BATCH_CHUNK_SIZE", "500"))
+
+# Group booking: entries per request, all booked in one transaction.
+TICKET_BATCH_MAX_ITEMS = int(os.getenv("TICKET_BATCH_MAX_ITEMS", "1000"))
+
+# GET /tickets page size: TICKET_PAGE_DEFAULT_SIZE unless ?limit= asks for
+# another size up to TICKET_PAGE_MAX_SIZE.
+TICKET_PAGE_DEFAULT_SIZE = int(os.getenv("TICKET_PAGE_DEFAULT_SIZE", "20"))
+TICKET_PAGE_MAX_SIZE = int(os.getenv("TICKET_PAGE_MAX_SIZE", "100"))
+
+# Opt-in group commit for the async path: single bookings of one event that
+# arrive within BOOKING_COALESCE_WINDOW_MS are booked together as one batch,
+# flushed early once BOOKING_COALESCE_MAX_BATCH bookings are waiting.
+BOOKING_COALESCE_ENABLED = os.getenv("BOOKING_COALESCE_ENABLED", "false").lower() == "true"
+BOOKING_COALESCE_WINDOW_MS = float(os.getenv("BOOKING_COALESCE_WINDOW_MS", "2"))
+BOOKING_COALESCE_MAX_BATCH = min(int(os.getenv("BOOKING_COALESCE_MAX_BATCH", "200")), TICKET_BATCH_MAX_ITEMS)
+
+# Event price/time/pool id range cache shared by the worker processes of one
+# host through an mmap of EVENT_CACHE_PATH (empty keeps it per process).
+# Unknown event ids are cached for EVENT_CACHE_NEGATIVE_TTL_SECONDS. The
+# default file is named after the database, so apps on other databases
+# never share it, and is cleared when the app starts.
+_EVENT_CACHE_DATABASE = os.getenv("DATABASE_URL") or f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+EVENT_CACHE_PATH = os.getenv("EVENT_CACHE_PATH", os.path.join(
+    tempfile.gettempdir(),
+    f"ticketing-event-cache-{hashlib.sha256(_EVENT_CACHE_DATABASE.encode()).hexdigest()[:16]}.bin"
+))
+EVENT_CACHE_SLOTS = int(os.getenv("EVENT_CACHE_SLOTS", "16384"))
+EVENT_CACHE_TTL_SECONDS = float(os.getenv("EVENT_CACHE_TTL_SECONDS", "3600"))
+EVENT_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("EVENT_CACHE_NEGATIVE_TTL_SECONDS", "5"))
+
+# Per-event admission control for bookings: a token bucket of
+# ADMISSION_RATE_PER_SECOND (bursts up to ADMISSION_BURST) and at most
+# ADMISSION_MAX_IN_FLIGHT concurrent bookings per event; 0 disables a limit.
+# ADMISSION_EVENT_LIMITS overrides them per event as JSON, e.g.
+# {"42": {"rate": 200, "burst": 400, "max_in_flight": 20}}.
+ADMISSION_CONTROL_ENABLED = os.getenv("ADMISSION_CONTROL_ENABLED", "false").lower() == "true"
+ADMISSION_RATE_PER_SECOND = float(os.getenv("ADMISSION_RATE_PER_SECOND", "0"))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", "0"))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "10"))
+ADMISSION_EVENT_LIMITS = json.loads(os.getenv("ADMISSION_EVENT_LIMITS", "{}"))
+ADMISSION_MAX_EVENTS = int(os.getenv("ADMISSION_MAX_EVENTS", "10000"))
+
+# Outcomes of requests sent with an Idempotency-Key are replayed to retries
+# for IDEMPOTENCY_TTL_SECONDS; at most IDEMPOTENCY_MAX_KEYS keys per process.
+# With IDEMPOTENCY_SHARED (the default when API_WORKERS > 1) keys are also
+# claimed in the idempotency_keys table, so a retry that lands on another
+# worker is replayed too; a claim left unfinished for
+# IDEMPOTENCY_PENDING_TIMEOUT_SECONDS by a dead worker may be taken over.
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "3600"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+IDEMPOTENCY_SHARED = os.getenv("IDEMPOTENCY_SHARED", str(API_WORKERS > 1)).lower() == "true"
+IDEMPOTENCY_PENDING_TIMEOUT_SECONDS = float(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", "60"))
+
+# Holds (pending tickets) keep their seats for TICKET_HOLD_TTL_SECONDS until
+# confirmed; every HOLD_SWEEP_INTERVAL_SECONDS expired holds are released in
+# batches of HOLD_SWEEP_BATCH_SIZE (0 disables the sweeper).
+TICKET_HOLD_TTL_SECONDS = float(os.getenv("TICKET_HOLD_TTL_SECONDS", "600"))
+HOLD_SWEEP_INTERVAL_SECONDS = float(os.getenv("HOLD_SWEEP_INTERVAL_SECONDS", "5"))
+HOLD_SWEEP_BATCH_SIZE = int(os.getenv("HOLD_SWEEP_BATCH_SIZE", "500"))
+
+# Archival of finished events: every ARCHIVE_INTERVAL_SECONDS the tickets of
+# up to ARCHIVE_MAX_EVENTS events that ended more than ARCHIVE_AFTER_HOURS
+# ago move to tickets_archive, ARCHIVE_BATCH_SIZE per transaction, followed
+# by their pools and quota rows.
+ARCHIVE_ENABLED = os.getenv("ARCHIVE_ENABLED", "false").lower() == "true"
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "300"))
+ARCHIVE_AFTER_HOURS = float(os.getenv("ARCHIVE_AFTER_HOURS", "24"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_MAX_EVENTS = int(os.getenv("ARCHIVE_MAX_EVENTS", "100"))
+
+# Prometheus metrics on /metrics: per-route latency, SQL statements and pool
+# waits per request, booking counters.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
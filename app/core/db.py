@@ -1,25 +1,237 @@
 import os
+import threading
+
+from cachetools import TTLCache
 from dotenv import load_dotenv
+from fastapi import Depends, Request
 from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession, AsyncEngine
 
 from urllib.parse import quote_plus
 
-load_dotenv()
+from app.core.config import (
+    DB_MODE,
+    METRICS_ENABLED,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    REPLICA_POOL_SIZE,
+    REPLICA_MAX_OVERFLOW,
+    API_WORKERS,
+    DB_CONNECTION_BUDGET,
+    BACKGROUND_DB_CONNECTIONS,
+    READ_YOUR_WRITES_SECONDS,
+    READ_YOUR_WRITES_MAX_USERS,
+)
+from app.core.metrics import InstrumentedQueuePool, InstrumentedAsyncQueuePool, instrument_engine
 
-DATABASE_URL = f"mysql+pymysql://{quote_plus(os.getenv('DB_USERNAME'))}:{quote_plus(os.getenv('DB_PASSWORD'))}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+load_dotenv()
 
+# DATABASE_URL / ASYNC_DATABASE_URL point the app at another database, e.g.
+# the SQLite file the benchmarks run against; by default both are built from
+# the DB_* MySQL settings.
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{quote_plus(os.getenv('DB_USERNAME'))}:{quote_plus(os.getenv('DB_PASSWORD'))}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or DATABASE_URL.replace("mysql+pymysql://", "mysql+aiomysql://", 1)
 
-engine = create_engine(
-    DATABASE_URL, 
-    echo=False, 
-    pool_size=20, 
-    max_overflow=10,
-    pool_pre_ping=True
+# REPLICA_DATABASE_URL / ASYNC_REPLICA_DATABASE_URL, or DB_REPLICA_HOST with
+# the primary's credentials, add a read replica; without one every read goes
+# to the primary.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL") or (
+    f"mysql+pymysql://{quote_plus(os.getenv('DB_USERNAME'))}:{quote_plus(os.getenv('DB_PASSWORD'))}@{os.getenv('DB_REPLICA_HOST')}:{os.getenv('DB_REPLICA_PORT') or os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
+    if os.getenv("DB_REPLICA_HOST") else None
 )
+ASYNC_REPLICA_DATABASE_URL = os.getenv("ASYNC_REPLICA_DATABASE_URL") or (
+    REPLICA_DATABASE_URL.replace("mysql+pymysql://", "mysql+aiomysql://", 1) if REPLICA_DATABASE_URL else None
+)
+
+
+def _pool_options(pool_size: int, max_overflow: int):
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+
+
+def _worker_pools(pool_size: int, max_overflow: int):
+    """(pool_size, max_overflow) of this worker's (request engine, other engine).
+
+    Without a budget both keep the configured pool. With one, each of the
+    API_WORKERS processes gets ``DB_CONNECTION_BUDGET // API_WORKERS``
+    connections: BACKGROUND_DB_CONNECTIONS for the engine of the other
+    DB_MODE, the rest for the request engine, split between pool and overflow
+    in the configured ratio.
+    """
+    if DB_CONNECTION_BUDGET <= 0:
+        return (pool_size, max_overflow), (pool_size, max_overflow)
+
+    share = DB_CONNECTION_BUDGET // API_WORKERS
+    request_capacity = share - BACKGROUND_DB_CONNECTIONS
+    if BACKGROUND_DB_CONNECTIONS < 1 or request_capacity < 1:
+        raise RuntimeError(
+            f"DB_CONNECTION_BUDGET={DB_CONNECTION_BUDGET} leaves {share} connections to each of {API_WORKERS} "
+            f"workers, not enough for BACKGROUND_DB_CONNECTIONS={BACKGROUND_DB_CONNECTIONS} plus requests"
+        )
+    request_size = max(request_capacity * pool_size // max(pool_size + max_overflow, 1), 1)
+    return (request_size, request_capacity - request_size), (BACKGROUND_DB_CONNECTIONS, 0)
+
+
+def _by_mode(pools):
+    request_pool, background_pool = pools
+    if DB_MODE == "async":
+        return background_pool, request_pool
+    return request_pool, background_pool
+
+
+# (pool_size, max_overflow) of each engine in this worker.
+SYNC_POOL, ASYNC_POOL = _by_mode(_worker_pools(DB_POOL_SIZE, DB_MAX_OVERFLOW))
+REPLICA_POOL, ASYNC_REPLICA_POOL = _by_mode(_worker_pools(REPLICA_POOL_SIZE, REPLICA_MAX_OVERFLOW))
+
+# Nothing connects or builds a pool at import: create_engines() makes this
+# worker's engines when the lifespan starts (the benchmarks and tests call it
+# themselves) and binds these session factories to them.
+session = sessionmaker()
+async_session = async_sessionmaker(expire_on_commit=False)
+replica_session = sessionmaker() if REPLICA_DATABASE_URL else None
+async_replica_session = async_sessionmaker(expire_on_commit=False) if ASYNC_REPLICA_DATABASE_URL else None
+
+# name -> (Engine or AsyncEngine, pool capacity), filled by create_engines().
+ENGINES = {}
+_engines_lock = threading.Lock()
+
+
+def create_engines():
+    """Creates the engines of this worker once and returns ``ENGINES``."""
+    with _engines_lock:
+        if ENGINES:
+            return ENGINES
+
+        engines = {
+            "sync": (create_engine(
+                DATABASE_URL,
+                echo=False,
+                poolclass=InstrumentedQueuePool if METRICS_ENABLED else None,
+                **_pool_options(*SYNC_POOL)
+            ), sum(SYNC_POOL), session),
+            "async": (create_async_engine(
+                ASYNC_DATABASE_URL,
+                echo=False,
+                poolclass=InstrumentedAsyncQueuePool if METRICS_ENABLED else None,
+                **_pool_options(*ASYNC_POOL)
+            ), sum(ASYNC_POOL), async_session)
+        }
+        if replica_session is not None:
+            engines["replica"] = (create_engine(
+                REPLICA_DATABASE_URL,
+                echo=False,
+                poolclass=InstrumentedQueuePool if METRICS_ENABLED else None,
+                **_pool_options(*REPLICA_POOL)
+            ), sum(REPLICA_POOL), replica_session)
+        if async_replica_session is not None:
+            engines["async_replica"] = (create_async_engine(
+                ASYNC_REPLICA_DATABASE_URL,
+                echo=False,
+                poolclass=InstrumentedAsyncQueuePool if METRICS_ENABLED else None,
+                **_pool_options(*ASYNC_REPLICA_POOL)
+            ), sum(ASYNC_REPLICA_POOL), async_replica_session)
+
+        for name, (pool_engine, capacity, session_factory) in engines.items():
+            session_factory.configure(bind=pool_engine)
+            if METRICS_ENABLED:
+                instrument_engine(_sync_engine(pool_engine), name, capacity)
+            ENGINES[name] = (pool_engine, capacity)
+        return ENGINES
+
+
+def get_engine(name: str):
+    # None for a replica that isn't configured, or before create_engines().
+    engine = ENGINES.get(name)
+    return engine[0] if engine is not None else None
+
+
+async def dispose_engines():
+    # Closes the pooled connections; the engines stay usable.
+    for pool_engine, _ in ENGINES.values():
+        if isinstance(pool_engine, AsyncEngine):
+            await pool_engine.dispose()
+        else:
+            pool_engine.dispose()
+
+
+def _sync_engine(pool_engine):
+    return pool_engine.sync_engine if isinstance(pool_engine, AsyncEngine) else pool_engine
 
-session = sessionmaker(bind=engine)
 
+def pool_stats():
+    stats = {}
+    for name, (stats_engine, capacity) in ENGINES.items():
+        pool = _sync_engine(stats_engine).pool
+        stats[name] = {
+            "size": pool.size(),
+            "capacity": capacity,
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0)
+        } if isinstance(pool, QueuePool) else {"pool": type(pool).__name__}
+    return stats
+
+
+def worker_stats():
+    # What this process may open; with a budget, the primary's (and the
+    # replica's) connections across all workers stay within it.
+    primary = sum(capacity for name, (_, capacity) in ENGINES.items() if name in ("sync", "async"))
+    replica = sum(capacity for name, (_, capacity) in ENGINES.items() if name in ("replica", "async_replica"))
+    return {
+        "pid": os.getpid(),
+        "workers": API_WORKERS,
+        "connection_budget": DB_CONNECTION_BUDGET or None,
+        "primary_connections": primary,
+        "replica_connections": replica if replica_session is not None else None
+    }
+
+
+class RecentWriters:
+    """User ids that wrote within the last ``ttl`` seconds. Their reads stay
+    on the primary so they never see a replica that hasn't caught up with
+    their own booking or cancellation yet."""
+
+    def __init__(self, ttl: float = READ_YOUR_WRITES_SECONDS, maxsize: int = READ_YOUR_WRITES_MAX_USERS):
+        self._writers = TTLCache(maxsize=maxsize, ttl=ttl) if ttl > 0 else None
+        self._lock = threading.Lock()
+
+    def record(self, user_id: int):
+        if self._writers is None:
+            return
+        with self._lock:
+            self._writers[user_id] = True
+
+    def contains(self, user_id: int):
+        if self._writers is None:
+            return False
+        with self._lock:
+            return user_id in self._writers
+
+
+recent_writers = RecentWriters()
+
+
+def record_write(user_id: int):
+    # Only worth tracking when reads can go elsewhere.
+    if replica_session is not None or async_replica_session is not None:
+        recent_writers.record(user_id)
+
+
+def _reads_primary(request: Request):
+    if request.headers.get("X-Read-Your-Writes", "").lower() == "true":
+        return True
+    user_id = request.headers.get("X-User-Id")
+    return user_id is not None and user_id.isdigit() and recent_writers.contains(int(user_id))
 
 
 def get_db():
@@ -27,4 +239,32 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with async_session() as db:
+        yield db
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    # Read-only lookups; the request's primary session unless a replica is
+    # configured and the caller hasn't written recently.
+    if replica_session is None or _reads_primary(request):
+        yield db
+        return
+
+    read_db = replica_session()
+    try:
+        yield read_db
+    finally:
+        read_db.close()
+
+
+async def get_async_read_db(request: Request, db: AsyncSession = Depends(get_async_db)):
+    if async_replica_session is None or _reads_primary(request):
+        yield db
+        return
+
+    async with async_replica_session() as read_db:
+        yield read_db
@@ -0,0 +1,57 @@
+import inspect
+from functools import wraps
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+# Repositories and services are written once, as generators that yield every
+# database call they make and get its result back:
+#
+#     result = yield self.session.execute(stmt)
+#
+# On a Session the call has already run when it is yielded, so the sync
+# driver only sends the value back. On an AsyncSession the call returns an
+# awaitable, which the async driver awaits before sending the result back,
+# or throws the error in at the same yield. The decisions between the
+# yields are the same code for both.
+
+
+def run_sync(steps):
+    result = None
+    while True:
+        try:
+            result = steps.send(result)
+        except StopIteration as stop:
+            return stop.value
+
+
+async def run_async(steps):
+    resume, value = steps.send, None
+    while True:
+        try:
+            step = resume(value)
+        except StopIteration as stop:
+            return stop.value
+        try:
+            value = (await step) if inspect.isawaitable(step) else step
+            resume = steps.send
+        except BaseException as e:
+            value, resume = e, steps.throw
+
+
+def driver_for(session):
+    return run_async if isinstance(session, AsyncSession) else run_sync
+
+
+def runs_async(owner):
+    """Whether the methods of `owner` return awaitables."""
+    return getattr(owner, "run", None) is run_async
+
+
+def driven(method):
+    """Runs a generator method with its object's driver (``self.run``): the
+    call returns the result on a sync session, an awaitable on an async one."""
+    @wraps(method)
+    def call(self, *args, **kwargs):
+        return self.run(method(self, *args, **kwargs))
+    return call
@@ -0,0 +1,200 @@
+import time
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+# Latency buckets in seconds, from sub-millisecond statements up to requests
+# stuck behind lock waits.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per request",
+    ["method", "route"], buckets=(0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64)
+)
+HTTP_REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds", "Time spent executing SQL statements per request",
+    ["method", "route"], buckets=LATENCY_BUCKETS
+)
+
+DB_STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Time spent executing one SQL statement",
+    ["engine", "operation"], buckets=LATENCY_BUCKETS
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    ["engine"], buckets=LATENCY_BUCKETS
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out of the pool", ["engine"]
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity_connections", "Connections the pool can hand out (size + overflow)", ["engine"]
+)
+
+BOOKING_POOLS_TRIED = Histogram(
+    "booking_pools_tried", "Pools a booking attempted to decrement; the bookings of a batch share its attempts",
+    buckets=(1, 2, 3, 4, 6, 8, 12, 16, 32)
+)
+BOOKING_POOL_ATTEMPTS = Counter(
+    "booking_pool_attempts_total", "Conditional pool decrements by outcome", ["result"]
+)
+BOOKING_PARTIAL_ROLLBACKS = Counter(
+    "booking_partial_rollbacks_total", "Bookings that took seats and had to give them back", ["mode"]
+)
+
+_OPERATIONS = frozenset(("SELECT", "INSERT", "UPDATE", "DELETE"))
+
+
+class _RequestDbStats:
+
+    __slots__ = ("statements", "duration")
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+
+
+_request_db_stats = ContextVar("request_db_stats", default=None)
+
+
+class MetricsMiddleware:
+    """Records latency per route and status and the SQL work of every
+    request. Plain ASGI, so it adds no task or body copying per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        db_stats = _RequestDbStats()
+        token = _request_db_stats.set(db_stats)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started_at
+            _request_db_stats.reset(token)
+
+            route = _route_template(scope)
+            method = scope["method"]
+
+            HTTP_REQUEST_DURATION.labels(method, route, str(status_code)).observe(duration)
+            HTTP_REQUEST_DB_STATEMENTS.labels(method, route).observe(db_stats.statements)
+            HTTP_REQUEST_DB_DURATION.labels(method, route).observe(db_stats.duration)
+
+
+def _route_template(scope):
+    # The route template, not the path, keeps ticket ids out of the label
+    # values. Routes of an included router may carry only their own part of
+    # the template, so the prefix is taken back from the requested path.
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = scope["path"]
+    own_path = route.path_format.format(**scope.get("path_params", {}))
+    if not path.endswith(own_path):
+        return route.path
+    return path[:len(path) - len(own_path)] + route.path
+
+
+class InstrumentedQueuePool(QueuePool):
+
+    metrics_name = "default"
+
+    def connect(self):
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_name).observe(time.perf_counter() - started_at)
+
+    def recreate(self):
+        # Engine.dispose() swaps in a new pool, which must keep the label.
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+
+    metrics_name = "default"
+
+    def connect(self):
+        started_at = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_name).observe(time.perf_counter() - started_at)
+
+    def recreate(self):
+        # Engine.dispose() swaps in a new pool, which must keep the label.
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+def instrument_engine(engine, name: str, capacity: int):
+    # `engine` is a sync Engine; pass `async_engine.sync_engine` for asyncio.
+    statement_duration = {
+        operation: DB_STATEMENT_DURATION.labels(name, operation) for operation in (*_OPERATIONS, "OTHER")
+    }
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started_at = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._metrics_started_at
+        operation = statement[:6].upper()
+        statement_duration[operation if operation in _OPERATIONS else "OTHER"].observe(duration)
+
+        db_stats = _request_db_stats.get()
+        if db_stats is not None:
+            db_stats.statements += 1
+            db_stats.duration += duration
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    engine.pool.metrics_name = name
+    # Read through the engine: dispose() replaces its pool.
+    DB_POOL_CHECKED_OUT.labels(name).set_function(lambda: engine.pool.checkedout())
+    DB_POOL_CAPACITY.labels(name).set(capacity)
+
+
+class EventCacheCollector:
+    """Exposes the event metadata cache counters (the price lookups of every
+    booking): lookups of the scraped worker, evictions of the shared table."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        lookups = CounterMetricFamily("event_cache_lookups", "Event metadata cache lookups by result",
+                                      labels=["result"])
+        for result in ("hits", "negative_hits", "misses"):
+            lookups.add_metric([result], stats[result])
+        yield lookups
+
+        evictions = CounterMetricFamily("event_cache_evictions", "Event metadata cache entries evicted")
+        evictions.add_metric([], stats["evictions"])
+        yield evictions
@@ -0,0 +1,51 @@
+from functools import lru_cache
+
+import orjson
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_jsonable_python
+from starlette.responses import JSONResponse, Response
+
+
+class ORJSONResponse(JSONResponse):
+    """Default response class of the app, for the few handlers that still
+    return plain dicts (health, validation errors raised by FastAPI)."""
+
+    def render(self, content) -> bytes:
+        return _orjson_dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _serializer(model: type[BaseModel]):
+    # Built once per response type; pydantic-core writes the JSON bytes
+    # without going through a dict.
+    return TypeAdapter(model).dump_json
+
+
+def dump_json(data) -> bytes:
+    if isinstance(data, BaseModel):
+        return _serializer(type(data))(data)
+    return _orjson_dumps(data)
+
+
+def _orjson_dumps(data) -> bytes:
+    # Models nested in dicts or lists fall back to pydantic's encoder.
+    return orjson.dumps(data, default=to_jsonable_python, option=orjson.OPT_NON_STR_KEYS)
+
+
+def success_response(message: str, data=None, status_code: int = 200, headers=None):
+    """Renders ``ApiSuccessResponse`` straight to bytes.
+
+    ``data`` is service output that was built as the declared model, so the
+    route's ``response_model`` is only used for the OpenAPI schema; returning
+    a Response skips FastAPI's second validation of the envelope.
+    """
+    body = b'{"success":true,"message":' + orjson.dumps(message) + b',"data":' + dump_json(data) + b'}'
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
+
+
+def error_response(message: str, status_code: int, details=None, headers=None):
+    body = (
+        b'{"success":false,"message":' + orjson.dumps(message)
+        + b',"details":' + dump_json(details) + b'}'
+    )
+    return Response(body, status_code=status_code, headers=headers, media_type="application/json")
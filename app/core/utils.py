@@ -1,7 +1,21 @@
 import datetime
+import inspect
 from zoneinfo import ZoneInfo
 
+from starlette.concurrency import run_in_threadpool
+
+from app.core.drivers import runs_async
+
 
 
 def get_utc_now():
-    return datetime.datetime.now(ZoneInfo("UTC"))
\ No newline at end of file
+    return datetime.datetime.now(ZoneInfo("UTC"))
+
+
+async def call_service(method, *args, **kwargs):
+    # Services on an AsyncSession are awaited on the event loop, those on a
+    # sync Session are pushed to the threadpool so their blocking calls
+    # don't stall it.
+    if inspect.iscoroutinefunction(method) or runs_async(getattr(method, "__self__", None)):
+        return await method(*args, **kwargs)
+    return await run_in_threadpool(method, *args, **kwargs)
\ No newline at end of file
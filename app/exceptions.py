@@ -1,7 +1,8 @@
 class ApiBaseException(Exception):
 
-    def __init__(self, message: str, status_code: int = 400, details=None):
+    def __init__(self, message: str, status_code: int = 400, details=None, headers=None):
         self.message = message
         self.status_code = status_code
         self.details = details
+        self.headers = headers
         super().__init__(message)
\ No newline at end of file
@@ -1,9 +1,69 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from starlette.concurrency import run_in_threadpool
+from app.core.config import METRICS_ENABLED
+from app.core.db import create_engines, dispose_engines
+from app.core.metrics import MetricsMiddleware, EventCacheCollector
+from app.core.responses import ORJSONResponse, error_response
 from app.exceptions import ApiBaseException
-from app.schemas.response import ApiErrorResponse
-from app.controllers.v1 import events, tickets
-app = FastAPI()
+from app.controllers.v1 import events, tickets, stats
+from app.services.archival import ticket_archiver
+from app.services.event_cache import event_cache
+from app.services.holds import hold_sweeper
+from app.services.inventory import inventory_backend, ledger_compactor
+from app.services.resharding import pool_resharder
+from app.services.tickets import booking_coalescer
+from app.services.warmup import warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_engines()
+    if inventory_backend is not None:
+        await run_in_threadpool(inventory_backend.start)
+    if pool_resharder is not None:
+        pool_resharder.start()
+    if ledger_compactor is not None:
+        ledger_compactor.start()
+    if hold_sweeper is not None:
+        hold_sweeper.start()
+    if ticket_archiver is not None:
+        ticket_archiver.start()
+    # Entries left in the shared file by an earlier run may describe rows
+    # changed while the app was down. A worker restarted next to running
+    # ones only costs them a round of misses.
+    event_cache.clear()
+    # Runs while the worker already answers /health; /ready waits for it.
+    warmup.start()
+    yield
+    await warmup.stop()
+    if booking_coalescer is not None:
+        await booking_coalescer.drain()
+    if ticket_archiver is not None:
+        await run_in_threadpool(ticket_archiver.stop)
+    if hold_sweeper is not None:
+        await run_in_threadpool(hold_sweeper.stop)
+    if ledger_compactor is not None:
+        await run_in_threadpool(ledger_compactor.stop)
+    if pool_resharder is not None:
+        await run_in_threadpool(pool_resharder.stop)
+    if inventory_backend is not None:
+        await run_in_threadpool(inventory_backend.stop)
+    await dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    REGISTRY.register(EventCacheCollector(event_cache))
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 
@@ -12,21 +72,22 @@ def health():
     return {"success": "true"}
 
 
-@app.exception_handler(ApiBaseException)
-async def api_exception_handler(request: Request, exc: ApiBaseException):
+@app.get("/ready")
+async def ready():
+    # For the load balancer: 503 until the pools and caches are warm, and
+    # again once shutdown has started.
+    if not warmup.ready:
+        return ORJSONResponse(status_code=503, content={"success": "false", "warmup": warmup.stats()})
+    return {"success": "true", "warmup": warmup.stats()}
 
-    error_response = ApiErrorResponse(
-        success=False,
-        message=exc.message,
-        details=exc.details
-    )
 
-    return JSONResponse(
-        status_code = exc.status_code,
-        content = error_response.model_dump()
-    )
+@app.exception_handler(ApiBaseException)
+async def api_exception_handler(request: Request, exc: ApiBaseException):
+    # Same body as ApiErrorResponse, written without building the model.
+    return error_response(exc.message, exc.status_code, exc.details, exc.headers)
     
 app.include_router(events.router, prefix="/api/v1")
 app.include_router(tickets.router, prefix="/api/v1")
+app.include_router(stats.router, prefix="/api/v1")
 
 
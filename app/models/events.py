@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import List
 
-from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy import String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
 
@@ -14,7 +14,8 @@ class Event(Base):
 
     name: Mapped[str] = mapped_column(String(250), nullable=False)
     address: Mapped[str] = mapped_column(String(500), nullable=False)
-    event_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    # Indexed for the start-up and archival scans by time.
+    event_time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
     pool_size: Mapped[int] = mapped_column(nullable=False)
     ticket_price: Mapped[float] = mapped_column(nullable=False)
     owner_id: Mapped[int] = mapped_column(nullable=False)
@@ -31,5 +32,29 @@ class EventTicketPool(Base):
     event: Mapped["Event"] = relationship(back_populates="pools")
 
 
+class InventoryLedgerEntry(Base):
 
+    __tablename__ = "event_inventory_ledger"
 
+    # Seats taken (negative) from or given back (positive) to one pool by
+    # bookings in ledger mode, not yet folded into the pool row. Each pool's
+    # and each event's entries are one range of an index, which also covers
+    # their SUM.
+    event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"), nullable=False)
+    pool_id: Mapped[int] = mapped_column(ForeignKey("event_ticket_pools.id", ondelete="CASCADE"), nullable=False)
+    delta: Mapped[int] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index("ix_event_inventory_ledger_event_id_delta", "event_id", "delta"),
+        Index("ix_event_inventory_ledger_pool_id_delta", "pool_id", "delta"),
+    )
+
+
+class ArchivedEventTicketPool(Base):
+
+    __tablename__ = "event_ticket_pools_archive"
+
+    # Pools of finished events, moved by the archiver; same ids as before.
+    event_id: Mapped[int] = mapped_column(nullable=False, index=True)
+    ticket_count: Mapped[int] = mapped_column(nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
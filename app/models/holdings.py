@@ -0,0 +1,15 @@
+from sqlalchemy import ForeignKey, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class UserEventHolding(Base):
+    __tablename__ = "user_event_holdings"
+    __table_args__ = (
+        UniqueConstraint("user_id", "event_id", name="uq_user_event_holdings_user_id_event_id"),
+    )
+
+    user_id: Mapped[int] = mapped_column(nullable=False)
+    event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"))
+    ticket_count: Mapped[int] = mapped_column(nullable=False, default=0)
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import String, Text, DateTime, Index, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import Base
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # Claimed by the first request with the key; status_code and response
+    # are filled in once it has an outcome a retry may replay.
+    user_id: Mapped[int] = mapped_column(nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    fingerprint: Mapped[str] = mapped_column(String(255), nullable=False)
+    status_code: Mapped[int | None] = mapped_column(nullable=True)
+    response: Mapped[str | None] = mapped_column(Text, nullable=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_id_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
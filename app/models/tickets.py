@@ -1,5 +1,6 @@
+from datetime import datetime
 from enum import Enum as PyEnum
-from sqlalchemy import ForeignKey, Enum
+from sqlalchemy import ForeignKey, Enum, DateTime, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.models.base import Base
 
@@ -17,5 +18,38 @@ class Ticket(Base):
     amount: Mapped[float] = mapped_column(nullable=False)
     count: Mapped[int] = mapped_column(nullable=False)
     status: Mapped[TicketStatus] = mapped_column(Enum(TicketStatus), default=TicketStatus.pending)
+    # Set while the ticket is a pending hold; the seats go back after it.
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
    
     event: Mapped["Event"] = relationship(back_populates="tickets")
+
+    # The hold sweeper scans expired holds through the first index. The
+    # second covers the ticket listing: pages walk it in id order and read
+    # every filtered and selected column from it.
+    __table_args__ = (
+        Index("ix_tickets_status_expires_at", "status", "expires_at"),
+        Index("ix_tickets_user_id_listing", "user_id", "id", "event_id", "status", "count", "amount", "expires_at"),
+    )
+
+
+class ArchivedTicket(Base):
+    __tablename__ = "tickets_archive"
+
+    # Tickets of finished events, moved by the archiver with their ids, so
+    # a ticket can still be looked up by id. Nothing else reads this table.
+    event_id: Mapped[int] = mapped_column(nullable=False)
+    user_id: Mapped[int] = mapped_column(nullable=False)
+    amount: Mapped[float] = mapped_column(nullable=False)
+    count: Mapped[int] = mapped_column(nullable=False)
+    status: Mapped[TicketStatus] = mapped_column(Enum(TicketStatus), nullable=False)
+    expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class TicketPoolAllocation(Base):
+    __tablename__ = "ticket_pool_allocations"
+
+    ticket_id: Mapped[int] = mapped_column(ForeignKey("tickets.id", ondelete="CASCADE"), index=True)
+    # Re-sharding may delete a pool that has since been emptied.
+    pool_id: Mapped[int | None] = mapped_column(ForeignKey("event_ticket_pools.id", ondelete="SET NULL"), nullable=True)
+    ticket_count: Mapped[int] = mapped_column(nullable=False)
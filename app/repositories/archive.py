@@ -0,0 +1,75 @@
+from typing import List
+
+from sqlalchemy import select, insert, delete, literal, exists
+from sqlalchemy.orm import Session
+
+from app.models.events import Event, EventTicketPool, ArchivedEventTicketPool
+from app.models.holdings import UserEventHolding
+from app.models.tickets import Ticket, TicketPoolAllocation, ArchivedTicket
+
+
+_TICKET_COLUMNS = ("id", "created_at", "updated_at", "event_id", "user_id", "amount", "count", "status", "expires_at")
+_POOL_COLUMNS = ("id", "created_at", "updated_at", "event_id", "ticket_count")
+
+
+class ArchiveRepository:
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def commit(self):
+        self.session.commit()
+
+    def rollback(self):
+        self.session.rollback()
+
+    def get_finished_event_ids(self, before, limit: int):
+        # Events over before `before` that still have rows to move, oldest
+        # first, read through ix_events_event_time.
+        has_rows = exists().where(Ticket.event_id == Event.id) | exists().where(EventTicketPool.event_id == Event.id)
+        stmt = select(Event.id).where(
+            Event.event_time < before,
+            has_rows
+        ).order_by(Event.event_time).limit(limit)
+
+        return list(self.session.execute(stmt).scalars())
+
+    def get_ticket_ids(self, event_id: int, limit: int):
+        # Rows another worker's archiver is moving are skipped.
+        stmt = select(Ticket.id).where(
+            Ticket.event_id == event_id
+        ).order_by(Ticket.id).limit(limit).with_for_update(skip_locked=True)
+
+        return list(self.session.execute(stmt).scalars())
+
+    def archive_tickets(self, ticket_ids: List[int], archived_at):
+        # Copied with their ids, then deleted along with their allocations,
+        # which only matter for seats that can still be returned.
+        columns = [getattr(Ticket, name) for name in _TICKET_COLUMNS]
+        self.session.execute(insert(ArchivedTicket).from_select(
+            [*_TICKET_COLUMNS, "archived_at"],
+            select(*columns, literal(archived_at, ArchivedTicket.archived_at.type)).where(Ticket.id.in_(ticket_ids))
+        ))
+        self.session.execute(delete(TicketPoolAllocation).where(TicketPoolAllocation.ticket_id.in_(ticket_ids)))
+        self.session.execute(delete(Ticket).where(Ticket.id.in_(ticket_ids)))
+
+    def archive_pools(self, event_id: int, archived_at):
+        pool_ids = list(self.session.execute(select(EventTicketPool.id).where(
+            EventTicketPool.event_id == event_id
+        ).with_for_update(skip_locked=True)).scalars())
+        if not pool_ids:
+            return 0
+
+        columns = [getattr(EventTicketPool, name) for name in _POOL_COLUMNS]
+        self.session.execute(insert(ArchivedEventTicketPool).from_select(
+            [*_POOL_COLUMNS, "archived_at"],
+            select(*columns, literal(archived_at, ArchivedEventTicketPool.archived_at.type)).where(
+                EventTicketPool.id.in_(pool_ids)
+            )
+        ))
+        self.session.execute(delete(EventTicketPool).where(EventTicketPool.id.in_(pool_ids)))
+        return len(pool_ids)
+
+    def delete_holdings(self, event_id: int):
+        # Quota rows of an event nobody can book any more.
+        self.session.execute(delete(UserEventHolding).where(UserEventHolding.event_id == event_id))
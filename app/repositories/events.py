@@ -1,17 +1,187 @@
 from typing import List
 
+from sqlalchemy import select, update, delete, insert, func
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.events import Event, EventTicketPool
+from app.core.drivers import driven, driver_for
+from app.models.events import Event, EventTicketPool, InventoryLedgerEntry
+
+
+def _event_row(event: Event):
+    return {
+        "name": event.name,
+        "address": event.address,
+        "event_time": event.event_time,
+        "pool_size": event.pool_size,
+        "ticket_price": event.ticket_price,
+        "owner_id": event.owner_id
+    }
+
+
+def _event_key(row):
+    # What the caller knows of an event before it has an id; enough to tell
+    # the rows of one insert from those of a concurrent one.
+    return (row["owner_id"], row["name"], row["address"], row["pool_size"])
+
+
+def _inserted_events(first_event_id: int, count: int):
+    return select(Event.id, Event.owner_id, Event.name, Event.address, Event.pool_size).where(
+        Event.id >= first_event_id,
+        Event.id < first_event_id + count
+    ).order_by(Event.id)
+
+
+def _pool_layout(event_id: int):
+    return select(EventTicketPool.id, EventTicketPool.ticket_count).where(
+        EventTicketPool.event_id == event_id
+    ).order_by(EventTicketPool.id)
+
+
+def _upcoming_event_metadata(start, end, limit: int):
+    return select(
+        Event.id, Event.ticket_price, Event.event_time,
+        func.min(EventTicketPool.id), func.max(EventTicketPool.id)
+    ).outerjoin(
+        EventTicketPool, EventTicketPool.event_id == Event.id
+    ).where(
+        Event.event_time > start,
+        Event.event_time <= end
+    ).group_by(
+        Event.id, Event.ticket_price, Event.event_time
+    ).order_by(Event.event_time).limit(limit)
+
+
+def _tickets_remaining(event_id: int):
+    remaining = select(func.coalesce(func.sum(EventTicketPool.ticket_count), 0)).where(
+        EventTicketPool.event_id == event_id
+    ).scalar_subquery()
+    pending = select(func.coalesce(func.sum(InventoryLedgerEntry.delta), 0)).where(
+        InventoryLedgerEntry.event_id == event_id
+    ).scalar_subquery()
+    return select(remaining + pending).where(Event.id == event_id)
+
+
+def _set_pool_ticket_count(pool_id: int, ticket_count: int):
+    return update(EventTicketPool).where(
+        EventTicketPool.id == pool_id
+    ).values(
+        ticket_count=ticket_count
+    )
+
+
+def _delete_empty_pools(pool_ids: List[int]):
+    return delete(EventTicketPool).where(
+        EventTicketPool.id.in_(pool_ids),
+        EventTicketPool.ticket_count == 0
+    )
 
 
 class EventRepository:
 
-    def __init__(self, session:Session):
+    def __init__(self, session: Session | AsyncSession, read_session: Session | AsyncSession | None = None):
         self.session = session
+        self.read_session = read_session if read_session is not None else session
+        self.run = driver_for(session)
 
+    @driven
+    def commit(self):
+        yield self.session.commit()
+
+    @driven
+    def rollback(self):
+        yield self.session.rollback()
+
+    @driven
     def save_event_with_pool(self, event: Event, pools: List[EventTicketPool]):
         self.session.add(event)
-        self.session.commit()
-        self.session.refresh(event)
+        yield self.session.commit()
+        yield self.session.refresh(event)
         return event
+
+    @driven
+    def save_events_with_pools(self, events: List[Event], pool_counts: List[List[int]]):
+        # Events go out as one insert, then every pool of the chunk as
+        # another, in a single commit.
+        rows = [_event_row(event) for event in events]
+        event_ids = yield self._insert_events(rows)
+
+        saved = [(event_id, row["name"]) for event_id, row in zip(event_ids, rows)]
+        pools = [
+            {"event_id": event_id, "ticket_count": ticket_count}
+            for (event_id, _), counts in zip(saved, pool_counts)
+            for ticket_count in counts
+        ]
+        yield self.session.execute(insert(EventTicketPool), pools)
+        yield self.session.commit()
+        return saved
+
+    @driven
+    def _insert_events(self, rows: List[dict]):
+        if self.session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+            # Backends with RETURNING (SQLite, MariaDB) hand the ids back in
+            # the order of the rows.
+            result = yield self.session.execute(insert(Event).returning(Event.id, sort_by_parameter_order=True), rows)
+            return list(result.scalars())
+
+        # One multi-row INSERT rather than the ORM's insert per event. InnoDB
+        # normally gives it one block of consecutive ids starting at
+        # lastrowid; the rows are read back by their natural key to make
+        # sure, and inserted one at a time if the block wasn't ours.
+        savepoint = yield self.session.begin_nested()
+        result = yield self.session.execute(insert(Event).values(rows))
+        inserted = (yield self.session.execute(_inserted_events(result.lastrowid, len(rows)))).all()
+        if [_event_key(row._mapping) for row in inserted] == [_event_key(row) for row in rows]:
+            yield savepoint.commit()
+            return [row.id for row in inserted]
+
+        yield savepoint.rollback()
+        event_ids = []
+        for row in rows:
+            result = yield self.session.execute(insert(Event).values(row))
+            event_ids.append(result.inserted_primary_key[0])
+        return event_ids
+
+    @driven
+    def get_pool_layout(self, event_id: int, for_update: bool = False):
+        stmt = _pool_layout(event_id)
+
+        if for_update:
+            return (yield self.session.execute(stmt.with_for_update())).all()
+
+        pools = (yield self.read_session.execute(stmt)).all()
+        if not pools and self.read_session is not self.session:
+            pools = (yield self.session.execute(stmt)).all()
+        return pools
+
+    @driven
+    def get_upcoming_event_metadata(self, start, end, limit: int):
+        # Event cache rows (price, time, pool id range) of the events starting
+        # soonest within the window.
+        result = yield self.session.execute(_upcoming_event_metadata(start, end, limit))
+        return result.all()
+
+    @driven
+    def get_tickets_remaining(self, event_id: int):
+        # None when the event doesn't exist. Ledger entries not folded into
+        # the pools yet count too.
+        stmt = _tickets_remaining(event_id)
+        row = (yield self.read_session.execute(stmt)).one_or_none()
+        if row is None and self.read_session is not self.session:
+            row = (yield self.session.execute(stmt)).one_or_none()
+        return row[0] if row is not None else None
+
+    @driven
+    def set_pool_ticket_count(self, pool_id: int, ticket_count: int):
+        yield self.session.execute(_set_pool_ticket_count(pool_id, ticket_count))
+
+    @driven
+    def add_pools(self, event_id: int, ticket_counts: List[int]):
+        yield self.session.execute(
+            insert(EventTicketPool),
+            [{"event_id": event_id, "ticket_count": ticket_count} for ticket_count in ticket_counts]
+        )
+
+    @driven
+    def delete_pools(self, pool_ids: List[int]):
+        yield self.session.execute(_delete_empty_pools(pool_ids))
@@ -0,0 +1,84 @@
+from typing import List
+
+from sqlalchemy import select, func, update, bindparam
+from sqlalchemy.orm import Session
+
+from app.models.events import EventTicketPool
+from app.models.holdings import UserEventHolding
+from app.models.tickets import Ticket, TicketStatus, TicketPoolAllocation
+
+
+class HoldRepository:
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def commit(self):
+        self.session.commit()
+
+    def rollback(self):
+        self.session.rollback()
+
+    def get_expired_holds(self, now, limit: int):
+        # Served from ix_tickets_status_expires_at. Rows locked by a
+        # concurrent confirm or cancel are skipped and picked up next round.
+        stmt = select(Ticket.id, Ticket.event_id, Ticket.user_id, Ticket.count).where(
+            Ticket.status == TicketStatus.pending,
+            Ticket.expires_at <= now
+        ).order_by(
+            Ticket.expires_at
+        ).limit(limit).with_for_update(skip_locked=True)
+
+        return self.session.execute(stmt).all()
+
+    def get_allocations(self, ticket_ids: List[int]):
+        stmt = select(TicketPoolAllocation.ticket_id, TicketPoolAllocation.pool_id, TicketPoolAllocation.ticket_count).where(
+            TicketPoolAllocation.ticket_id.in_(ticket_ids)
+        )
+        return self.session.execute(stmt).all()
+
+    def get_first_pool_ids(self, event_ids):
+        stmt = select(EventTicketPool.event_id, func.min(EventTicketPool.id)).where(
+            EventTicketPool.event_id.in_(event_ids)
+        ).group_by(EventTicketPool.event_id)
+
+        return dict(self.session.execute(stmt).all())
+
+    def expire_holds(self, ticket_ids: List[int]):
+        stmt = update(Ticket).where(
+            Ticket.id.in_(ticket_ids),
+            Ticket.status == TicketStatus.pending
+        ).values(
+            status=TicketStatus.cancelled,
+            expires_at=None
+        )
+
+        self.session.execute(stmt)
+
+    def release_user_quotas(self, ticket_counts: dict):
+        # One executemany for every (user, event) holdings row of the batch.
+        holdings = UserEventHolding.__table__
+        stmt = update(holdings).where(
+            holdings.c.user_id == bindparam("holder_id"),
+            holdings.c.event_id == bindparam("holder_event_id"),
+            holdings.c.ticket_count >= bindparam("released")
+        ).values(
+            ticket_count=holdings.c.ticket_count - bindparam("released")
+        )
+
+        self.session.execute(stmt, [
+            {"holder_id": user_id, "holder_event_id": event_id, "released": count}
+            for (user_id, event_id), count in ticket_counts.items()
+        ])
+
+    def return_tickets_to_pools(self, pool_counts: dict):
+        pools = EventTicketPool.__table__
+        stmt = update(pools).where(
+            pools.c.id == bindparam("pool_id")
+        ).values(
+            ticket_count=pools.c.ticket_count + bindparam("returned")
+        )
+
+        self.session.execute(stmt, [
+            {"pool_id": pool_id, "returned": count} for pool_id, count in pool_counts.items()
+        ])
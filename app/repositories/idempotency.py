@@ -0,0 +1,90 @@
+from sqlalchemy import select, insert, update, delete, or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.drivers import driven, driver_for
+from app.models.idempotency import IdempotencyKey
+
+
+def _key(user_id: int, key: str):
+    return (IdempotencyKey.user_id == user_id) & (IdempotencyKey.key == key)
+
+
+def _expired_claim(user_id: int, key: str, now, pending_before):
+    # A key past its TTL, or a claim whose request never finished (its
+    # worker died), may be taken over.
+    return delete(IdempotencyKey).where(
+        _key(user_id, key),
+        or_(
+            IdempotencyKey.expires_at <= now,
+            and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.created_at < pending_before)
+        )
+    )
+
+
+def _claim(user_id: int, key: str, fingerprint: str, now, expires_at):
+    return insert(IdempotencyKey).values(
+        created_at=now,
+        user_id=user_id,
+        key=key,
+        fingerprint=fingerprint,
+        expires_at=expires_at
+    )
+
+
+def _stored(user_id: int, key: str):
+    return select(IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.response).where(
+        _key(user_id, key)
+    )
+
+
+def _complete(user_id: int, key: str, status_code: int, response: str):
+    return update(IdempotencyKey).where(_key(user_id, key)).values(status_code=status_code, response=response)
+
+
+def _forget(user_id: int, key: str):
+    return delete(IdempotencyKey).where(_key(user_id, key), IdempotencyKey.status_code.is_(None))
+
+
+def _purge(now, limit: int):
+    return delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now).with_dialect_options(mysql_limit=limit)
+
+
+class IdempotencyRepository:
+
+    def __init__(self, session: Session | AsyncSession):
+        self.session = session
+        self.run = driver_for(session)
+
+    @driven
+    def claim(self, user_id: int, key: str, fingerprint: str, now, expires_at, pending_before):
+        """Returns None once the key is this request's, otherwise the stored
+        (fingerprint, status_code, response) row, or None fields if the key
+        vanished in between."""
+        yield self.session.execute(_expired_claim(user_id, key, now, pending_before))
+        try:
+            yield self.session.execute(_claim(user_id, key, fingerprint, now, expires_at))
+            yield self.session.commit()
+            return None
+        except IntegrityError:
+            yield self.session.rollback()
+
+        row = (yield self.session.execute(_stored(user_id, key))).one_or_none()
+        return row if row is not None else (fingerprint, None, None)
+
+    @driven
+    def complete(self, user_id: int, key: str, status_code: int, response: str):
+        yield self.session.execute(_complete(user_id, key, status_code, response))
+        yield self.session.commit()
+
+    @driven
+    def forget(self, user_id: int, key: str):
+        yield self.session.execute(_forget(user_id, key))
+        yield self.session.commit()
+
+    @driven
+    def purge_expired(self, now, limit: int):
+        result = yield self.session.execute(_purge(now, limit))
+        yield self.session.commit()
+        return result.rowcount
@@ -0,0 +1,74 @@
+from sqlalchemy import select, func, update, delete, bindparam
+from sqlalchemy.orm import Session
+
+from app.core.utils import get_utc_now
+from app.models.events import Event, EventTicketPool, InventoryLedgerEntry
+from app.models.tickets import Ticket, TicketStatus
+
+
+class InventoryRepository:
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def get_pool_counts_for_upcoming_events(self):
+        stmt = select(EventTicketPool.event_id, EventTicketPool.id, EventTicketPool.ticket_count).join(
+            Event, Event.id == EventTicketPool.event_id
+        ).where(
+            Event.event_time > get_utc_now()
+        )
+
+        pool_counts = {}
+        for event_id, pool_id, ticket_count in self.session.execute(stmt):
+            pool_counts.setdefault(event_id, []).append((pool_id, ticket_count))
+        return pool_counts
+
+    def get_remaining_for_upcoming_events(self):
+        stmt = select(
+            Event.id,
+            Event.pool_size - func.coalesce(func.sum(Ticket.count), 0)
+        ).outerjoin(
+            Ticket,
+            (Ticket.event_id == Event.id) & Ticket.status.in_([TicketStatus.booked, TicketStatus.pending])
+        ).where(
+            Event.event_time > get_utc_now()
+        ).group_by(Event.id, Event.pool_size)
+
+        return {event_id: remaining for event_id, remaining in self.session.execute(stmt)}
+
+    def apply_pool_deltas(self, deltas: dict, commit: bool = True):
+        pools = EventTicketPool.__table__
+        stmt = update(pools).where(
+            pools.c.id == bindparam("pool_id")
+        ).values(
+            ticket_count=pools.c.ticket_count + bindparam("delta")
+        )
+
+        self.session.execute(stmt, [{"pool_id": pool_id, "delta": delta} for pool_id, delta in deltas.items()])
+        if commit:
+            self.session.commit()
+
+    def get_ledger_pool_ids(self, limit: int):
+        # Pools of the oldest entries, in id order. A plain read: the pools
+        # are locked next, before their entries, the order bookings use.
+        stmt = select(InventoryLedgerEntry.pool_id).order_by(InventoryLedgerEntry.id).limit(limit)
+        return sorted({pool_id for pool_id, in self.session.execute(stmt)})
+
+    def lock_pools(self, pool_ids):
+        # pool_id -> ticket_count. Until the commit no booking can debit
+        # these pools, and another worker's compactor waits for them.
+        stmt = select(EventTicketPool.id, EventTicketPool.ticket_count).where(
+            EventTicketPool.id.in_(pool_ids)
+        ).order_by(EventTicketPool.id).with_for_update()
+
+        return dict(self.session.execute(stmt).all())
+
+    def get_ledger_entries(self, pool_ids):
+        stmt = select(InventoryLedgerEntry.id, InventoryLedgerEntry.pool_id, InventoryLedgerEntry.delta).where(
+            InventoryLedgerEntry.pool_id.in_(pool_ids)
+        ).with_for_update()
+
+        return self.session.execute(stmt).all()
+
+    def delete_ledger_entries(self, entry_ids):
+        self.session.execute(delete(InventoryLedgerEntry).where(InventoryLedgerEntry.id.in_(entry_ids)))
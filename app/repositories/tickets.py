@@ -1,108 +1,502 @@
+import random
+
+from typing import List
+
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, update, insert, literal, DateTime
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from app.models.events import EventTicketPool, Event
-from app.models.tickets import Ticket, TicketStatus
+from app.models.events import EventTicketPool, Event, InventoryLedgerEntry
+from app.models.tickets import Ticket, TicketStatus, TicketPoolAllocation, ArchivedTicket
+from app.models.holdings import UserEventHolding
+from app.core.drivers import driven, driver_for
+from app.core.utils import get_utc_now
 from app.exceptions import ApiBaseException
 
 
+# Statements of TicketRepository, built the same for sync and async sessions.
+
+def _pools_with_tickets(event_id: int):
+    return select(EventTicketPool.id, EventTicketPool.ticket_count).where(
+        EventTicketPool.event_id == event_id,
+        EventTicketPool.ticket_count > 0
+    )
+
+
+def _pool_id_range(event_id: int):
+    return select(func.min(EventTicketPool.id), func.max(EventTicketPool.id)).where(
+        EventTicketPool.event_id == event_id
+    )
+
+
+def _probe_start(pool_id_range):
+    # Random pool id the probe starts from, None when the event has no pools.
+    first_pool_id, last_pool_id = pool_id_range
+    if first_pool_id is None:
+        return None
+    return random.randint(first_pool_id, last_pool_id)
+
+
+def _probed_pools(event_id: int, start_pool_id: int, limit: int, wrapped: bool = False):
+    # Non-empty pools from `start_pool_id` on, or below it once wrapped.
+    stmt = _pools_with_tickets(event_id)
+    if wrapped:
+        stmt = stmt.where(EventTicketPool.id < start_pool_id)
+    else:
+        stmt = stmt.where(EventTicketPool.id >= start_pool_id)
+    return stmt.order_by(EventTicketPool.id).limit(limit)
+
+
+def _event_pools(event_id: int):
+    return select(EventTicketPool.id, EventTicketPool.ticket_count).where(
+        EventTicketPool.event_id == event_id
+    )
+
+
+def _event_unsold(event_id: int):
+    sold = select(func.coalesce(func.sum(Ticket.count), 0)).where(
+        Ticket.event_id == event_id,
+        Ticket.status.in_([TicketStatus.booked, TicketStatus.pending])
+    ).scalar_subquery()
+    return select(Event.pool_size - sold).where(Event.id == event_id)
+
+
+def _take_from_pool(pool_id: int, ticket_count: int):
+    return update(EventTicketPool).where(
+        EventTicketPool.id == pool_id,
+        EventTicketPool.ticket_count >= ticket_count
+    ).values(
+        ticket_count=EventTicketPool.ticket_count - ticket_count
+    )
+
+
+def _return_to_pool(pool_id: int, ticket_count: int):
+    return update(EventTicketPool).where(
+        EventTicketPool.id == pool_id
+    ).values(
+        ticket_count=EventTicketPool.ticket_count + ticket_count
+    )
+
+
+def _first_pool_id(event_id: int):
+    return select(func.min(EventTicketPool.id)).where(EventTicketPool.event_id == event_id)
+
+
+def _ensure_holding(dialect_name: str, user_id: int, event_id: int):
+    # Creates the user's empty holdings row unless it exists. Only runs when a
+    # claim matched no row, i.e. once per user and event (or when the quota is
+    # used up), so the upsert doesn't burn an auto-increment value on every
+    # booking. Two concurrent first bookings of one user can deadlock on the
+    # gap locks their misses took; the loser gets the retryable 409.
+    if dialect_name == "mysql":
+        stmt = mysql_insert(UserEventHolding).values(user_id=user_id, event_id=event_id, ticket_count=0)
+        return stmt.on_duplicate_key_update(user_id=stmt.inserted.user_id)
+    stmt = sqlite_insert(UserEventHolding).values(user_id=user_id, event_id=event_id, ticket_count=0)
+    return stmt.on_conflict_do_nothing(index_elements=["user_id", "event_id"])
+
+
+def _claim_quota(user_id: int, event_id: int, ticket_count: int, max_tickets: int):
+    # One conditional UPDATE on the holdings row both checks and claims the
+    # quota, so concurrent bookings of the same user serialize on that row
+    # instead of racing a SUM over their tickets.
+    return update(UserEventHolding).where(
+        UserEventHolding.user_id == user_id,
+        UserEventHolding.event_id == event_id,
+        UserEventHolding.ticket_count + ticket_count <= max_tickets
+    ).values(
+        ticket_count=UserEventHolding.ticket_count + ticket_count
+    )
+
+
+def _release_quota(user_id: int, event_id: int, ticket_count: int):
+    return update(UserEventHolding).where(
+        UserEventHolding.user_id == user_id,
+        UserEventHolding.event_id == event_id,
+        UserEventHolding.ticket_count >= ticket_count
+    ).values(
+        ticket_count=UserEventHolding.ticket_count - ticket_count
+    )
+
+
+def _user_ticket_count(user_id: int, event_id: int):
+    return select(func.sum(Ticket.count)).where(
+        Ticket.user_id == user_id,
+        Ticket.event_id == event_id,
+        Ticket.status.in_([TicketStatus.booked, TicketStatus.pending])
+    )
+
+
+def _user_tickets_page(user_id: int, limit: int, before_id: int | None = None,
+                       event_id: int | None = None, status: TicketStatus | None = None):
+    # Keyset pagination, newest first: the page starts below the last id of
+    # the previous one, so deep pages cost the same as the first.
+    stmt = select(
+        Ticket.id, Ticket.event_id, Ticket.status, Ticket.count, Ticket.amount, Ticket.expires_at
+    ).where(Ticket.user_id == user_id)
+
+    if before_id is not None:
+        stmt = stmt.where(Ticket.id < before_id)
+    if event_id is not None:
+        stmt = stmt.where(Ticket.event_id == event_id)
+    if status is not None:
+        stmt = stmt.where(Ticket.status == status)
+
+    return stmt.order_by(Ticket.id.desc()).limit(limit)
+
+
+def _inserted_tickets(first_ticket_id: int, count: int):
+    return select(Ticket.id, Ticket.user_id, Ticket.event_id, Ticket.count).where(
+        Ticket.id >= first_ticket_id,
+        Ticket.id < first_ticket_id + count
+    ).order_by(Ticket.id)
+
+
+def _are_inserted_tickets(rows, tickets: List[dict]):
+    # Whether the rows read back after a multi-row INSERT are the tickets
+    # it inserted, in order.
+    return [(row.user_id, row.event_id, row.count) for row in rows] == [
+        (ticket["user_id"], ticket["event_id"], ticket["count"]) for ticket in tickets
+    ]
+
+
+def _ledger_rows(deltas: dict):
+    # (event_id, pool_id) -> seats returned (positive).
+    return [{"event_id": event_id, "pool_id": pool_id, "delta": delta} for (event_id, pool_id), delta in deltas.items()]
+
+
+def _ledger_pools_with_tickets(event_id: int):
+    # Pools with seats left once their entries not folded yet count.
+    pending = select(
+        InventoryLedgerEntry.pool_id,
+        func.sum(InventoryLedgerEntry.delta).label("delta")
+    ).where(
+        InventoryLedgerEntry.event_id == event_id
+    ).group_by(InventoryLedgerEntry.pool_id).subquery()
+    ticket_count = EventTicketPool.ticket_count + func.coalesce(pending.c.delta, 0)
+
+    return select(EventTicketPool.id, ticket_count).outerjoin(
+        pending, pending.c.pool_id == EventTicketPool.id
+    ).where(
+        EventTicketPool.event_id == event_id,
+        ticket_count > 0
+    )
+
+
+def _lock_ledger_pool(pool_id: int):
+    # Debits of one pool serialize on its row, the rest of the event's pools
+    # stay free. The compactor locks pool rows before their entries too.
+    return select(EventTicketPool.id).where(EventTicketPool.id == pool_id).with_for_update()
+
+
+def _take_from_ledger_pool(event_id: int, pool_id: int, ticket_count: int):
+    # Appends the debit only while the pool row plus its entries still hold
+    # `ticket_count` seats, so no pool is ever overdrawn.
+    pending = select(func.coalesce(func.sum(InventoryLedgerEntry.delta), 0)).where(
+        InventoryLedgerEntry.pool_id == pool_id
+    ).scalar_subquery()
+
+    return insert(InventoryLedgerEntry).from_select(
+        ["event_id", "pool_id", "delta", "created_at"],
+        select(
+            literal(event_id),
+            EventTicketPool.id,
+            literal(-ticket_count),
+            literal(get_utc_now(), DateTime(timezone=True))
+        ).where(
+            EventTicketPool.id == pool_id,
+            EventTicketPool.ticket_count + pending >= ticket_count
+        )
+    )
+
+
+def _ledger_pending(event_id: int):
+    return select(func.coalesce(func.sum(InventoryLedgerEntry.delta), 0)).where(
+        InventoryLedgerEntry.event_id == event_id
+    )
+
+
+def _ledger_pooled(event_id: int):
+    return select(func.coalesce(func.sum(EventTicketPool.ticket_count), 0)).where(
+        EventTicketPool.event_id == event_id
+    )
+
+
+def _event_owner(event_id: int):
+    return select(Event.owner_id).where(Event.id == event_id)
+
+
+def _event_metadata(event_id: int):
+    first_pool_id = select(func.min(EventTicketPool.id)).where(
+        EventTicketPool.event_id == event_id
+    ).scalar_subquery()
+    last_pool_id = select(func.max(EventTicketPool.id)).where(
+        EventTicketPool.event_id == event_id
+    ).scalar_subquery()
+
+    return select(Event.ticket_price, Event.event_time, first_pool_id, last_pool_id).where(Event.id == event_id)
+
+
+def _ticket_by_id(ticket_id: int, archived: bool = False):
+    # Tickets of finished events may have been moved to the archive.
+    model = ArchivedTicket if archived else Ticket
+    return select(model).where(model.id == ticket_id)
+
+
+def _ticket_not_found(ticket_id: int):
+    return ApiBaseException(
+        message=f"Ticket with ID {ticket_id} not found",
+        status_code=404
+    )
+
+
+def _ticket_allocations(ticket_id: int):
+    return select(TicketPoolAllocation.pool_id, TicketPoolAllocation.ticket_count).where(
+        TicketPoolAllocation.ticket_id == ticket_id
+    )
+
+
+def _cancel_ticket(ticket_id: int):
+    # Conditional so two concurrent cancellations can't both return seats.
+    return update(Ticket).where(
+        Ticket.id == ticket_id,
+        Ticket.status != TicketStatus.cancelled
+    ).values(
+        status=TicketStatus.cancelled,
+        expires_at=None
+    )
+
+
+def _confirm_hold(ticket_id: int, now):
+    # Conditional so a hold that expired, or was swept or cancelled in the
+    # meantime, can't be promoted.
+    return update(Ticket).where(
+        Ticket.id == ticket_id,
+        Ticket.status == TicketStatus.pending,
+        Ticket.expires_at > now
+    ).values(
+        status=TicketStatus.booked,
+        expires_at=None
+    ).execution_options(
+        # DATETIME comes back naive, so the criteria can't be evaluated
+        # against the ticket already loaded in the session.
+        synchronize_session=False
+    )
+
+
+def _return_allocations(ticket_id: int):
+    # One multi-table UPDATE puts every seat back into the pool it was
+    # taken from.
+    return update(EventTicketPool).where(
+        EventTicketPool.id == TicketPoolAllocation.pool_id,
+        TicketPoolAllocation.ticket_id == ticket_id
+    ).values(
+        ticket_count=EventTicketPool.ticket_count + TicketPoolAllocation.ticket_count
+    )
+
+
 class TicketRepository:
 
-    def __init__(self, session: Session):
+    def __init__(self, session: Session | AsyncSession, read_session: Session | AsyncSession | None = None):
         self.session = session
+        # Read-only lookups go here, e.g. a replica session; rows it hasn't
+        # caught up with yet are looked up again on the primary.
+        self.read_session = read_session if read_session is not None else session
+        self.run = driver_for(session)
+
+    @driven
+    def commit(self):
+        yield self.session.commit()
+
+    @driven
+    def rollback(self):
+        yield self.session.rollback()
 
+    @driven
     def get_pools_with_tickets(self, event_id: int):
-        stmt = select(EventTicketPool).where(
-            EventTicketPool.event_id == event_id,
-            EventTicketPool.ticket_count > 0
-        )
-        result = self.session.execute(stmt)
-        return result.scalars().all()
+        result = yield self.session.execute(_pools_with_tickets(event_id))
+        return result.all()
 
-    def attempt_booking_on_pool(self, pool_id: int, ticket_count: int):
-        
-        stmt = update(EventTicketPool).where(
-            EventTicketPool.id == pool_id,
-            EventTicketPool.ticket_count >= ticket_count
-        ).values(
-            ticket_count=EventTicketPool.ticket_count - ticket_count
-        )
-        
-        result = self.session.execute(stmt)
-        self.session.commit()
+    @driven
+    def probe_pools_with_tickets(self, event_id: int, sample_size: int, pool_id_range=None):
+        # Reads at most `sample_size` non-empty pools starting at a random id
+        # in the event's pool id range, wrapping around once, instead of
+        # loading every pool of the event.
+        if pool_id_range is None:
+            pool_id_range = (yield self.session.execute(_pool_id_range(event_id))).one()
+
+        start_pool_id = _probe_start(pool_id_range)
+        if start_pool_id is None:
+            return []
+
+        pools = (yield self.session.execute(_probed_pools(event_id, start_pool_id, sample_size))).all()
+        if len(pools) < sample_size and start_pool_id > pool_id_range[0]:
+            stmt = _probed_pools(event_id, start_pool_id, sample_size - len(pools), wrapped=True)
+            pools += (yield self.session.execute(stmt)).all()
+
+        return pools
+
+    @driven
+    def get_event_inventory(self, event_id: int):
+        pool_counts = (yield self.session.execute(_event_pools(event_id))).all()
+        remaining = (yield self.session.execute(_event_unsold(event_id))).scalar()
+        return pool_counts, remaining
+
+    @driven
+    def attempt_booking_on_pool(self, pool_id: int, ticket_count: int, commit: bool = True):
+        result = yield self.session.execute(_take_from_pool(pool_id, ticket_count))
+        if commit:
+            yield self.session.commit()
         return result.rowcount > 0
 
+    @driven
+    def reserve_user_quota(self, user_id: int, event_id: int, ticket_count: int, max_tickets: int):
+        if ticket_count > max_tickets:
+            return False
+        result = yield self.session.execute(_claim_quota(user_id, event_id, ticket_count, max_tickets))
+        if result.rowcount == 0:
+            # The user's first booking of the event, or the quota is used up.
+            yield self.session.execute(_ensure_holding(self.session.get_bind().dialect.name, user_id, event_id))
+            result = yield self.session.execute(_claim_quota(user_id, event_id, ticket_count, max_tickets))
+        return result.rowcount > 0
+
+    @driven
+    def release_user_quota(self, user_id: int, event_id: int, ticket_count: int):
+        yield self.session.execute(_release_quota(user_id, event_id, ticket_count))
+
+    @driven
     def get_user_ticket_count(self, user_id: int, event_id: int):
-        
-        stmt = select(func.sum(Ticket.count)).where(
-            Ticket.user_id == user_id,
-            Ticket.event_id == event_id,
-            Ticket.status.in_([TicketStatus.booked, TicketStatus.pending])
-        )
-        
-        result = self.session.execute(stmt)
-        count = result.scalar()
-        return count or 0
+        result = yield self.session.execute(_user_ticket_count(user_id, event_id))
+        return result.scalar() or 0
+
+    @driven
+    def get_user_tickets(self, user_id: int, limit: int, before_id: int | None = None,
+                         event_id: int | None = None, status: TicketStatus | None = None):
+        result = yield self.read_session.execute(_user_tickets_page(user_id, limit, before_id, event_id, status))
+        return result.all()
 
-    def create_ticket(self, ticket: Ticket):
+    @driven
+    def create_ticket(self, ticket: Ticket, commit: bool = True):
         self.session.add(ticket)
-        self.session.commit()
-        self.session.refresh(ticket)
+        if not commit:
+            yield self.session.flush()
+            return ticket
+        yield self.session.commit()
+        yield self.session.refresh(ticket)
         return ticket
 
-    def get_ticket_price_for_event(self, event_id: int):
-        stmt = select(Event.ticket_price).where(Event.id == event_id)
-        result = self.session.execute(stmt)
-        price = result.scalar()
-        
-        if price is None:
-            raise ApiBaseException(
-                message=f"Event with ID {event_id} not found",
-                status_code=404
-            )
-        
-        return price
+    @driven
+    def create_tickets(self, tickets: List[dict]):
+        if self.session.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+            # Backends with RETURNING (SQLite, MariaDB) hand the ids back in
+            # the order of the rows.
+            result = yield self.session.execute(insert(Ticket).returning(Ticket.id, sort_by_parameter_order=True), tickets)
+            return list(result.scalars())
+
+        # One multi-row INSERT. InnoDB normally gives it one block of
+        # consecutive ids starting at lastrowid; the rows are read back to
+        # make sure, and inserted one at a time if the block wasn't ours.
+        savepoint = yield self.session.begin_nested()
+        result = yield self.session.execute(insert(Ticket).values(tickets))
+        rows = (yield self.session.execute(_inserted_tickets(result.lastrowid, len(tickets)))).all()
+        if _are_inserted_tickets(rows, tickets):
+            yield savepoint.commit()
+            return [row.id for row in rows]
+
+        yield savepoint.rollback()
+        ticket_ids = []
+        for ticket in tickets:
+            result = yield self.session.execute(insert(Ticket).values(ticket))
+            ticket_ids.append(result.inserted_primary_key[0])
+        return ticket_ids
+
+    @driven
+    def get_ledger_pools_with_tickets(self, event_id: int):
+        result = yield self.session.execute(_ledger_pools_with_tickets(event_id))
+        return result.all()
+
+    @driven
+    def take_from_ledger_pool(self, event_id: int, pool_id: int, ticket_count: int):
+        # Uncommitted: the caller commits the debit with its ticket.
+        yield self.session.execute(_lock_ledger_pool(pool_id))
+        result = yield self.session.execute(_take_from_ledger_pool(event_id, pool_id, ticket_count))
+        return result.rowcount > 0
+
+    @driven
+    def append_ledger_entries(self, deltas: dict):
+        yield self.session.execute(insert(InventoryLedgerEntry), _ledger_rows(deltas))
+
+    @driven
+    def get_ledger_remaining(self, event_id: int):
+        # Folded pool counts plus the entries not folded yet; call it in a
+        # fresh transaction to see the latest commits.
+        pending = (yield self.session.execute(_ledger_pending(event_id))).scalar()
+        pooled = (yield self.session.execute(_ledger_pooled(event_id))).scalar()
+        return pooled + pending
+
+    @driven
+    def get_event_owner(self, event_id: int):
+        result = yield self.session.execute(_event_owner(event_id))
+        return result.scalar()
+
+    @driven
+    def get_event_metadata(self, event_id: int):
+        stmt = _event_metadata(event_id)
+        row = (yield self.read_session.execute(stmt)).one_or_none()
+        if row is None and self.read_session is not self.session:
+            row = (yield self.session.execute(stmt)).one_or_none()
+        return row
 
+    @driven
     def get_ticket_by_ticket_id(self, ticket_id: int):
-        stmt = select(Ticket).where(Ticket.id == ticket_id)
-        result = self.session.execute(stmt)
-        ticket = result.scalar_one_or_none()
-        
+        stmt = _ticket_by_id(ticket_id)
+        ticket = (yield self.read_session.execute(stmt)).scalar_one_or_none()
+        if ticket is None and self.read_session is not self.session:
+            ticket = (yield self.session.execute(stmt)).scalar_one_or_none()
         if ticket is None:
-            raise ApiBaseException(
-                message=f"Ticket with ID {ticket_id} not found",
-                status_code=404
-            )
-        
-        return ticket
+            ticket = (yield self.session.execute(_ticket_by_id(ticket_id, archived=True))).scalar_one_or_none()
+
+        if ticket is None:
+            raise _ticket_not_found(ticket_id)
 
-    def update_ticket_status(self, ticket: Ticket, new_status: TicketStatus):
-        ticket.status = new_status
-        self.session.add(ticket)
-        self.session.commit()
-        self.session.refresh(ticket)
         return ticket
 
-    def add_tickets_to_random_ticket_pool(self, tickets_to_add: int, event_id: int):
-        stmt = select(EventTicketPool).where(
-            EventTicketPool.event_id == event_id
-        ).order_by(func.rand()).limit(1).with_for_update()
-        
-        result = self.session.execute(stmt)
-        pool = result.scalar_one_or_none()
-        
-        if pool:
-            pool.ticket_count += tickets_to_add
-            self.session.commit()
-
-    def release_tickets_to_pool(self, pool_id: int, count: int):
-        stmt = update(EventTicketPool).where(
-            EventTicketPool.id == pool_id
-        ).values(
-            ticket_count=EventTicketPool.ticket_count + count
-        )
-        
-        self.session.execute(stmt)
-        self.session.commit()
+    @driven
+    def add_ticket_allocations(self, allocations: List[dict]):
+        yield self.session.execute(insert(TicketPoolAllocation), allocations)
+
+    @driven
+    def get_ticket_allocations(self, ticket_id: int):
+        result = yield self.session.execute(_ticket_allocations(ticket_id))
+        return result.all()
+
+    @driven
+    def mark_ticket_cancelled(self, ticket_id: int):
+        result = yield self.session.execute(_cancel_ticket(ticket_id))
+        return result.rowcount > 0
+
+    @driven
+    def confirm_hold(self, ticket_id: int, now):
+        result = yield self.session.execute(_confirm_hold(ticket_id, now))
+        return result.rowcount > 0
+
+    @driven
+    def return_allocated_tickets(self, ticket_id: int):
+        yield self.session.execute(_return_allocations(ticket_id))
+
+    @driven
+    def return_tickets_to_event(self, event_id: int, ticket_count: int):
+        pool_id = (yield self.session.execute(_first_pool_id(event_id))).scalar()
+
+        if pool_id is None:
+            return None
 
+        yield self.release_tickets_to_pool(pool_id, ticket_count, commit=False)
+        return pool_id
 
+    @driven
+    def release_tickets_to_pool(self, pool_id: int, count: int, commit: bool = True):
+        yield self.session.execute(_return_to_pool(pool_id, count))
+        if commit:
+            yield self.session.commit()
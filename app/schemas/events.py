@@ -1,6 +1,10 @@
+from typing import List, Dict, Any, Optional
+
 from pydantic import BaseModel, Field, field_validator
 from datetime import datetime, timezone
 
+from app.core.config import EVENT_BATCH_MAX_ITEMS
+
 class EventCreate(BaseModel):
     name: str = Field(min_length=1, max_length=250)
     address: str = Field(min_length=1, max_length=500)
@@ -25,4 +29,47 @@ class EventCreate(BaseModel):
 
 class EventSuccessResponse(BaseModel):
     event_name: str
-    event_id : int
\ No newline at end of file
+    event_id : int
+
+
+class PoolLayoutEntry(BaseModel):
+    pool_id: int
+    ticket_count: int
+
+
+class EventPoolLayoutResponse(BaseModel):
+    event_id: int
+    pool_count: int
+    tickets_remaining: int
+    bookings_per_second: float
+    failed_pool_attempts: int
+    pools: List[PoolLayoutEntry]
+
+
+class EventAvailabilityResponse(BaseModel):
+    event_id: int
+    tickets_remaining: int
+    sold_out: bool
+    # True when tickets_remaining was rounded down (large events).
+    approximate: bool
+
+
+class EventBatchCreate(BaseModel):
+    # Items stay raw so one invalid event is reported in its result instead
+    # of rejecting the whole batch.
+    events: List[Dict[str, Any]] = Field(min_length=1, max_length=EVENT_BATCH_MAX_ITEMS)
+
+
+class EventBatchItemResult(BaseModel):
+    index: int
+    success: bool
+    event_id: Optional[int] = None
+    event_name: Optional[str] = None
+    message: Optional[str] = None
+    errors: Optional[List[Any]] = None
+
+
+class EventBatchResponse(BaseModel):
+    created_count: int
+    failed_count: int
+    results: List[EventBatchItemResult]
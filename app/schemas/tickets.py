@@ -1,5 +1,10 @@
+from datetime import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel, Field
 
+from app.core.config import TICKET_BATCH_MAX_ITEMS
+
 from app.models.tickets import TicketStatus
 
 
@@ -16,11 +21,45 @@ class TicketCreateResponse(BaseModel):
     ticket_count: int
 
 
+class TicketHoldResponse(TicketCreateResponse):
+    expires_at: datetime
+
+
+class TicketListItem(TicketCreateResponse):
+    expires_at: Optional[datetime] = None
+
+
+class TicketListResponse(BaseModel):
+    tickets: List[TicketListItem]
+    # Pass as ?cursor= to get the next (older) page; None on the last page.
+    next_cursor: Optional[int] = None
+
+
 class TicketCancelledResponse(BaseModel):
     ticket_id: int
     status: TicketStatus
     event_id: int
 
 
+class TicketBatchEntry(BaseModel):
+    user_id: int
+    event_id: int
+    ticket_count: int = Field(gt=0, lt=3)
+
+
+class TicketBatchCreate(BaseModel):
+    bookings: List[TicketBatchEntry] = Field(min_length=1, max_length=TICKET_BATCH_MAX_ITEMS)
+
+
+class TicketBatchItemResult(BaseModel):
+    index: int
+    success: bool
+    ticket: Optional[TicketCreateResponse] = None
+    status_code: Optional[int] = None
+    message: Optional[str] = None
 
 
+class TicketBatchResponse(BaseModel):
+    booked_count: int
+    failed_count: int
+    results: List[TicketBatchItemResult]
@@ -0,0 +1,18 @@
+"""Runs the API with API_WORKERS uvicorn worker processes:
+
+    python -m app.serve
+
+Every worker is a full copy of the app with its own pools, sized from its
+share of DB_CONNECTION_BUDGET in ``app.core.db``.
+"""
+import uvicorn
+
+from app.core.config import API_HOST, API_PORT, API_WORKERS
+
+
+def main():
+    uvicorn.run("app.main:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import heapq
+import math
+import threading
+import time
+
+from app.core.config import (
+    API_WORKERS,
+    ADMISSION_CONTROL_ENABLED,
+    ADMISSION_RATE_PER_SECOND,
+    ADMISSION_BURST,
+    ADMISSION_MAX_IN_FLIGHT,
+    ADMISSION_EVENT_LIMITS,
+    ADMISSION_MAX_EVENTS,
+)
+from app.exceptions import ApiBaseException
+
+
+# stats() lists this many of the busiest events, not every tracked one.
+_STATS_TOP_EVENTS = 20
+
+
+class AdmissionLimits:
+
+    __slots__ = ("rate", "burst", "max_in_flight")
+
+    def __init__(self, rate: float = 0, burst: float = 0, max_in_flight: int = 0):
+        # 0 turns the respective limit off. A bucket holds at least one
+        # token, or a rate below 1/s (or a worker's share of one) would
+        # never admit anything.
+        self.rate = rate
+        self.burst = max(burst or rate, 1)
+        self.max_in_flight = max_in_flight
+
+    def share(self, workers: int):
+        """One worker's part of these limits when ``workers`` processes each
+        enforce them; the kernel spreads connections about evenly."""
+        if workers <= 1:
+            return self
+        return AdmissionLimits(self.rate / workers, self.burst / workers, math.ceil(self.max_in_flight / workers))
+
+
+class _EventAdmission:
+
+    __slots__ = ("limits", "tokens", "refilled_at", "in_flight", "admitted", "shed")
+
+    def __init__(self, limits: AdmissionLimits, now: float):
+        self.limits = limits
+        self.tokens = limits.burst
+        self.refilled_at = now
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+
+
+class EventAdmissionController:
+    """Sheds booking requests per event before they reach the DB.
+
+    Each event gets a token bucket (``rate`` requests/s, up to ``burst`` at
+    once) and a cap on bookings in flight. A request over either limit is
+    rejected with a 429 and a ``Retry-After`` hint instead of waiting for a
+    pooled connection.
+
+    The limits are per event across the API, so each of ``workers``
+    processes enforces its share of them.
+    """
+
+    def __init__(self, default_limits: AdmissionLimits, event_limits: dict | None = None,
+                 max_events: int = ADMISSION_MAX_EVENTS, workers: int = API_WORKERS):
+        self.default_limits = default_limits.share(workers)
+        self.event_limits = {event_id: limits.share(workers) for event_id, limits in (event_limits or {}).items()}
+        self.max_events = max_events
+
+        self._events = {}
+        self._admitted = 0
+        self._shed = 0
+        self._lock = threading.Lock()
+
+    def admit(self, event_id: int):
+        now = time.monotonic()
+
+        with self._lock:
+            admission = self._events.get(event_id)
+            if admission is None:
+                if len(self._events) >= self.max_events:
+                    self._prune()
+                limits = self.event_limits.get(event_id, self.default_limits)
+                admission = self._events[event_id] = _EventAdmission(limits, now)
+
+            limits = admission.limits
+            if limits.rate:
+                admission.tokens = min(limits.burst, admission.tokens + (now - admission.refilled_at) * limits.rate)
+                admission.refilled_at = now
+
+            retry_after = None
+            if limits.max_in_flight and admission.in_flight >= limits.max_in_flight:
+                retry_after = 1
+            elif limits.rate and admission.tokens < 1:
+                retry_after = math.ceil((1 - admission.tokens) / limits.rate)
+
+            if retry_after is not None:
+                admission.shed += 1
+                self._shed += 1
+            else:
+                if limits.rate:
+                    admission.tokens -= 1
+                admission.in_flight += 1
+                admission.admitted += 1
+                self._admitted += 1
+
+        if retry_after is not None:
+            raise ApiBaseException(
+                message=f"Too many booking requests for event {event_id}, please retry later",
+                status_code=429,
+                headers={"Retry-After": str(retry_after)}
+            )
+
+    def release(self, event_id: int):
+        with self._lock:
+            admission = self._events.get(event_id)
+            if admission is not None and admission.in_flight:
+                admission.in_flight -= 1
+
+    def stats(self, top: int = _STATS_TOP_EVENTS):
+        # Totals over every tracked event, details of the `top` busiest.
+        with self._lock:
+            in_flight = sum(admission.in_flight for admission in self._events.values())
+            busiest = heapq.nlargest(top, self._events.items(),
+                                     key=lambda item: (item[1].in_flight, item[1].shed, item[1].admitted))
+            events = {
+                event_id: {
+                    "admitted": admission.admitted,
+                    "shed": admission.shed,
+                    "in_flight": admission.in_flight
+                }
+                for event_id, admission in busiest
+            }
+            tracked = len(self._events)
+            admitted, shed = self._admitted, self._shed
+
+        return {
+            "admitted": admitted,
+            "shed": shed,
+            "in_flight": in_flight,
+            "events_tracked": tracked,
+            "events": events
+        }
+
+    def _prune(self):
+        # Idle events are dropped to bound memory; a dropped event starts
+        # again with a full bucket, which only ever admits more.
+        for event_id in [event_id for event_id, admission in self._events.items() if not admission.in_flight]:
+            del self._events[event_id]
+
+
+booking_admission = EventAdmissionController(
+    AdmissionLimits(ADMISSION_RATE_PER_SECOND, ADMISSION_BURST, ADMISSION_MAX_IN_FLIGHT),
+    {
+        int(event_id): AdmissionLimits(limits.get("rate", 0), limits.get("burst", 0), limits.get("max_in_flight", 0))
+        for event_id, limits in ADMISSION_EVENT_LIMITS.items()
+    }
+) if ADMISSION_CONTROL_ENABLED else None
@@ -0,0 +1,134 @@
+import logging
+import threading
+from datetime import timedelta
+
+from app.core.config import (
+    ARCHIVE_ENABLED,
+    ARCHIVE_INTERVAL_SECONDS,
+    ARCHIVE_AFTER_HOURS,
+    ARCHIVE_BATCH_SIZE,
+    ARCHIVE_MAX_EVENTS,
+)
+from app.core.db import session
+from app.core.utils import get_utc_now
+from app.repositories.archive import ArchiveRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+class TicketArchiver:
+    """Background thread that moves the rows of finished events out of the
+    hot tables.
+
+    Events that ended more than ``after_hours`` ago are never booked again,
+    yet their tickets keep growing ``tickets`` and its indexes. Each round
+    takes up to ``max_events`` of them, oldest first, and moves their
+    tickets to ``tickets_archive`` ``batch_size`` at a time, one short
+    transaction per batch that only locks the rows it moves. Once an event
+    has no tickets left, its pools go to ``event_ticket_pools_archive`` and
+    its quota rows are deleted.
+    """
+
+    def __init__(self, session_factory=session, interval: float = ARCHIVE_INTERVAL_SECONDS,
+                 after_hours: float = ARCHIVE_AFTER_HOURS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                 max_events: int = ARCHIVE_MAX_EVENTS):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.after_hours = after_hours
+        self.batch_size = batch_size
+        self.max_events = max_events
+
+        self.events_archived = 0
+        self.tickets_archived = 0
+        self.pools_archived = 0
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ticket-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "events_archived": self.events_archived,
+            "tickets_archived": self.tickets_archived,
+            "pools_archived": self.pools_archived
+        }
+
+    def archive_once(self):
+        before = get_utc_now() - timedelta(hours=self.after_hours)
+
+        with self.session_factory() as db:
+            repo = ArchiveRepository(db)
+            event_ids = repo.get_finished_event_ids(before, self.max_events)
+            repo.rollback()
+
+        archived = 0
+        for event_id in event_ids:
+            if self._stop.is_set():
+                break
+            if self.archive_event(event_id):
+                archived += 1
+        return archived
+
+    def archive_event(self, event_id: int):
+        # True once every row of the event is archived.
+        while not self._stop.is_set():
+            moved = self._archive_ticket_batch(event_id)
+            if moved < self.batch_size:
+                break
+        else:
+            return False
+
+        with self.session_factory() as db:
+            repo = ArchiveRepository(db)
+            try:
+                # A late booking keeps the pools for the next round.
+                if repo.get_ticket_ids(event_id, 1):
+                    repo.rollback()
+                    return False
+
+                pools = repo.archive_pools(event_id, get_utc_now())
+                repo.delete_holdings(event_id)
+                repo.commit()
+            except Exception:
+                repo.rollback()
+                raise
+
+        self.pools_archived += pools
+        self.events_archived += 1
+        return True
+
+    def _archive_ticket_batch(self, event_id: int):
+        with self.session_factory() as db:
+            repo = ArchiveRepository(db)
+            try:
+                ticket_ids = repo.get_ticket_ids(event_id, self.batch_size)
+                if ticket_ids:
+                    repo.archive_tickets(ticket_ids, get_utc_now())
+                repo.commit()
+            except Exception:
+                repo.rollback()
+                raise
+
+        self.tickets_archived += len(ticket_ids)
+        return len(ticket_ids)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.archive_once()
+            except Exception:
+                logger.exception("archiving finished events failed")
+
+
+ticket_archiver = TicketArchiver() if ARCHIVE_ENABLED else None
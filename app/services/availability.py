@@ -0,0 +1,146 @@
+import random
+import threading
+
+from cachetools import TTLCache
+
+from app.core.config import (
+    AVAILABILITY_INDEX_TTL_SECONDS,
+    AVAILABILITY_INDEX_MAX_EVENTS,
+    AVAILABILITY_COUNT_TTL_SECONDS,
+)
+
+
+class _EventPools:
+
+    __slots__ = ("ids", "positions", "counts")
+
+    def __init__(self, pool_counts):
+        self.ids = []
+        self.positions = {}
+        self.counts = {}
+        for pool_id, count in pool_counts:
+            self.set(pool_id, count)
+
+    def set(self, pool_id: int, count: int):
+        if count <= 0:
+            self.discard(pool_id)
+            return
+        if pool_id not in self.counts:
+            self.positions[pool_id] = len(self.ids)
+            self.ids.append(pool_id)
+        self.counts[pool_id] = count
+
+    def discard(self, pool_id: int):
+        position = self.positions.pop(pool_id, None)
+        if position is None:
+            return
+        # Swap-remove keeps `ids` dense so sampling stays O(k).
+        last_pool_id = self.ids.pop()
+        if last_pool_id != pool_id:
+            self.ids[position] = last_pool_id
+            self.positions[last_pool_id] = position
+        del self.counts[pool_id]
+
+    def sample(self, limit: int | None):
+        if limit is None or limit >= len(self.ids):
+            pool_ids = random.sample(self.ids, len(self.ids))
+        else:
+            pool_ids = random.sample(self.ids, limit)
+        return [(pool_id, self.counts[pool_id]) for pool_id in pool_ids]
+
+
+class AvailabilityIndex:
+    """Per-process hint of which pools of an event still have stock.
+
+    Entries hold the last known count of every non-empty pool in a dense id
+    array and expire after ``ttl`` seconds, after which the next booking
+    revalidates them against the DB. An entry with no pools left means the
+    event is sold out (or unknown) and lets bookings be rejected without a
+    query. The conditional pool UPDATE stays the source of truth, so a stale
+    entry can only cost a retry or a delayed sale, never an oversell.
+
+    It also keeps each event's total of remaining seats for the availability
+    endpoint, stored from one SUM and then moved by the bookings and releases
+    of this process until it expires after ``count_ttl`` seconds.
+    """
+
+    def __init__(self, ttl: float = AVAILABILITY_INDEX_TTL_SECONDS, maxsize: int = AVAILABILITY_INDEX_MAX_EVENTS,
+                 count_ttl: float = AVAILABILITY_COUNT_TTL_SECONDS):
+        self._events = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._remaining = TTLCache(maxsize=maxsize, ttl=count_ttl) if count_ttl > 0 else None
+        self._lock = threading.Lock()
+
+    def candidates(self, event_id: int, limit: int | None = None):
+        with self._lock:
+            pools = self._events.get(event_id)
+            if pools is None:
+                return None
+            return pools.sample(limit)
+
+    def refresh(self, event_id: int, pool_counts, limit: int | None = None):
+        pools = _EventPools(pool_counts)
+        with self._lock:
+            self._events[event_id] = pools
+            return pools.sample(limit)
+
+    def mark_sold_out(self, event_id: int):
+        self.refresh(event_id, [])
+
+    def is_sold_out(self, event_id: int):
+        with self._lock:
+            pools = self._events.get(event_id)
+            return pools is not None and not pools.ids
+
+    def remaining(self, event_id: int):
+        if self._remaining is None:
+            return None
+        with self._lock:
+            remaining = self._remaining.get(event_id)
+            return remaining[0] if remaining is not None else None
+
+    def store_remaining(self, event_id: int, remaining: int):
+        if self._remaining is None:
+            return
+        with self._lock:
+            self._remaining[event_id] = [remaining]
+
+    def record_booking(self, event_id: int, pool_id: int, ticket_count: int):
+        with self._lock:
+            pools = self._events.get(event_id)
+            if pools is not None and pool_id in pools.counts:
+                pools.set(pool_id, pools.counts[pool_id] - ticket_count)
+            self._adjust_remaining(event_id, -ticket_count)
+
+    def record_miss(self, event_id: int, pool_id: int, ticket_count: int):
+        # The conditional UPDATE only fails when the pool holds fewer than
+        # `ticket_count` seats.
+        with self._lock:
+            pools = self._events.get(event_id)
+            if pools is not None and pool_id in pools.counts:
+                pools.set(pool_id, min(pools.counts[pool_id], ticket_count - 1))
+
+    def record_release(self, event_id: int, pool_id: int, ticket_count: int):
+        with self._lock:
+            pools = self._events.get(event_id)
+            if pools is not None:
+                pools.set(pool_id, pools.counts.get(pool_id, 0) + ticket_count)
+            self._adjust_remaining(event_id, ticket_count)
+
+    def invalidate(self, event_id: int):
+        with self._lock:
+            self._events.pop(event_id, None)
+            if self._remaining is not None:
+                self._remaining.pop(event_id, None)
+
+    def _adjust_remaining(self, event_id: int, delta: int):
+        # Caller holds the lock. The total is updated in place: assigning to
+        # the TTLCache would restart the entry's expiry, and a busy event
+        # would then never be re-read from the DB.
+        if self._remaining is None:
+            return
+        remaining = self._remaining.get(event_id)
+        if remaining is not None:
+            remaining[0] = max(remaining[0] + delta, 0)
+
+
+availability_index = AvailabilityIndex()
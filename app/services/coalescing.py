@@ -0,0 +1,82 @@
+import asyncio
+
+from app.core.config import BOOKING_COALESCE_WINDOW_MS, BOOKING_COALESCE_MAX_BATCH
+from app.schemas.tickets import TicketBatchCreate, TicketBatchEntry
+
+
+class _PendingBatch:
+
+    __slots__ = ("entries", "futures", "timer")
+
+    def __init__(self):
+        self.entries = []
+        self.futures = []
+        self.timer = None
+
+
+class BookingCoalescer:
+    """Groups concurrent bookings of the same event into one batch booking.
+
+    The first booking for an event opens a batch that is flushed after
+    ``window_ms`` milliseconds or as soon as it holds ``max_batch`` entries,
+    whichever comes first. ``book_batch`` books the whole batch in one
+    transaction (one aggregated pool decrement per pool, one multi-row ticket
+    insert, one commit) and every caller gets its own entry's result back.
+    Batches being booked are kept until they finish; ``drain`` flushes the
+    open ones and waits for all of them on shutdown.
+    """
+
+    def __init__(self, book_batch, window_ms: float = BOOKING_COALESCE_WINDOW_MS,
+                 max_batch: int = BOOKING_COALESCE_MAX_BATCH):
+        self.book_batch = book_batch
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+
+        self._pending = {}
+        self._tasks = set()
+
+    async def submit(self, entry: TicketBatchEntry):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._pending.get(entry.event_id)
+        if batch is None:
+            batch = self._pending[entry.event_id] = _PendingBatch()
+            batch.timer = loop.call_later(self.window, self._flush, entry.event_id)
+
+        batch.entries.append(entry)
+        batch.futures.append(future)
+
+        if len(batch.entries) >= self.max_batch:
+            batch.timer.cancel()
+            self._flush(entry.event_id)
+
+        return await future
+
+    async def drain(self):
+        for event_id in list(self._pending):
+            self._pending[event_id].timer.cancel()
+            self._flush(event_id)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _flush(self, event_id: int):
+        batch = self._pending.pop(event_id, None)
+        if batch is not None:
+            # The loop only keeps a weak reference to its tasks.
+            task = asyncio.create_task(self._book(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _book(self, batch: _PendingBatch):
+        try:
+            response = await self.book_batch(TicketBatchCreate(bookings=batch.entries))
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result in zip(batch.futures, response.results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,312 @@
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from app.core.config import (
+    EVENT_CACHE_PATH,
+    EVENT_CACHE_SLOTS,
+    EVENT_CACHE_TTL_SECONDS,
+    EVENT_CACHE_NEGATIVE_TTL_SECONDS,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class EventMetadata(NamedTuple):
+    event_id: int
+    exists: bool
+    ticket_price: float = 0.0
+    event_time: datetime | None = None
+    first_pool_id: int | None = None
+    last_pool_id: int | None = None
+
+
+# magic, slot count, generation, stores, evictions, invalidations
+_HEADER = struct.Struct("<8sQQQQQ")
+_MAGIC = b"EVTCACH2"
+_SHARED_STAT_NAMES = ("stores", "evictions", "invalidations")
+_STATS_OFFSET = 24
+_LOOKUP_STAT_NAMES = ("hits", "negative_hits", "misses")
+
+# Invalidation counters; an event id maps to one of these, so invalidating it
+# only discards the in-flight loads of the events sharing its counter.
+_VERSIONS = 1024
+_VERSION = struct.Struct("<Q")
+
+# sequence, event_id, generation, flags, expires_at, price, event_time,
+# first_pool_id, last_pool_id
+_SLOT = struct.Struct("<QqQB7xdddqq")
+_SEQUENCE = struct.Struct("<Q")
+
+_USED = 1
+_EXISTS = 2
+_HAS_POOLS = 4
+
+# Each event id hashes to a window of this many neighbouring slots; the entry
+# of a full window that expires first is evicted.
+_WINDOW = 8
+
+# A reader that keeps finding a slot mid-write gives up and counts a miss.
+_READ_RETRIES = 64
+
+
+class EventMetadataCache:
+    """Read-through cache of event price, time, existence and pool id range.
+
+    Entries live in a fixed-size table of slots in a shared mmap, so every
+    worker process on the host opening the same ``path`` sees the same
+    entries; an empty ``path`` keeps the table private to the process.
+
+    * Lookups take no lock and write nothing. Every slot carries a sequence
+      number that writers make odd while they rewrite it; a reader that sees
+      it odd or changed reads the slot again (a seqlock).
+    * Writers serialize on an ``flock`` of the backing file.
+    * Unknown event ids are cached as negative entries for ``negative_ttl``
+      seconds so repeated bookings for bogus ids never reach the DB.
+    * ``invalidate`` drops one event and bumps its version, ``clear`` bumps
+      the table generation and drops everything. A load that started before
+      either is not stored, so stale rows can't be put back.
+
+    Store, eviction and invalidation counts are shared by all processes;
+    lookup counts are kept per process.
+    """
+
+    def __init__(self, path: str = EVENT_CACHE_PATH, slots: int = EVENT_CACHE_SLOTS,
+                 ttl: float = EVENT_CACHE_TTL_SECONDS, negative_ttl: float = EVENT_CACHE_NEGATIVE_TTL_SECONDS):
+        self.slots = max(slots, _WINDOW)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._slots_offset = _HEADER.size + _VERSIONS * _VERSION.size
+        self._size = self._slots_offset + self.slots * _SLOT.size
+        self._lookups = dict.fromkeys(_LOOKUP_STAT_NAMES, 0)
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        self._map = self._open(path)
+
+    def get(self, event_id: int):
+        now = time.time()
+        generation = self._generation()
+        for slot in self._window(event_id):
+            entry = self._read_slot(slot)
+            if entry is None or entry[1] != event_id or not entry[3] & _USED:
+                continue
+            if entry[2] != generation or entry[4] <= now:
+                break
+            metadata = _to_metadata(entry)
+            self._lookups["hits" if metadata.exists else "negative_hits"] += 1
+            return metadata
+
+        self._lookups["misses"] += 1
+        return None
+
+    def version(self, event_id: int | None = None):
+        """Token to pass to ``store`` for a load of ``event_id`` that is about
+        to start. Without an id the token covers every event, for bulk loads."""
+        if event_id is None:
+            return self._generation(), None, self._shared_stat("invalidations")
+        bucket = event_id % _VERSIONS
+        return self._generation(), bucket, self._version(bucket)
+
+    def store(self, event_id: int, metadata: EventMetadata, version):
+        now = time.time()
+        ttl = self.ttl if metadata.exists else self.negative_ttl
+        if ttl <= 0:
+            return
+
+        with self._locked():
+            generation, bucket, count = version
+            if generation != self._generation():
+                return
+            if bucket is None and count != self._shared_stat("invalidations"):
+                return
+            if bucket is not None and (bucket != event_id % _VERSIONS or count != self._version(bucket)):
+                return
+
+            target = None
+            target_expires_at = None
+            for slot in self._window(event_id):
+                entry = _SLOT.unpack_from(self._map, self._slot_offset(slot))
+                if entry[1] == event_id or not entry[3] & _USED or entry[2] != generation or entry[4] <= now:
+                    target = slot
+                    break
+                if target is None or entry[4] < target_expires_at:
+                    target, target_expires_at = slot, entry[4]
+            else:
+                self._bump("evictions")
+
+            self._write_slot(target, _to_slot(metadata, generation, now + ttl))
+            self._bump("stores")
+
+    def invalidate(self, event_id: int):
+        with self._locked():
+            for slot in self._window(event_id):
+                entry = _SLOT.unpack_from(self._map, self._slot_offset(slot))
+                if entry[1] == event_id and entry[3] & _USED:
+                    self._write_slot(slot, (0, 0, 0, 0.0, 0.0, 0.0, 0, 0))
+            bucket = event_id % _VERSIONS
+            _VERSION.pack_into(self._map, _HEADER.size + bucket * _VERSION.size, self._version(bucket) + 1)
+            self._bump("invalidations")
+
+    def clear(self):
+        with self._locked():
+            header = list(self._header())
+            header[2] += 1
+            _HEADER.pack_into(self._map, 0, *header)
+            self._bump("invalidations")
+
+    def stats(self):
+        header = self._header()
+        used = sum(
+            1 for slot in range(self.slots)
+            if _SLOT.unpack_from(self._map, self._slot_offset(slot))[3] & _USED
+        )
+        stats = dict(self._lookups)
+        stats.update(zip(_SHARED_STAT_NAMES, header[3:]))
+        stats["slots"] = self.slots
+        stats["used_slots"] = used
+        return stats
+
+    def _open(self, path: str):
+        if path:
+            try:
+                self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+                with self._file_lock():
+                    if os.fstat(self._fd).st_size != self._size:
+                        os.ftruncate(self._fd, self._size)
+                    table = mmap.mmap(self._fd, self._size)
+                    if _HEADER.unpack_from(table, 0)[:2] != (_MAGIC, self.slots):
+                        _init_table(table, self.slots)
+                return table
+            except OSError:
+                logger.exception("could not map event cache file %s, using a process-local cache", path)
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+
+        table = mmap.mmap(-1, self._size)
+        _init_table(table, self.slots)
+        return table
+
+    @contextmanager
+    def _locked(self):
+        # flock() doesn't exclude threads sharing one file descriptor, so
+        # the file lock is taken under a process-local lock.
+        with self._thread_lock:
+            with self._file_lock():
+                yield
+
+    @contextmanager
+    def _file_lock(self):
+        if self._fd is None:
+            yield
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _header(self):
+        return _HEADER.unpack_from(self._map, 0)
+
+    def _generation(self):
+        return self._header()[2]
+
+    def _version(self, bucket: int):
+        return _VERSION.unpack_from(self._map, _HEADER.size + bucket * _VERSION.size)[0]
+
+    def _shared_stat(self, stat: str):
+        offset = _STATS_OFFSET + _SHARED_STAT_NAMES.index(stat) * 8
+        return struct.unpack_from("<Q", self._map, offset)[0]
+
+    def _bump(self, stat: str):
+        offset = _STATS_OFFSET + _SHARED_STAT_NAMES.index(stat) * 8
+        (value,) = struct.unpack_from("<Q", self._map, offset)
+        struct.pack_into("<Q", self._map, offset, value + 1)
+
+    def _window(self, event_id: int):
+        start = (event_id * 2654435761) % self.slots
+        return [(start + step) % self.slots for step in range(_WINDOW)]
+
+    def _slot_offset(self, slot: int):
+        return self._slots_offset + slot * _SLOT.size
+
+    def _read_slot(self, slot: int):
+        offset = self._slot_offset(slot)
+        for _ in range(_READ_RETRIES):
+            entry = _SLOT.unpack_from(self._map, offset)
+            if not entry[0] & 1 and _SEQUENCE.unpack_from(self._map, offset)[0] == entry[0]:
+                return entry
+        return None
+
+    def _write_slot(self, slot: int, entry):
+        # Odd while the slot is rewritten; `| 1` also recovers a slot left
+        # odd by a writer that died halfway.
+        offset = self._slot_offset(slot)
+        sequence = _SEQUENCE.unpack_from(self._map, offset)[0] | 1
+        _SEQUENCE.pack_into(self._map, offset, sequence)
+        _SLOT.pack_into(self._map, offset, sequence, *entry)
+        _SEQUENCE.pack_into(self._map, offset, sequence + 1)
+
+
+def _init_table(table: mmap.mmap, slots: int):
+    table[:] = bytes(len(table))
+    _HEADER.pack_into(table, 0, _MAGIC, slots, 1, 0, 0, 0)
+
+
+def _to_slot(metadata: EventMetadata, generation: int, expires_at: float):
+    flags = _USED
+    if metadata.exists:
+        flags |= _EXISTS
+    if metadata.first_pool_id is not None:
+        flags |= _HAS_POOLS
+
+    event_time = 0.0
+    if metadata.event_time is not None:
+        event_time = _as_utc(metadata.event_time).timestamp()
+
+    return (
+        metadata.event_id,
+        generation,
+        flags,
+        expires_at,
+        float(metadata.ticket_price),
+        event_time,
+        metadata.first_pool_id or 0,
+        metadata.last_pool_id or 0,
+    )
+
+
+def _to_metadata(entry):
+    _, event_id, _, flags, _, ticket_price, event_time, first_pool_id, last_pool_id = entry
+    if not flags & _EXISTS:
+        return EventMetadata(event_id=event_id, exists=False)
+
+    has_pools = bool(flags & _HAS_POOLS)
+    return EventMetadata(
+        event_id=event_id,
+        exists=True,
+        ticket_price=ticket_price,
+        event_time=datetime.fromtimestamp(event_time, timezone.utc),
+        first_pool_id=first_pool_id if has_pools else None,
+        last_pool_id=last_pool_id if has_pools else None,
+    )
+
+
+def _as_utc(value: datetime):
+    # MySQL DATETIME columns come back naive but hold UTC.
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+event_cache = EventMetadataCache()
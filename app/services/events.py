@@ -1,46 +1,205 @@
+from pydantic import ValidationError
+
+from app.core.config import (
+    POOL_BATCH_SIZE,
+    EVENT_BATCH_CHUNK_SIZE,
+    AVAILABILITY_APPROXIMATE_ABOVE,
+    AVAILABILITY_APPROXIMATE_STEP,
+)
+from app.core.drivers import driven
 from app.exceptions import ApiBaseException
 from app.models.events import Event, EventTicketPool
 from app.repositories.events import EventRepository
-from app.schemas.events import EventCreate, EventSuccessResponse
+from app.schemas.events import (
+    EventCreate,
+    EventSuccessResponse,
+    EventPoolLayoutResponse,
+    EventAvailabilityResponse,
+    PoolLayoutEntry,
+    EventBatchCreate,
+    EventBatchItemResult,
+    EventBatchResponse,
+)
+from app.services.availability import availability_index
+from app.services.event_cache import event_cache
+from app.services.inventory import inventory_backend
+from app.services.resharding import pool_contention
 
 
 class EventService:
+    """Creates and looks up events on the repository's session. Methods
+    return their result on a sync session and an awaitable on an async one."""
 
     def __init__(self, repo: EventRepository):
         self.repo = repo
+        self.run = repo.run
 
 
+    @driven
     def create_event(self, event_data: EventCreate, owner_id: int):
 
         try:
-            pool_list = []
-            curr_tickets = event_data.pool_size
-
-            while curr_tickets > 0:
-                curr_batch_size = min(1000, curr_tickets)
-                curr_tickets -= curr_batch_size
-                
-                pool = EventTicketPool(ticket_count=curr_batch_size)
-                pool_list.append(pool)
-
-            new_event = Event(
-                name=event_data.name,
-                address=event_data.address,
-                event_time=event_data.event_time,
-                pool_size=event_data.pool_size,
-                ticket_price=event_data.ticket_price,
-                owner_id=owner_id,
-                pools=pool_list
-            )
-
-            saved_event = self.repo.save_event_with_pool(new_event, pool_list)
+            new_event, pool_list = build_event_with_pools(event_data, owner_id)
+
+            saved_event = yield self.repo.save_event_with_pool(new_event, pool_list)
+            # Drop a negative entry cached for this id before it existed.
+            event_cache.invalidate(saved_event.id)
 
             return EventSuccessResponse(event_id=saved_event.id,
                                         event_name=saved_event.name)
         except Exception as e:
             raise ApiBaseException("failed to create event, service unavailable", status_code=503)
 
+    @driven
+    def create_events_batch(self, batch: EventBatchCreate, owner_id: int):
+        results = []
+
+        for chunk_start in range(0, len(batch.events), EVENT_BATCH_CHUNK_SIZE):
+            chunk = batch.events[chunk_start:chunk_start + EVENT_BATCH_CHUNK_SIZE]
+            valid_events, chunk_results = _validate_event_chunk(chunk, chunk_start)
+
+            if valid_events:
+                try:
+                    saved = yield self.repo.save_events_with_pools(
+                        [_build_event(event_data, owner_id) for _, event_data in valid_events],
+                        [split_into_pools(event_data.pool_size) for _, event_data in valid_events]
+                    )
+                    for (index, _), (event_id, event_name) in zip(valid_events, saved):
+                        event_cache.invalidate(event_id)
+                        chunk_results[index - chunk_start] = EventBatchItemResult(
+                            index=index, success=True, event_id=event_id, event_name=event_name
+                        )
+                except Exception:
+                    yield self.repo.rollback()
+                    for index, _ in valid_events:
+                        chunk_results[index - chunk_start] = EventBatchItemResult(
+                            index=index, success=False, message="failed to create event, service unavailable"
+                        )
+
+            results.extend(chunk_results)
+
+        created_count = sum(1 for result in results if result.success)
+        return EventBatchResponse(created_count=created_count,
+                                  failed_count=len(results) - created_count,
+                                  results=results)
+
+    @driven
+    def get_pool_layout(self, event_id: int):
+        pools = yield self.repo.get_pool_layout(event_id)
+        return _pool_layout_response(event_id, pools)
+
+    @driven
+    def get_availability(self, event_id: int):
+        remaining = _cached_remaining(event_id)
+
+        if remaining is None:
+            remaining = yield self.repo.get_tickets_remaining(event_id)
+            _store_remaining(event_id, remaining)
+
+        return _availability_response(event_id, remaining)
+
+
+def split_into_pools(pool_size: int):
+    pool_counts = []
+    curr_tickets = pool_size
+
+    while curr_tickets > 0:
+        curr_batch_size = min(POOL_BATCH_SIZE, curr_tickets)
+        curr_tickets -= curr_batch_size
+        pool_counts.append(curr_batch_size)
+
+    return pool_counts
+
+
+def build_event_with_pools(event_data: EventCreate, owner_id: int):
+    pool_list = [EventTicketPool(ticket_count=ticket_count) for ticket_count in split_into_pools(event_data.pool_size)]
+
+    new_event = _build_event(event_data, owner_id)
+    new_event.pools = pool_list
+
+    return new_event, pool_list
+
+
+def _build_event(event_data: EventCreate, owner_id: int):
+    return Event(
+        name=event_data.name,
+        address=event_data.address,
+        event_time=event_data.event_time,
+        pool_size=event_data.pool_size,
+        ticket_price=event_data.ticket_price,
+        owner_id=owner_id
+    )
+
+
+def _validate_event_chunk(chunk, chunk_start: int):
+    valid_events = []
+    results = []
+
+    for offset, item in enumerate(chunk):
+        index = chunk_start + offset
+        try:
+            valid_events.append((index, EventCreate.model_validate(item)))
+            results.append(None)
+        except ValidationError as e:
+            results.append(EventBatchItemResult(
+                index=index,
+                success=False,
+                message="invalid event",
+                errors=e.errors(include_url=False, include_context=False)
+            ))
+
+    return valid_events, results
+
+
+def _pool_layout_response(event_id: int, pools):
+    if not pools:
+        raise ApiBaseException(f"Event with ID {event_id} not found", status_code=404)
+
+    bookings_per_second, failed_pool_attempts = pool_contention.snapshot(event_id)
+
+    return EventPoolLayoutResponse(
+        event_id=event_id,
+        pool_count=len(pools),
+        tickets_remaining=sum(pool.ticket_count for pool in pools),
+        bookings_per_second=bookings_per_second,
+        failed_pool_attempts=failed_pool_attempts,
+        pools=[PoolLayoutEntry(pool_id=pool.id, ticket_count=pool.ticket_count) for pool in pools]
+    )
+
+
+def _cached_remaining(event_id: int):
+    metadata = event_cache.get(event_id)
+    if metadata is not None and not metadata.exists:
+        _raise_event_not_found(event_id)
+
+    # The memory backend's counters are ahead of the pool rows until the
+    # next flush.
+    if inventory_backend is not None and inventory_backend.is_loaded(event_id):
+        return inventory_backend.available(event_id)
+
+    return availability_index.remaining(event_id)
+
+
+def _store_remaining(event_id: int, remaining: int | None):
+    if remaining is None:
+        _raise_event_not_found(event_id)
+    availability_index.store_remaining(event_id, remaining)
+
 
+def _availability_response(event_id: int, remaining: int):
+    # Rounding large counts down keeps the value, and with it the ETag,
+    # stable while a big sale moves it by a few seats per request.
+    approximate = remaining >= AVAILABILITY_APPROXIMATE_ABOVE and AVAILABILITY_APPROXIMATE_STEP > 1
+    if approximate:
+        remaining -= remaining % AVAILABILITY_APPROXIMATE_STEP
 
+    return EventAvailabilityResponse(
+        event_id=event_id,
+        tickets_remaining=remaining,
+        sold_out=remaining == 0,
+        approximate=approximate
+    )
 
 
+def _raise_event_not_found(event_id: int):
+    raise ApiBaseException(f"Event with ID {event_id} not found", status_code=404)
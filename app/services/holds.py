@@ -0,0 +1,180 @@
+import logging
+import threading
+from collections import defaultdict
+
+from app.core.config import HOLD_SWEEP_INTERVAL_SECONDS, HOLD_SWEEP_BATCH_SIZE
+from app.core.db import session
+from app.core.utils import get_utc_now
+from app.repositories.holds import HoldRepository
+from app.repositories.tickets import TicketRepository
+from app.services.availability import AvailabilityIndex, availability_index
+from app.services.inventory import InMemoryInventory, LedgerCompactor, inventory_backend, ledger_compactor
+
+
+logger = logging.getLogger(__name__)
+
+
+class HoldSweeper:
+    """Background thread that cancels holds nobody confirmed in time.
+
+    Expired holds are read through ``ix_tickets_status_expires_at``,
+    ``batch_size`` at a time. Each batch is released in one transaction with
+    a fixed number of statements however many tickets it holds: one UPDATE
+    of the tickets, one executemany over the holdings rows and one over the
+    pools the seats came from.
+    """
+
+    def __init__(self, session_factory=session, inventory: InMemoryInventory | None = inventory_backend,
+                 availability: AvailabilityIndex = availability_index,
+                 interval: float = HOLD_SWEEP_INTERVAL_SECONDS, batch_size: int = HOLD_SWEEP_BATCH_SIZE,
+                 ledger: LedgerCompactor | None = ledger_compactor):
+        self.session_factory = session_factory
+        self.inventory = inventory
+        self.ledger = ledger
+        self.availability = availability
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hold-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sweep_once(self):
+        now = get_utc_now()
+        released = 0
+
+        while not self._stop.is_set():
+            swept = self.sweep_batch(now)
+            released += swept
+            if swept < self.batch_size:
+                break
+
+        return released
+
+    def sweep_batch(self, now):
+        with self.session_factory() as db:
+            repo = HoldRepository(db)
+            try:
+                holds = repo.get_expired_holds(now, self.batch_size)
+                if not holds:
+                    repo.rollback()
+                    return 0
+
+                if self.ledger is not None:
+                    return self._release_to_ledger(db, repo, holds)
+
+                event_ids = {hold.event_id for hold in holds}
+                in_memory = set()
+                if self.inventory is not None:
+                    in_memory = self._load_inventory(TicketRepository(db), event_ids)
+
+                returned, unallocated = _seat_returns(holds, repo.get_allocations([hold.id for hold in holds]))
+
+                repo.expire_holds([hold.id for hold in holds])
+                repo.release_user_quotas(_holding_counts(holds))
+
+                # Seats whose pool is gone go back to the event's first pool.
+                in_db = {event_id: unallocated[event_id] for event_id in unallocated if event_id not in in_memory}
+                if in_db:
+                    for event_id, pool_id in repo.get_first_pool_ids(in_db).items():
+                        returned[event_id][pool_id] += in_db[event_id]
+
+                pool_counts = {
+                    pool_id: count
+                    for event_id, pools in returned.items() if event_id not in in_memory
+                    for pool_id, count in pools.items()
+                }
+                if pool_counts:
+                    repo.return_tickets_to_pools(pool_counts)
+
+                repo.commit()
+            except Exception:
+                repo.rollback()
+                raise
+
+        for event_id in in_memory:
+            self.inventory.release(event_id, list(returned[event_id].items()))
+            if event_id in unallocated:
+                self.inventory.release_to_random_pool(event_id, unallocated[event_id])
+        for event_id, pools in returned.items():
+            if event_id not in in_memory:
+                for pool_id, count in pools.items():
+                    self.availability.record_release(event_id, pool_id, count)
+
+        return len(holds)
+
+    def _release_to_ledger(self, db, repo: HoldRepository, holds):
+        # Ledger mode: one entry per event gives the seats back to its first
+        # pool, whichever pools they came from. The caller rolls back on
+        # failure.
+        repo.expire_holds([hold.id for hold in holds])
+        repo.release_user_quotas(_holding_counts(holds))
+
+        seats = defaultdict(int)
+        for hold in holds:
+            seats[hold.event_id] += hold.count
+        returned = {
+            (event_id, pool_id): seats[event_id] for event_id, pool_id in repo.get_first_pool_ids(list(seats)).items()
+        }
+        if returned:
+            TicketRepository(db).append_ledger_entries(returned)
+        repo.commit()
+
+        for event_id in seats:
+            self.availability.invalidate(event_id)
+        return len(holds)
+
+    def _load_inventory(self, repo: TicketRepository, event_ids):
+        # Loaded before the status change, as in cancel_ticket, so the rebuilt
+        # counts don't already include the seats this batch returns.
+        for event_id in event_ids:
+            if not self.inventory.is_loaded(event_id):
+                pool_counts, remaining = repo.get_event_inventory(event_id)
+                self.inventory.load_event(event_id, pool_counts, remaining)
+
+        return {event_id for event_id in event_ids if self.inventory.is_loaded(event_id)}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep_once()
+            except Exception:
+                logger.exception("sweeping expired holds failed")
+
+
+def _seat_returns(holds, allocations):
+    # Seats to return per event and pool, and per event the seats of holds
+    # with no allocation left to return them by.
+    event_ids = {hold.id: hold.event_id for hold in holds}
+    returned = defaultdict(lambda: defaultdict(int))
+    unallocated = defaultdict(int)
+
+    for hold in holds:
+        unallocated[hold.event_id] += hold.count
+    for ticket_id, pool_id, count in allocations:
+        if pool_id is not None:
+            event_id = event_ids[ticket_id]
+            returned[event_id][pool_id] += count
+            unallocated[event_id] -= count
+
+    return returned, {event_id: count for event_id, count in unallocated.items() if count}
+
+
+def _holding_counts(holds):
+    counts = defaultdict(int)
+    for hold in holds:
+        counts[(hold.user_id, hold.event_id)] += hold.count
+    return counts
+
+
+hold_sweeper = HoldSweeper() if HOLD_SWEEP_INTERVAL_SECONDS > 0 else None
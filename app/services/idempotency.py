@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+import orjson
+from cachetools import TTLCache
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+from app.core.config import (
+    DB_MODE,
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_MAX_KEYS,
+    IDEMPOTENCY_SHARED,
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS,
+)
+from app.core.db import session, async_session
+from app.core.responses import error_response
+from app.core.utils import get_utc_now
+from app.exceptions import ApiBaseException
+from app.repositories.idempotency import IdempotencyRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+# Outcomes a retry may legitimately change (conflicts, shedding and server
+# errors) are not replayed.
+RETRYABLE_STATUS_CODES = (409, 429)
+
+# Expired rows of the shared table are deleted at most this often per
+# worker, this many per statement.
+_PURGE_INTERVAL_SECONDS = 60
+_PURGE_BATCH_SIZE = 1000
+
+
+class _IdempotentRequest:
+
+    __slots__ = ("fingerprint", "future")
+
+    def __init__(self, fingerprint, future: asyncio.Future):
+        self.fingerprint = fingerprint
+        self.future = future
+
+
+class IdempotencyStore:
+    """Remembers the outcome of requests sent with an ``Idempotency-Key``.
+
+    The first request for a key runs; a retry with the same key gets the
+    stored result (or error) back without touching the DB, and a duplicate
+    that arrives while the first is still running waits for it. ``call``
+    returns the rendered response, so a replay is the same response down to
+    its headers. Keys are
+    kept for ``ttl`` seconds, at most ``maxsize`` of them, in this process.
+    With ``shared`` keys the other workers' outcomes are looked up there as
+    well before a request runs.
+    """
+
+    def __init__(self, ttl: float = IDEMPOTENCY_TTL_SECONDS, maxsize: int = IDEMPOTENCY_MAX_KEYS,
+                 shared: "SharedIdempotencyKeys | None" = None):
+        self._requests = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        self.replayed = 0
+        self.joined = 0
+
+    async def run(self, key, fingerprint, call):
+        request = self._requests.get(key)
+
+        if request is not None:
+            if request.fingerprint != fingerprint:
+                raise ApiBaseException(message="Idempotency-Key was already used for a different request",
+                                       status_code=422)
+            if request.future.done():
+                self.replayed += 1
+            else:
+                self.joined += 1
+            return await asyncio.shield(request.future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._requests[key] = _IdempotentRequest(fingerprint, future)
+
+        try:
+            if self.shared is not None:
+                result = await self.shared.run(key, fingerprint, call)
+            else:
+                result = await call()
+        except ApiBaseException as e:
+            if e.status_code in RETRYABLE_STATUS_CODES or e.status_code >= 500:
+                self._forget(key, future)
+            _set_exception(future, e)
+            raise
+        except Exception as e:
+            self._forget(key, future)
+            _set_exception(future, e)
+            raise
+        except BaseException:
+            self._forget(key, future)
+            _set_exception(future, ApiBaseException(message="The original request was interrupted, please retry",
+                                                    status_code=409))
+            raise
+
+        future.set_result(result)
+        return result
+
+    def stats(self):
+        stats = {
+            "keys": len(self._requests),
+            "replayed": self.replayed,
+            "joined": self.joined
+        }
+        if self.shared is not None:
+            stats["shared"] = self.shared.stats()
+        return stats
+
+    def _forget(self, key, future: asyncio.Future):
+        request = self._requests.get(key)
+        if request is not None and request.future is future:
+            del self._requests[key]
+
+
+class SharedIdempotencyKeys:
+    """Claims idempotency keys in the ``idempotency_keys`` table, for workers
+    that don't share memory.
+
+    The first request for a key inserts its row and stores its outcome there
+    once it has one: the rendered response its call returned, or the error
+    response its exception renders to, status, headers and body. A request
+    that finds a finished row replays that response as it was; one that
+    finds it still running elsewhere gets a 409 to retry. Outcomes that
+    aren't replayed give the key up again.
+    """
+
+    def __init__(self, session_factory=None, mode: str = DB_MODE, ttl: float = IDEMPOTENCY_TTL_SECONDS,
+                 pending_timeout: float = IDEMPOTENCY_PENDING_TIMEOUT_SECONDS):
+        self.mode = mode
+        self.session_factory = session_factory or (async_session if mode == "async" else session)
+        self.ttl = ttl
+        self.pending_timeout = pending_timeout
+        self.replayed = 0
+        self.in_progress = 0
+        self._purged_at = time.monotonic()
+
+    async def run(self, key, fingerprint, call):
+        user_id, idempotency_key = key
+        fingerprint = orjson.dumps(fingerprint).decode()
+        now = get_utc_now()
+
+        stored = await self._execute(
+            "claim", user_id, idempotency_key, fingerprint, now, now + timedelta(seconds=self.ttl),
+            now - timedelta(seconds=self.pending_timeout)
+        )
+        if stored is not None:
+            return self._replay(stored, fingerprint)
+
+        try:
+            response = await call()
+        except ApiBaseException as e:
+            if e.status_code in RETRYABLE_STATUS_CODES or e.status_code >= 500:
+                await self._execute("forget", user_id, idempotency_key)
+            else:
+                # What the exception handler sends for it.
+                error = error_response(e.message, e.status_code, e.details, e.headers)
+                await self._execute("complete", user_id, idempotency_key, e.status_code, _stored_response(error))
+            raise
+        except Exception:
+            # A cancelled request can't await anything any more, so its
+            # claim is left to the pending timeout.
+            await self._execute("forget", user_id, idempotency_key)
+            raise
+
+        await self._execute("complete", user_id, idempotency_key, response.status_code, _stored_response(response))
+        await self._purge_expired()
+        return response
+
+    def stats(self):
+        return {
+            "replayed": self.replayed,
+            "in_progress": self.in_progress
+        }
+
+    def _replay(self, stored, fingerprint: str):
+        stored_fingerprint, status_code, response = stored
+        if stored_fingerprint != fingerprint:
+            raise ApiBaseException(message="Idempotency-Key was already used for a different request",
+                                   status_code=422)
+        if status_code is None:
+            self.in_progress += 1
+            raise ApiBaseException(message="A request with this Idempotency-Key is still in progress, please retry",
+                                   status_code=409)
+
+        self.replayed += 1
+        return _replayed_response(status_code, response)
+
+    async def _purge_expired(self):
+        now = time.monotonic()
+        if now - self._purged_at < _PURGE_INTERVAL_SECONDS:
+            return
+        self._purged_at = now
+        try:
+            await self._execute("purge_expired", get_utc_now(), _PURGE_BATCH_SIZE)
+        except Exception:
+            logger.exception("purging expired idempotency keys failed")
+
+    async def _execute(self, operation: str, *args):
+        if self.mode == "async":
+            async with self.session_factory() as db:
+                return await getattr(IdempotencyRepository(db), operation)(*args)
+        return await run_in_threadpool(self._execute_sync, operation, *args)
+
+    def _execute_sync(self, operation: str, *args):
+        with self.session_factory() as db:
+            return getattr(IdempotencyRepository(db), operation)(*args)
+
+
+def _stored_response(response: Response):
+    return orjson.dumps({"headers": dict(response.headers), "body": response.body.decode()}).decode()
+
+
+def _replayed_response(status_code: int, stored: str):
+    # The stored headers carry the original content type and length.
+    envelope = orjson.loads(stored)
+    return Response(envelope["body"], status_code=status_code, headers=envelope["headers"])
+
+
+def _set_exception(future: asyncio.Future, error: BaseException):
+    future.set_exception(error)
+    # Mark it retrieved so an outcome nobody waited for isn't logged.
+    future.exception()
+
+
+idempotency_store = IdempotencyStore(shared=SharedIdempotencyKeys() if IDEMPOTENCY_SHARED else None)
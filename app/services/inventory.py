@@ -0,0 +1,284 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+
+from app.core.config import (
+    INVENTORY_BACKEND,
+    INVENTORY_FLUSH_INTERVAL_SECONDS,
+    LEDGER_COMPACT_INTERVAL_SECONDS,
+    LEDGER_COMPACT_BATCH_SIZE,
+)
+from app.core.db import session
+from app.repositories.inventory import InventoryRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+class _EventInventory:
+
+    __slots__ = ("lock", "pools")
+
+    def __init__(self, pools):
+        self.lock = threading.Lock()
+        self.pools = pools
+
+
+class InMemoryInventory:
+    """Holds each event's pool counts in process memory.
+
+    Bookings and cancellations only touch the in-memory counters under a
+    per-event lock; the net change per pool is queued and written back to
+    ``event_ticket_pools`` by a background flusher thread.
+    """
+
+    def __init__(self, session_factory=session, flush_interval: float = INVENTORY_FLUSH_INTERVAL_SECONDS):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+
+        self._events = {}
+        self._events_lock = threading.Lock()
+
+        self._deltas = defaultdict(int)
+        self._deltas_lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def start(self):
+        self.load_upcoming_events()
+        self._stop.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="inventory-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    def is_loaded(self, event_id: int):
+        return event_id in self._events
+
+    def load_event(self, event_id: int, pool_counts, remaining: int | None):
+        if not pool_counts:
+            return
+
+        loaded = dict(pool_counts)
+        pools = dict(loaded)
+        if remaining is not None:
+            self._reconcile(pools, remaining)
+
+        with self._events_lock:
+            if event_id in self._events:
+                return
+            self._events[event_id] = _EventInventory(pools)
+
+        for pool_id, count in pools.items():
+            if count != loaded[pool_id]:
+                self._queue_delta(pool_id, count - loaded[pool_id])
+
+    def load_upcoming_events(self):
+        with self.session_factory() as db:
+            repo = InventoryRepository(db)
+            pool_counts = repo.get_pool_counts_for_upcoming_events()
+            remaining = repo.get_remaining_for_upcoming_events()
+
+        for event_id, pools in pool_counts.items():
+            self.load_event(event_id, pools, remaining.get(event_id))
+
+    def reserve(self, event_id: int, ticket_count: int):
+        inventory = self._events[event_id]
+
+        with inventory.lock:
+            candidates = [pool_id for pool_id, count in inventory.pools.items() if count > 0]
+            if sum(inventory.pools[pool_id] for pool_id in candidates) < ticket_count:
+                return None
+
+            random.shuffle(candidates)
+            allocations = []
+            required_ticket_count = ticket_count
+
+            for pool_id in candidates:
+                if required_ticket_count == 0:
+                    break
+                taken = min(inventory.pools[pool_id], required_ticket_count)
+                inventory.pools[pool_id] -= taken
+                required_ticket_count -= taken
+                allocations.append((pool_id, taken))
+
+        for pool_id, taken in allocations:
+            self._queue_delta(pool_id, -taken)
+        return allocations
+
+    def release(self, event_id: int, allocations):
+        inventory = self._events[event_id]
+
+        with inventory.lock:
+            for pool_id, count in allocations:
+                inventory.pools[pool_id] = inventory.pools.get(pool_id, 0) + count
+
+        for pool_id, count in allocations:
+            self._queue_delta(pool_id, count)
+
+    def release_to_random_pool(self, event_id: int, ticket_count: int):
+        inventory = self._events[event_id]
+        pool_id = random.choice(list(inventory.pools))
+        self.release(event_id, [(pool_id, ticket_count)])
+
+    def available(self, event_id: int):
+        inventory = self._events[event_id]
+        with inventory.lock:
+            return sum(inventory.pools.values())
+
+    def flush(self):
+        with self._deltas_lock:
+            deltas = {pool_id: delta for pool_id, delta in self._deltas.items() if delta}
+            self._deltas.clear()
+
+        if not deltas:
+            return
+
+        try:
+            with self.session_factory() as db:
+                InventoryRepository(db).apply_pool_deltas(deltas)
+        except Exception:
+            logger.exception("inventory flush failed, re-queueing %d pool deltas", len(deltas))
+            for pool_id, delta in deltas.items():
+                self._queue_delta(pool_id, delta)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _queue_delta(self, pool_id: int, delta: int):
+        with self._deltas_lock:
+            self._deltas[pool_id] += delta
+
+    @staticmethod
+    def _reconcile(pools, remaining: int):
+        # Deltas lost in a crash leave the pool rows out of step with the
+        # tickets table; trust `pool_size - active tickets` and correct the
+        # pools towards it.
+        drift = sum(pools.values()) - max(remaining, 0)
+
+        for pool_id in sorted(pools, key=pools.get, reverse=True):
+            if drift <= 0:
+                break
+            taken = min(pools[pool_id], drift)
+            pools[pool_id] -= taken
+            drift -= taken
+
+        if drift < 0:
+            first_pool_id = min(pools)
+            pools[first_pool_id] -= drift
+
+
+class LedgerCompactor:
+    """Folds the seat ledger of INVENTORY_BACKEND=ledger into the pool rows.
+
+    In ledger mode bookings, cancellations and expired holds never update
+    ``event_ticket_pools``; they append signed seat counts for one pool to
+    ``event_inventory_ledger``, and a pool's seats left are its row's count
+    plus its entries. Every ``interval`` seconds the pools of the oldest
+    ``batch_size`` entries are locked, their entries summed per pool, applied
+    to the pool rows and deleted in one transaction, which keeps each pool's
+    total unchanged and the ledger short.
+    """
+
+    def __init__(self, session_factory=session, interval: float = LEDGER_COMPACT_INTERVAL_SECONDS,
+                 batch_size: int = LEDGER_COMPACT_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.batch_size = batch_size
+
+        self.entries_folded = 0
+        self.last_duration = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ledger-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {
+            "entries_folded": self.entries_folded,
+            "last_duration_seconds": self.last_duration
+        }
+
+    def compact_once(self):
+        started_at = time.perf_counter()
+        folded = 0
+
+        while True:
+            compacted = self.compact_batch()
+            folded += compacted
+            if compacted < self.batch_size or self._stop.is_set():
+                break
+
+        self.last_duration = round(time.perf_counter() - started_at, 3)
+        return folded
+
+    def compact_batch(self):
+        with self.session_factory() as db:
+            repo = InventoryRepository(db)
+            try:
+                pool_ids = repo.get_ledger_pool_ids(self.batch_size)
+                if not pool_ids:
+                    db.rollback()
+                    return 0
+
+                pool_counts = repo.lock_pools(pool_ids)
+                entries = repo.get_ledger_entries(pool_ids)
+
+                deltas = defaultdict(int)
+                for _, pool_id, delta in entries:
+                    deltas[pool_id] += delta
+
+                # Bookings never overdraw a pool, so no fold can take one below
+                # zero; should one anyway, its entries stay. A pool whose row
+                # is gone has nothing to fold into and its entries are dropped.
+                folded = {
+                    pool_id for pool_id, delta in deltas.items()
+                    if pool_id not in pool_counts or pool_counts[pool_id] + delta >= 0
+                }
+                pool_deltas = {
+                    pool_id: deltas[pool_id] for pool_id in folded
+                    if pool_id in pool_counts and deltas[pool_id]
+                }
+                entry_ids = [entry_id for entry_id, pool_id, _ in entries if pool_id in folded]
+
+                if pool_deltas:
+                    repo.apply_pool_deltas(pool_deltas, commit=False)
+                if entry_ids:
+                    repo.delete_ledger_entries(entry_ids)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+        self.entries_folded += len(entry_ids)
+        return len(entry_ids)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.compact_once()
+            except Exception:
+                logger.exception("compacting the inventory ledger failed")
+
+
+inventory_backend = InMemoryInventory() if INVENTORY_BACKEND == "memory" else None
+ledger_compactor = LedgerCompactor() if INVENTORY_BACKEND == "ledger" else None
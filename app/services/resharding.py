@@ -0,0 +1,229 @@
+import logging
+import math
+import threading
+import time
+
+from app.core.config import (
+    API_WORKERS,
+    INVENTORY_BACKEND,
+    POOL_RESHARDING_ENABLED,
+    POOL_RESHARD_INTERVAL_SECONDS,
+    POOL_TARGET_BOOKINGS_PER_SECOND,
+    POOL_MERGE_BELOW_TICKETS,
+    POOL_MIN_SPLIT_TICKETS,
+    POOL_MAX_PER_EVENT,
+)
+from app.core.db import session
+from app.core.metrics import BOOKING_POOL_ATTEMPTS
+from app.repositories.events import EventRepository
+from app.services.availability import availability_index
+from app.services.event_cache import event_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+class _EventContention:
+
+    __slots__ = ("bookings", "failed_attempts")
+
+    def __init__(self):
+        self.bookings = 0
+        self.failed_attempts = 0
+
+
+class PoolContentionTracker:
+    """Counts successful and failed pool decrements per event since the
+    last time the resharder drained it.
+
+    Only the resharder drains it, so without one (``enabled`` false) no
+    per-event counts are kept at all; the attempts metric still is.
+
+    Each of ``workers`` processes only sees its own bookings, so rates are
+    scaled up to the whole API assuming an even spread; every worker's
+    resharder then converges on the same pool layout.
+    """
+
+    def __init__(self, workers: int = API_WORKERS, enabled: bool = True):
+        self.workers = workers
+        self.enabled = enabled
+        self._events = {}
+        self._window_started_at = time.monotonic()
+        self._last_window = ({}, 0.0)
+        self._lock = threading.Lock()
+
+    def record(self, event_id: int, succeeded: bool):
+        BOOKING_POOL_ATTEMPTS.labels("hit" if succeeded else "miss").inc()
+        if not self.enabled:
+            return
+        with self._lock:
+            contention = self._events.get(event_id)
+            if contention is None:
+                contention = self._events[event_id] = _EventContention()
+            if succeeded:
+                contention.bookings += 1
+            else:
+                contention.failed_attempts += 1
+
+    def drain(self):
+        with self._lock:
+            events, self._events = self._events, {}
+            now = time.monotonic()
+            elapsed, self._window_started_at = now - self._window_started_at, now
+            self._last_window = (events, elapsed)
+        return events, elapsed
+
+    def snapshot(self, event_id: int):
+        # Rates come from the last drained window once the resharder has run,
+        # otherwise from everything recorded so far.
+        with self._lock:
+            events, elapsed = self._last_window
+            if not elapsed:
+                events, elapsed = self._events, time.monotonic() - self._window_started_at
+            contention = events.get(event_id)
+
+        if contention is None:
+            return 0.0, 0
+        return self.rate(contention, elapsed), contention.failed_attempts
+
+    def rate(self, contention: _EventContention, elapsed: float):
+        return contention.bookings / max(elapsed, 1e-9) * self.workers
+
+
+class PoolResharder:
+    """Background thread that reshapes the pool rows of recently booked
+    events without changing their total inventory.
+
+    * Pools of events booked faster than ``target_rate`` bookings/s per
+      non-empty pool are split, largest first, into more rows.
+    * Pools holding fewer than ``merge_below`` seats are folded into one,
+      and empty pools are deleted (one row is always kept so cancellations
+      have somewhere to return seats).
+    """
+
+    def __init__(self, tracker: PoolContentionTracker, session_factory=session,
+                 interval: float = POOL_RESHARD_INTERVAL_SECONDS,
+                 target_rate: float = POOL_TARGET_BOOKINGS_PER_SECOND,
+                 merge_below: int = POOL_MERGE_BELOW_TICKETS,
+                 min_split_tickets: int = POOL_MIN_SPLIT_TICKETS,
+                 max_pools: int = POOL_MAX_PER_EVENT):
+        self.tracker = tracker
+        self.session_factory = session_factory
+        self.interval = interval
+        self.target_rate = target_rate
+        self.merge_below = merge_below
+        self.min_split_tickets = min_split_tickets
+        self.max_pools = max_pools
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pool-resharder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reshard_once(self):
+        events, elapsed = self.tracker.drain()
+
+        for event_id, contention in events.items():
+            try:
+                self.reshard_event(event_id, self.tracker.rate(contention, elapsed))
+            except Exception:
+                logger.exception("resharding pools of event %s failed", event_id)
+
+    def reshard_event(self, event_id: int, bookings_per_second: float):
+        with self.session_factory() as db:
+            repo = EventRepository(db)
+            try:
+                pools = {pool_id: ticket_count for pool_id, ticket_count in repo.get_pool_layout(event_id, for_update=True)}
+                if not pools:
+                    return
+
+                changed = self._merge(repo, event_id, pools)
+                changed = self._split(repo, event_id, pools, bookings_per_second) or changed
+
+                if changed:
+                    repo.commit()
+                    availability_index.invalidate(event_id)
+                    event_cache.invalidate(event_id)
+                else:
+                    repo.rollback()
+            except Exception:
+                repo.rollback()
+                raise
+
+    def _merge(self, repo: EventRepository, event_id: int, pools: dict):
+        changed = False
+        near_empty = [pool_id for pool_id, ticket_count in pools.items() if 0 < ticket_count < self.merge_below]
+
+        if len(near_empty) > 1:
+            target_pool_id = near_empty[0]
+            pools[target_pool_id] = sum(pools[pool_id] for pool_id in near_empty)
+            repo.set_pool_ticket_count(target_pool_id, pools[target_pool_id])
+            for pool_id in near_empty[1:]:
+                pools[pool_id] = 0
+                repo.set_pool_ticket_count(pool_id, 0)
+            changed = True
+
+        empty = [pool_id for pool_id, ticket_count in pools.items() if ticket_count == 0]
+        if len(empty) == len(pools):
+            empty = empty[1:]
+        if empty:
+            repo.delete_pools(empty)
+            for pool_id in empty:
+                del pools[pool_id]
+            changed = True
+
+        return changed
+
+    def _split(self, repo: EventRepository, event_id: int, pools: dict, bookings_per_second: float):
+        non_empty = {pool_id: ticket_count for pool_id, ticket_count in pools.items() if ticket_count > 0}
+        total_tickets = sum(non_empty.values())
+
+        wanted = min(
+            math.ceil(bookings_per_second / self.target_rate),
+            self.max_pools,
+            total_tickets // self.min_split_tickets
+        )
+        extra_pools = wanted - len(non_empty)
+        if extra_pools <= 0:
+            return False
+
+        new_pools = []
+        for pool_id in sorted(non_empty, key=non_empty.get, reverse=True):
+            if extra_pools <= 0:
+                break
+            ticket_count = non_empty[pool_id]
+            parts = min(extra_pools + 1, ticket_count // self.min_split_tickets)
+            if parts < 2:
+                break
+
+            part_size = ticket_count // parts
+            remainder = ticket_count - part_size * (parts - 1)
+            repo.set_pool_ticket_count(pool_id, remainder)
+            new_pools.extend([part_size] * (parts - 1))
+            extra_pools -= parts - 1
+
+        if not new_pools:
+            return False
+
+        repo.add_pools(event_id, new_pools)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.reshard_once()
+
+
+# Re-sharding rewrites pool rows underneath the in-memory counters, so it only
+# runs when the pool rows themselves are the live inventory. Without it
+# nothing drains the contention counts, so none are kept.
+pool_contention = PoolContentionTracker(enabled=POOL_RESHARDING_ENABLED and INVENTORY_BACKEND == "sql")
+pool_resharder = PoolResharder(pool_contention) if pool_contention.enabled else None
@@ -1,119 +1,835 @@
-import random
-from cachetools import TTLCache
-
-
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import OperationalError
+
+
+from app.core.config import (
+    BOOKING_MODE,
+    POOL_SELECTION_STRATEGY,
+    POOL_SAMPLE_SIZE,
+    BOOKING_COALESCE_ENABLED,
+    TICKET_HOLD_TTL_SECONDS,
+)
+from app.core.db import async_session
+from app.core.drivers import driven
+from app.core.metrics import BOOKING_POOLS_TRIED, BOOKING_PARTIAL_ROLLBACKS
+from app.core.utils import get_utc_now
 from app.exceptions import ApiBaseException
-from app.models.tickets import Ticket, TicketStatus
+from app.models.tickets import Ticket, TicketStatus, ArchivedTicket
 from app.repositories.tickets import TicketRepository
-from app.schemas.tickets import TicketCreate, TicketCreateResponse, TicketCancelledResponse
-
-
-price_cache = TTLCache(maxsize=10000, ttl=3600)
+from app.schemas.tickets import (
+    TicketCreate,
+    TicketCreateResponse,
+    TicketHoldResponse,
+    TicketListItem,
+    TicketListResponse,
+    TicketCancelledResponse,
+    TicketBatchCreate,
+    TicketBatchEntry,
+    TicketBatchItemResult,
+    TicketBatchResponse,
+)
+from app.services.availability import AvailabilityIndex, availability_index
+from app.services.coalescing import BookingCoalescer
+from app.services.event_cache import EventMetadata, EventMetadataCache, event_cache
+from app.services.inventory import InMemoryInventory, LedgerCompactor, inventory_backend, ledger_compactor
+from app.services.resharding import PoolContentionTracker, pool_contention
+
+
+MAX_TICKETS_PER_USER = 2
+
+_SOLD_OUT_MESSAGE = "Event sold out or does not exist"
+_NOT_ENOUGH_TICKETS_MESSAGE = "Not enough tickets available to fulfill your request"
+_QUOTA_EXCEEDED_MESSAGE = f"Ticket quota for user exceeded the limit. You can only hold {MAX_TICKETS_PER_USER} tickets max."
+
+# MySQL lock wait timeout / deadlock, raised when a single-transaction booking
+# collides with another one on the same pool rows.
+LOCK_CONFLICT_ERROR_CODES = (1205, 1213)
 
 
 class TicketService:
-
-    def __init__(self, repo :TicketRepository):
+    """Ticket bookings, holds and cancellations, awaitable when the
+    repository's session is async. Coalescing needs an async session."""
+
+    def __init__(self, repo :TicketRepository, booking_mode: str = BOOKING_MODE,
+                 inventory: InMemoryInventory | None = inventory_backend,
+                 availability: AvailabilityIndex = availability_index,
+                 pool_selection: str = POOL_SELECTION_STRATEGY,
+                 contention: PoolContentionTracker = pool_contention,
+                 event_cache: EventMetadataCache = event_cache,
+                 ledger: LedgerCompactor | None = ledger_compactor,
+                 coalescer: BookingCoalescer | None = None):
 
         self.repo = repo
-
-
-
+        self.run = repo.run
+        self.booking_mode = booking_mode
+        self.inventory = inventory
+        self.availability = availability
+        self.pool_selection = pool_selection
+        self.contention = contention
+        self.event_cache = event_cache
+        self.ledger = ledger
+        self.coalescer = coalescer
+
+    @driven
     def book_ticket(self, booking_data: TicketCreate, user_id: int):
-        MAX_TICKETS_PER_USER = 2
-
-        current_ticket_holdings = self.repo.get_user_ticket_count(user_id, booking_data.event_id)
-
-        if current_ticket_holdings + booking_data.ticket_count > MAX_TICKETS_PER_USER:
-            raise ApiBaseException(message=f"Ticket quota for user exceeded the limit. You can only hold {MAX_TICKETS_PER_USER} tickets max.",
-                                   status_code=400)
-
-        ticket_pools = self.repo.get_pools_with_tickets(booking_data.event_id)
+        return (yield from self._book(booking_data, user_id))
+
+    @driven
+    def hold_ticket(self, booking_data: TicketCreate, user_id: int):
+        # Seats are taken like a booking, but the ticket stays pending until
+        # confirm_ticket or the hold sweeper decides its fate.
+        expires_at = get_utc_now() + timedelta(seconds=TICKET_HOLD_TTL_SECONDS)
+        response = yield from self._book(booking_data, user_id, expires_at)
+        return TicketHoldResponse(**response.model_dump(), expires_at=expires_at)
+
+    def _book(self, booking_data: TicketCreate, user_id: int, expires_at: datetime | None = None):
+        yield from self._get_event_metadata(booking_data.event_id)
+
+        if self.inventory is None and self.availability.is_sold_out(booking_data.event_id):
+            raise _sold_out()
+        if self.coalescer is not None and expires_at is None:
+            return (yield from self._book_ticket_coalesced(booking_data, user_id))
+        if self.inventory is not None:
+            return (yield from self._book_ticket_from_inventory(booking_data, user_id, expires_at))
+        if self.ledger is not None:
+            return (yield from self._book_ticket_from_ledger(booking_data, user_id, expires_at))
+        if self.booking_mode == "transactional":
+            return (yield from self._book_ticket_in_transaction(booking_data, user_id, expires_at))
+        return (yield from self._book_ticket_per_pool(booking_data, user_id, expires_at))
+
+    def _book_ticket_coalesced(self, booking_data: TicketCreate, user_id: int):
+        # Hand the connection back before waiting, the batch books on its own
+        # session.
+        yield self.repo.rollback()
+
+        result = yield self.coalescer.submit(TicketBatchEntry(
+            user_id=user_id,
+            event_id=booking_data.event_id,
+            ticket_count=booking_data.ticket_count
+        ))
+
+        if not result.success:
+            raise ApiBaseException(message=result.message, status_code=result.status_code)
+        return result.ticket
+
+    @driven
+    def book_tickets_batch(self, batch: TicketBatchCreate, user_id: int | None = None):
+        # The whole group is booked in one transaction. Events, users and
+        # pools are visited in id order so concurrent batches lock rows in the
+        # same order, and every ticket goes out in one multi-row insert.
+        # `user_id` is the caller, who may book for others only on events
+        # they own; the coalescer's batches come from single bookings and
+        # pass none.
+        results = [None] * len(batch.bookings)
+        accepted = []
+        reservations = []
+
+        try:
+            for event_id, indexes in _group_batch_entries(batch.bookings):
+                try:
+                    metadata = yield from self._get_event_metadata(event_id)
+                except ApiBaseException as e:
+                    for index in indexes:
+                        results[index] = _batch_failure(index, e.status_code, e.message)
+                    continue
+
+                if user_id is not None:
+                    own, others = _split_by_booker(batch.bookings, indexes, user_id)
+                    if others and (yield self.repo.get_event_owner(event_id)) != user_id:
+                        for index in others:
+                            results[index] = _batch_failure(index, 401, "You are not allowed to book tickets for another user")
+                        indexes = own
+
+                approved = []
+                for index in indexes:
+                    entry = batch.bookings[index]
+                    if (yield self.repo.reserve_user_quota(entry.user_id, event_id, entry.ticket_count, MAX_TICKETS_PER_USER)):
+                        approved.append(index)
+                    else:
+                        results[index] = _batch_failure(index, 400, _QUOTA_EXCEEDED_MESSAGE)
+
+                if not approved:
+                    continue
+
+                allocations = yield from self._take_batch_seats(event_id, [batch.bookings[index].ticket_count for index in approved], reservations)
+
+                for position, index in enumerate(approved):
+                    entry = batch.bookings[index]
+                    if allocations is not None and allocations[position]:
+                        accepted.append((index, entry, metadata.ticket_price, allocations[position]))
+                        continue
+
+                    yield self.repo.release_user_quota(entry.user_id, event_id, entry.ticket_count)
+                    if allocations is None:
+                        results[index] = _batch_failure(index, 404, _SOLD_OUT_MESSAGE)
+                    else:
+                        results[index] = _batch_failure(index, 400, _NOT_ENOUGH_TICKETS_MESSAGE)
+
+            if accepted:
+                ticket_ids = yield self.repo.create_tickets([
+                    _batch_ticket_row(entry, unit_price) for _, entry, unit_price, _ in accepted
+                ])
+                allocation_rows = [
+                    row
+                    for (_, _, _, allocation), ticket_id in zip(accepted, ticket_ids)
+                    for row in _allocation_rows(ticket_id, allocation)
+                ]
+                if allocation_rows:
+                    yield self.repo.add_ticket_allocations(allocation_rows)
+                for (index, entry, unit_price, _), ticket_id in zip(accepted, ticket_ids):
+                    results[index] = _batch_success(index, entry, unit_price, ticket_id)
+
+            yield self.repo.commit()
+        except OperationalError as e:
+            yield from self._abort_batch(batch, reservations)
+            if _is_lock_conflict(e):
+                raise _lock_conflict()
+            raise
+        except Exception:
+            yield from self._abort_batch(batch, reservations)
+            raise
+
+        return _batch_response(results)
+
+    def _take_batch_seats(self, event_id: int, ticket_counts, reservations):
+        # Returns the pools each requested count was taken from, in order
+        # (empty when it could not be filled), or None when the event has no
+        # seats left at all.
+        if self.inventory is not None:
+            yield from self._ensure_inventory_loaded(event_id)
+            if self.inventory.available(event_id) == 0:
+                return None
+
+            allocations = []
+            for ticket_count in ticket_counts:
+                taken = self.inventory.reserve(event_id, ticket_count)
+                if taken is not None:
+                    reservations.append((event_id, taken))
+                allocations.append(taken or [])
+            return allocations
+
+        ticket_pools = self.availability.candidates(event_id, POOL_SAMPLE_SIZE)
+        if ticket_pools is None:
+            ticket_pools = self.availability.refresh(event_id, (yield from self._get_pools_with_tickets(event_id)), POOL_SAMPLE_SIZE)
+        if not ticket_pools:
+            return None
+        if sum(pool_ticket_count for _, pool_ticket_count in ticket_pools) < sum(ticket_counts):
+            # A sample that can't seat the whole group widens to every pool
+            # the index knows to have stock.
+            ticket_pools = self.availability.candidates(event_id) or ticket_pools
+
+        walk = _PoolWalk(event_id, sorted(ticket_pools), sum(ticket_counts), self.availability, self.contention)
+        for pool_id, ticket_count in walk:
+            walk.record(pool_id, ticket_count, (yield self._take_seats(event_id, pool_id, ticket_count)))
+
+        # Every booking of the group, coalesced single bookings included,
+        # was served by these attempts.
+        for _ in ticket_counts:
+            BOOKING_POOLS_TRIED.observe(walk.tried)
+
+        allocations, returns = _allocate_batch_seats(walk.booked_pools, ticket_counts)
+
+        # Seats taken for entries that could not be filled completely go back.
+        if returns:
+            BOOKING_PARTIAL_ROLLBACKS.labels("batch").inc()
+        for pool_id, count in returns:
+            if self.ledger is not None:
+                yield self.repo.append_ledger_entries({(event_id, pool_id): count})
+            else:
+                yield self.repo.release_tickets_to_pool(pool_id, count, commit=False)
+            self.availability.record_release(event_id, pool_id, count)
+
+        if self.ledger is not None:
+            # Ledger tickets record no pools; their seats go back through the
+            # ledger.
+            return [
+                [(None, ticket_count)] if allocation else []
+                for allocation, ticket_count in zip(allocations, ticket_counts)
+            ]
+        return allocations
+
+    def _take_seats(self, event_id: int, pool_id: int, ticket_count: int):
+        # Uncommitted: the batch commits its seats with its tickets.
+        if self.ledger is not None:
+            return self.repo.take_from_ledger_pool(event_id, pool_id, ticket_count)
+        return self.repo.attempt_booking_on_pool(pool_id=pool_id, ticket_count=ticket_count, commit=False)
+
+    def _abort_batch(self, batch: TicketBatchCreate, reservations):
+        yield self.repo.rollback()
+        for event_id, taken in reservations:
+            self.inventory.release(event_id, taken)
+        for entry in batch.bookings:
+            self.availability.invalidate(entry.event_id)
+
+    def _book_ticket_per_pool(self, booking_data: TicketCreate, user_id: int,
+                              expires_at: datetime | None = None):
+
+        ticket_pools = yield from self._get_candidate_pools(booking_data.event_id)
 
         if not ticket_pools:
+            raise _sold_out()
+
+        yield from self._reserve_user_quota(booking_data, user_id)
+        yield self.repo.commit()
+
+        walk = _PoolWalk(booking_data.event_id, ticket_pools, booking_data.ticket_count,
+                         self.availability, self.contention)
+        for pool_id, ticket_count in walk:
+            walk.record(pool_id, ticket_count,
+                        (yield self.repo.attempt_booking_on_pool(pool_id=pool_id, ticket_count=ticket_count)))
+
+        BOOKING_POOLS_TRIED.observe(walk.tried)
+
+        if walk.required:
+            yield from self._rollback_partial_bookings(booking_data.event_id, walk.booked_pools)
+            yield from self._release_user_quota(user_id, booking_data.event_id, booking_data.ticket_count)
+            raise _not_enough_tickets()
+
+        try:
+            unit_price = yield from self._get_unit_price(booking_data.event_id)
+            ticket = yield self.repo.create_ticket(_new_ticket(booking_data, user_id, unit_price, expires_at), commit=False)
+            yield self.repo.add_ticket_allocations(_allocation_rows(ticket.id, walk.booked_pools))
+            response = _ticket_create_response(ticket)
+            yield self.repo.commit()
+        except Exception:
+            yield self.repo.rollback()
+            yield from self._rollback_partial_bookings(booking_data.event_id, walk.booked_pools)
+            yield from self._release_user_quota(user_id, booking_data.event_id, booking_data.ticket_count)
+            raise
+
+        return response
+
+    def _book_ticket_in_transaction(self, booking_data: TicketCreate, user_id: int,
+                                    expires_at: datetime | None = None):
+        # Quota claim, pool decrements and ticket insert share one transaction:
+        # a shortfall rolls everything back instead of issuing compensating
+        # commits, so partially taken seats are never visible to other bookings.
+        try:
+            ticket_pools = yield from self._get_candidate_pools(booking_data.event_id)
+
+            if not ticket_pools:
+                raise _sold_out()
+
+            yield from self._reserve_user_quota(booking_data, user_id)
+
+            walk = _PoolWalk(booking_data.event_id, ticket_pools, booking_data.ticket_count,
+                             self.availability, self.contention)
+            for pool_id, ticket_count in walk:
+                walk.record(pool_id, ticket_count,
+                            (yield self.repo.attempt_booking_on_pool(pool_id=pool_id, ticket_count=ticket_count, commit=False)))
+
+            BOOKING_POOLS_TRIED.observe(walk.tried)
+
+            if walk.required:
+                if walk.booked_pools:
+                    BOOKING_PARTIAL_ROLLBACKS.labels("transactional").inc()
+                raise _not_enough_tickets()
+
+            unit_price = yield from self._get_unit_price(booking_data.event_id)
+            ticket = yield self.repo.create_ticket(_new_ticket(booking_data, user_id, unit_price, expires_at), commit=False)
+            yield self.repo.add_ticket_allocations(_allocation_rows(ticket.id, walk.booked_pools))
+            response = _ticket_create_response(ticket)
+
+            yield self.repo.commit()
+            return response
+        except OperationalError as e:
+            yield self.repo.rollback()
+            if _is_lock_conflict(e):
+                raise _lock_conflict()
+            raise
+        except Exception:
+            yield self.repo.rollback()
+            raise
+
+    def _book_ticket_from_inventory(self, booking_data: TicketCreate, user_id: int,
+                                    expires_at: datetime | None = None):
+        yield from self._ensure_inventory_loaded(booking_data.event_id)
+
+        # The quota claim commits together with the ticket insert below.
+        yield from self._reserve_user_quota(booking_data, user_id)
+
+        allocations = self.inventory.reserve(booking_data.event_id, booking_data.ticket_count)
+
+        if allocations is None:
+            yield self.repo.rollback()
+            if self.inventory.available(booking_data.event_id) == 0:
+                raise _sold_out()
+            raise _not_enough_tickets()
+
+        try:
+            unit_price = yield from self._get_unit_price(booking_data.event_id)
+            ticket = yield self.repo.create_ticket(_new_ticket(booking_data, user_id, unit_price, expires_at), commit=False)
+            yield self.repo.add_ticket_allocations(_allocation_rows(ticket.id, allocations))
+            response = _ticket_create_response(ticket)
+            yield self.repo.commit()
+        except Exception:
+            yield self.repo.rollback()
+            self.inventory.release(booking_data.event_id, allocations)
+            raise
+
+        return response
+
+    def _book_ticket_from_ledger(self, booking_data: TicketCreate, user_id: int,
+                                 expires_at: datetime | None = None):
+        # Seats are debited pool by pool with conditional ledger inserts, each
+        # locking only its pool row, so bookings of one event run in parallel
+        # on different pools. Quota claim, debits and ticket commit together,
+        # so a shortfall is rolled back rather than undone.
+        event_id = booking_data.event_id
+
+        try:
+            ticket_pools = yield from self._get_candidate_pools(event_id)
+
+            if not ticket_pools:
+                raise _sold_out()
+
+            yield from self._reserve_user_quota(booking_data, user_id)
+
+            walk = _PoolWalk(event_id, sorted(ticket_pools), booking_data.ticket_count,
+                             self.availability, self.contention)
+            for pool_id, ticket_count in walk:
+                walk.record(pool_id, ticket_count, (yield self.repo.take_from_ledger_pool(event_id, pool_id, ticket_count)))
+
+            BOOKING_POOLS_TRIED.observe(walk.tried)
+
+            if walk.required:
+                # Read again after the rollback: the candidates may predate
+                # the bookings that took the seats.
+                yield self.repo.rollback()
+                if (yield self.repo.get_ledger_remaining(event_id)) <= 0:
+                    self.availability.mark_sold_out(event_id)
+                    raise _sold_out()
+                raise _not_enough_tickets()
+
+            unit_price = yield from self._get_unit_price(event_id)
+            ticket = yield self.repo.create_ticket(_new_ticket(booking_data, user_id, unit_price, expires_at), commit=False)
+            response = _ticket_create_response(ticket)
+            yield self.repo.commit()
+            return response
+        except OperationalError as e:
+            yield self.repo.rollback()
+            if _is_lock_conflict(e):
+                raise _lock_conflict()
+            raise
+        except Exception:
+            yield self.repo.rollback()
+            raise
+
+    def _ensure_inventory_loaded(self, event_id: int):
+        if not self.inventory.is_loaded(event_id):
+            pool_counts, remaining = yield self.repo.get_event_inventory(event_id)
+            self.inventory.load_event(event_id, pool_counts, remaining)
+
+        if not self.inventory.is_loaded(event_id):
+            raise _sold_out()
+
+    def _reserve_user_quota(self, booking_data: TicketCreate, user_id: int):
+        try:
+            reserved = yield self.repo.reserve_user_quota(user_id, booking_data.event_id,
+                                                          booking_data.ticket_count, MAX_TICKETS_PER_USER)
+        except OperationalError as e:
+            # The claim is the first write of every booking; a lock conflict
+            # on it is worth a retry, not a 500.
+            yield self.repo.rollback()
+            if _is_lock_conflict(e):
+                raise _lock_conflict()
+            raise
+        if not reserved:
+            yield self.repo.rollback()
+            raise ApiBaseException(message=_QUOTA_EXCEEDED_MESSAGE, status_code=400)
+
+    def _release_user_quota(self, user_id: int, event_id: int, ticket_count: int):
+        yield self.repo.release_user_quota(user_id, event_id, ticket_count)
+        yield self.repo.commit()
+
+    def _get_event_metadata(self, event_id: int):
+        metadata = self.event_cache.get(event_id)
+
+        if metadata is None:
+            version = self.event_cache.version(event_id)
+            row = yield self.repo.get_event_metadata(event_id)
+            metadata = _event_metadata(event_id, row)
+            self.event_cache.store(event_id, metadata, version)
+
+        if not metadata.exists:
             raise ApiBaseException(
-                message="Event sold out or does not exist",
+                message=f"Event with ID {event_id} not found",
                 status_code=404
             )
 
-        random.shuffle(ticket_pools)
+        return metadata
 
-        required_ticket_count = booking_data.ticket_count
-        booked_pools = []
+    def _get_unit_price(self, event_id: int):
+        metadata = yield from self._get_event_metadata(event_id)
+        return metadata.ticket_price
 
-        for pool in ticket_pools:
+    def _get_candidate_pools(self, event_id: int):
+        if self.pool_selection == "probe" and self.ledger is None:
+            metadata = yield from self._get_event_metadata(event_id)
+            candidates = yield self.repo.probe_pools_with_tickets(event_id, POOL_SAMPLE_SIZE, _pool_id_range(metadata))
+            if not candidates:
+                self.availability.mark_sold_out(event_id)
+            return candidates
 
-            if required_ticket_count==0:
-                break
+        candidates = self.availability.candidates(event_id, POOL_SAMPLE_SIZE)
 
-            ticket_available = min(pool.ticket_count, required_ticket_count)
-            result = self.repo.attempt_booking_on_pool(pool_id=pool.id, ticket_count=ticket_available)
+        if candidates is None:
+            ticket_pools = yield from self._get_pools_with_tickets(event_id)
+            candidates = self.availability.refresh(event_id, ticket_pools, POOL_SAMPLE_SIZE)
 
-            if result :
-                required_ticket_count -= ticket_available
-                booked_pools.append((pool.id, ticket_available))
+        return candidates
 
-        if required_ticket_count:
+    def _get_pools_with_tickets(self, event_id: int):
+        # In ledger mode a pool's seats are its row plus its entries.
+        if self.ledger is not None:
+            return (yield self.repo.get_ledger_pools_with_tickets(event_id))
+        return (yield self.repo.get_pools_with_tickets(event_id))
 
-            self._rollback_partial_bookings(booked_pools)
-            raise ApiBaseException(message= "Not enough tickets available to fulfill your request",
-                                   status_code=400)
+    def _rollback_partial_bookings(self, event_id: int, booked_pools):
+        if booked_pools:
+            BOOKING_PARTIAL_ROLLBACKS.labels("pooled").inc()
+        for pool_id, count in booked_pools:
+            yield self.repo.release_tickets_to_pool(pool_id, count)
+            self.availability.record_release(event_id, pool_id, count)
 
+    @driven
+    def list_tickets(self, user_id: int, limit: int, cursor: int | None = None,
+                     event_id: int | None = None, status: TicketStatus | None = None):
+        # One extra row tells whether another page follows.
+        rows = yield self.repo.get_user_tickets(user_id, limit + 1, cursor, event_id, status)
+        return _ticket_list_response(rows, limit)
 
+    @driven
+    def confirm_ticket(self, ticket_id: int, user_id: int):
+        ticket = yield self.repo.get_ticket_by_ticket_id(ticket_id)
 
-        if price_cache.get(booking_data.event_id):
-             unit_price = price_cache[booking_data.event_id]
-        else:
-             unit_price = self.repo.get_ticket_price_for_event(booking_data.event_id)
-             price_cache[booking_data.event_id] = unit_price
-        
-        total_amount = unit_price*booking_data.ticket_count
-        new_ticket = Ticket(
-            event_id = booking_data.event_id,
-            user_id=user_id,
-            amount = total_amount,
-            count = booking_data.ticket_count,
-            status= TicketStatus.booked
+        _check_ticket_change(ticket, user_id, "confirm")
+        if ticket.status != TicketStatus.pending:
+            raise ApiBaseException(message="This ticket is not on hold", status_code=400)
 
-        )
-        ticket = self.repo.create_ticket(new_ticket)
+        response = _confirmed_response(ticket)
 
-        return TicketCreateResponse(ticket_id=ticket.id,
-                                    event_id=ticket.event_id,
-                                    status=ticket.status,
-                                    amount=ticket.amount,
-                                    ticket_count=ticket.count
-                                    )
+        # The seats were taken when the hold was placed; confirming only
+        # flips the status, so no pool row is locked here.
+        if not (yield self.repo.confirm_hold(ticket_id, get_utc_now())):
+            yield self.repo.rollback()
+            raise ApiBaseException(message="The hold on this ticket has expired", status_code=410)
 
-    def _rollback_partial_bookings(self, booked_pools):
-        for pool_id, count in booked_pools:
-            self.repo.release_tickets_to_pool(pool_id, count)
+        yield self.repo.commit()
+        return response
 
+    @driven
     def cancel_ticket(self, ticket_id, user_id):
 
-        ticket = self.repo.get_ticket_by_ticket_id(ticket_id)
+        ticket = yield self.repo.get_ticket_by_ticket_id(ticket_id)
 
-        if ticket.user_id != user_id:
-            raise ApiBaseException(message="You are not allowed to cancel this ticket", status_code=401)
+        _check_ticket_change(ticket, user_id, "cancel")
         if ticket.status == TicketStatus.cancelled:
             raise ApiBaseException(message="This ticket is already cancelled", status_code=400)
 
         ticket_count = ticket.count
+        event_id = ticket.event_id
+
+        if self.inventory is not None:
+            # Load before the status change so the rebuilt counts don't
+            # already include the seats this cancellation returns.
+            yield from self._ensure_inventory_loaded(event_id)
+
+        # Status change, quota release and seat return commit together.
+        if not (yield self.repo.mark_ticket_cancelled(ticket_id)):
+            yield self.repo.rollback()
+            raise ApiBaseException(message="This ticket is already cancelled", status_code=400)
+
+        yield self.repo.release_user_quota(user_id, event_id, ticket_count)
+
+        if self.ledger is not None:
+            # Back through the ledger to the event's first pool, whichever
+            # pools the seats came from.
+            metadata = yield from self._get_event_metadata(event_id)
+            yield self.repo.append_ledger_entries({(event_id, metadata.first_pool_id): ticket_count})
+            yield self.repo.commit()
+            self.availability.invalidate(event_id)
+            return _cancelled_response(ticket_id, event_id)
+
+        returned_pools, unallocated = _returned_pools((yield self.repo.get_ticket_allocations(ticket_id)), ticket_count)
+
+        if self.inventory is None:
+            yield self.repo.return_allocated_tickets(ticket_id)
+            if unallocated:
+                pool_id = yield self.repo.return_tickets_to_event(event_id, unallocated)
+                if pool_id is not None:
+                    returned_pools.append((pool_id, unallocated))
+
+        yield self.repo.commit()
+
+        if self.inventory is not None:
+            self.inventory.release(event_id, returned_pools)
+            if unallocated:
+                self.inventory.release_to_random_pool(event_id, unallocated)
+        else:
+            for pool_id, count in returned_pools:
+                self.availability.record_release(event_id, pool_id, count)
+
+        return _cancelled_response(ticket_id, event_id)
+
+
+def _ticket_create_response(ticket: Ticket):
+    return TicketCreateResponse(ticket_id=ticket.id,
+                                event_id=ticket.event_id,
+                                status=ticket.status,
+                                amount=ticket.amount,
+                                ticket_count=ticket.count
+                                )
+
+
+async def _book_coalesced_batch(batch: TicketBatchCreate):
+    async with async_session() as db:
+        return await TicketService(TicketRepository(db)).book_tickets_batch(batch)
+
+
+booking_coalescer = BookingCoalescer(_book_coalesced_batch) if BOOKING_COALESCE_ENABLED else None
+
+
+def _group_batch_entries(bookings):
+    by_event = defaultdict(list)
+    for index, entry in enumerate(bookings):
+        by_event[entry.event_id].append(index)
+
+    return [
+        (event_id, sorted(by_event[event_id], key=lambda index: bookings[index].user_id))
+        for event_id in sorted(by_event)
+    ]
+
+
+def _batch_ticket_row(entry: TicketBatchEntry, unit_price: float):
+    return {
+        "event_id": entry.event_id,
+        "user_id": entry.user_id,
+        "amount": unit_price * entry.ticket_count,
+        "count": entry.ticket_count,
+        "status": TicketStatus.booked
+    }
+
+
+def _allocation_rows(ticket_id: int, allocations):
+    # Ledger bookings record no pools; their seats go back through the ledger.
+    return [
+        {"ticket_id": ticket_id, "pool_id": pool_id, "ticket_count": ticket_count}
+        for pool_id, ticket_count in allocations if pool_id is not None
+    ]
+
+
+def _split_allocations(booked_pools, ticket_counts):
+    # Hands out the seats taken from `booked_pools`, in order, as one
+    # allocation list per ticket count.
+    pools = iter(booked_pools)
+    pool_id, available = None, 0
+    allocations = []
+
+    for ticket_count in ticket_counts:
+        allocation = []
+        while ticket_count:
+            if not available:
+                pool_id, available = next(pools)
+            taken = min(available, ticket_count)
+            allocation.append((pool_id, taken))
+            available -= taken
+            ticket_count -= taken
+        allocations.append(allocation)
+
+    return allocations
+
+
+def _batch_failure(index: int, status_code: int, message: str):
+    return TicketBatchItemResult(index=index, success=False, status_code=status_code, message=message)
+
+
+def _batch_response(results):
+    booked_count = sum(1 for result in results if result.success)
+    return TicketBatchResponse(booked_count=booked_count,
+                               failed_count=len(results) - booked_count,
+                               results=results)
+
+
+def _ticket_list_response(rows, limit: int):
+    page = rows[:limit]
+    return TicketListResponse(
+        tickets=[
+            TicketListItem(ticket_id=row.id, status=row.status, event_id=row.event_id, amount=row.amount,
+                           ticket_count=row.count, expires_at=row.expires_at)
+            for row in page
+        ],
+        next_cursor=page[-1].id if len(rows) > limit else None
+    )
+
+
+def _ticket_status(expires_at: datetime | None):
+    return TicketStatus.booked if expires_at is None else TicketStatus.pending
+
+
+def _event_metadata(event_id: int, row):
+    if row is None:
+        return EventMetadata(event_id=event_id, exists=False)
+
+    ticket_price, event_time, first_pool_id, last_pool_id = row
+    return EventMetadata(
+        event_id=event_id,
+        exists=True,
+        ticket_price=ticket_price,
+        event_time=event_time,
+        first_pool_id=first_pool_id,
+        last_pool_id=last_pool_id
+    )
+
+
+def _is_lock_conflict(error: OperationalError):
+    args = getattr(error.orig, "args", ())
+    return bool(args) and args[0] in LOCK_CONFLICT_ERROR_CODES
+
+
+class _PoolWalk:
+    """Takes seats from candidate pools, in the given order, until
+    ``required`` of them are booked.
+
+    Iterating yields the next ``(pool_id, ticket_count)`` to take; the
+    caller takes it from the DB and reports the outcome to ``record``,
+    which keeps the availability index and contention counts up to date.
+    """
+
+    __slots__ = ("event_id", "pools", "required", "booked_pools", "tried", "availability", "contention")
+
+    def __init__(self, event_id: int, pools, required: int, availability: AvailabilityIndex,
+                 contention: PoolContentionTracker):
+        self.event_id = event_id
+        self.pools = pools
+        self.required = required
+        self.booked_pools = []
+        self.tried = 0
+        self.availability = availability
+        self.contention = contention
+
+    def __iter__(self):
+        for pool_id, pool_ticket_count in self.pools:
+            if not self.required:
+                break
+            self.tried += 1
+            yield pool_id, min(pool_ticket_count, self.required)
+
+    def record(self, pool_id: int, ticket_count: int, taken: bool):
+        if taken:
+            self.required -= ticket_count
+            self.booked_pools.append((pool_id, ticket_count))
+            self.availability.record_booking(self.event_id, pool_id, ticket_count)
+        else:
+            self.availability.record_miss(self.event_id, pool_id, ticket_count)
+
+        self.contention.record(self.event_id, taken)
+
+
+def _sold_out():
+    return ApiBaseException(message=_SOLD_OUT_MESSAGE, status_code=404)
+
+
+def _not_enough_tickets():
+    return ApiBaseException(message=_NOT_ENOUGH_TICKETS_MESSAGE, status_code=400)
+
+
+def _lock_conflict():
+    return ApiBaseException(message="Booking conflicted with a concurrent request, please retry", status_code=409)
+
+
+def _new_ticket(booking_data: TicketCreate, user_id: int, unit_price: float, expires_at: datetime | None):
+    return Ticket(
+        event_id=booking_data.event_id,
+        user_id=user_id,
+        amount=unit_price * booking_data.ticket_count,
+        count=booking_data.ticket_count,
+        status=_ticket_status(expires_at),
+        expires_at=expires_at
+    )
+
+
+def _pool_id_range(metadata: EventMetadata):
+    # Lets the probe skip its bounds query when the cache knows them.
+    if metadata.first_pool_id is None:
+        return None
+    return metadata.first_pool_id, metadata.last_pool_id
+
+
+def _split_by_booker(bookings, indexes, user_id: int):
+    # The caller's own entries, and those for other users.
+    own = [index for index in indexes if bookings[index].user_id == user_id]
+    others = [index for index in indexes if bookings[index].user_id != user_id]
+    return own, others
+
+
+def _allocate_batch_seats(booked_pools, ticket_counts):
+    # Hands the seats taken from `booked_pools` to the counts, in order,
+    # while they last. Returns each count's allocation (empty when it could
+    # not be filled) and the (pool_id, seats) left over to give back.
+    seats = sum(count for _, count in booked_pools)
+    fulfilled = []
+    for ticket_count in ticket_counts:
+        fulfilled.append(ticket_count <= seats)
+        if fulfilled[-1]:
+            seats -= ticket_count
+
+    kept = list(booked_pools)
+    returns = []
+    while seats:
+        pool_id, count = kept.pop()
+        returned = min(count, seats)
+        returns.append((pool_id, returned))
+        seats -= returned
+        if returned < count:
+            kept.append((pool_id, count - returned))
 
-        self.repo.update_ticket_status(ticket, TicketStatus.cancelled)
+    allocations = iter(_split_allocations(kept, [
+        ticket_count for ticket_count, ok in zip(ticket_counts, fulfilled) if ok
+    ]))
+    return [next(allocations) if ok else [] for ok in fulfilled], returns
 
-        self.repo.add_tickets_to_random_ticket_pool(ticket_count, ticket.event_id)
 
-        return TicketCancelledResponse(
-            ticket_id=ticket_id,
-            status=ticket.status,
-            event_id=ticket.event_id
-        )
+def _check_ticket_change(ticket, user_id: int, action: str):
+    if ticket.user_id != user_id:
+        raise ApiBaseException(message=f"You are not allowed to {action} this ticket", status_code=401)
+    if isinstance(ticket, ArchivedTicket):
+        raise ApiBaseException(message="This ticket's event is over", status_code=400)
 
 
+def _returned_pools(allocations, ticket_count: int):
+    # Pools the cancelled seats go back to, and the seats no allocation
+    # accounts for: tickets booked before allocations were recorded, or
+    # whose pool has since been merged away.
+    returned_pools = [(pool_id, count) for pool_id, count in allocations if pool_id is not None]
+    return returned_pools, ticket_count - sum(count for _, count in returned_pools)
 
 
+def _confirmed_response(ticket: Ticket):
+    return TicketCreateResponse(
+        ticket_id=ticket.id,
+        status=TicketStatus.booked,
+        event_id=ticket.event_id,
+        amount=ticket.amount,
+        ticket_count=ticket.count
+    )
 
 
+def _cancelled_response(ticket_id: int, event_id: int):
+    return TicketCancelledResponse(
+        ticket_id=ticket_id,
+        status=TicketStatus.cancelled,
+        event_id=event_id
+    )
 
 
+def _batch_success(index: int, entry: TicketBatchEntry, unit_price: float, ticket_id: int):
+    return TicketBatchItemResult(index=index, success=True, ticket=TicketCreateResponse(
+        ticket_id=ticket_id,
+        event_id=entry.event_id,
+        status=TicketStatus.booked,
+        amount=unit_price * entry.ticket_count,
+        ticket_count=entry.ticket_count
+    ))
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import (
+    DB_MODE,
+    DB_POOL_WARMUP_CONNECTIONS,
+    WARMUP_EVENT_WINDOW_HOURS,
+    WARMUP_MAX_EVENTS,
+    WARMUP_RETRY_SECONDS,
+)
+from app.core.db import (
+    get_engine,
+    session,
+    async_session,
+    SYNC_POOL,
+    ASYNC_POOL,
+    REPLICA_POOL,
+    ASYNC_REPLICA_POOL,
+)
+from app.core.utils import get_utc_now
+from app.repositories.events import EventRepository
+from app.services.event_cache import EventMetadata, EventMetadataCache, event_cache
+
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Gets a worker ready for traffic in the background of the lifespan.
+
+    It opens ``connections`` pooled connections on each engine the API uses,
+    so the first requests don't pay for the connects, and loads the metadata
+    of the events starting within ``window_hours`` into the event cache.
+    ``ready`` stays False until both are done; a failed attempt (e.g. the DB
+    isn't reachable yet) is retried every ``retry_interval`` seconds.
+    """
+
+    def __init__(self, mode: str = DB_MODE, connections: int = DB_POOL_WARMUP_CONNECTIONS,
+                 window_hours: float = WARMUP_EVENT_WINDOW_HOURS, max_events: int = WARMUP_MAX_EVENTS,
+                 retry_interval: float = WARMUP_RETRY_SECONDS, cache: EventMetadataCache = event_cache):
+        self.mode = mode
+        self.connections = connections
+        self.window_hours = window_hours
+        self.max_events = max_events
+        self.retry_interval = retry_interval
+        self.cache = cache
+
+        # (engine name, pool size) of the engines this DB_MODE serves requests
+        # from; the engines only exist once the lifespan has created them.
+        if mode == "async":
+            self.engines = [("async", ASYNC_POOL[0]), ("async_replica", ASYNC_REPLICA_POOL[0])]
+            self.session_factory = async_session
+        else:
+            self.engines = [("sync", SYNC_POOL[0]), ("replica", REPLICA_POOL[0])]
+            self.session_factory = session
+
+        self.ready = False
+        self.attempts = 0
+        self.connections_opened = 0
+        self.events_loaded = 0
+        self.duration = None
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Not ready from here on, so the load balancer drains the worker.
+        self.ready = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "connections_opened": self.connections_opened,
+            "events_loaded": self.events_loaded,
+            "duration_seconds": self.duration
+        }
+
+    async def _run(self):
+        while True:
+            self.attempts += 1
+            try:
+                await self.warm()
+                self.ready = True
+                return
+            except Exception:
+                logger.exception("warm-up attempt %d failed, retrying in %ss", self.attempts, self.retry_interval)
+                await asyncio.sleep(self.retry_interval)
+
+    async def warm(self):
+        started_at = time.perf_counter()
+
+        opened = 0
+        for name, pool_size in self.engines:
+            pool_engine = get_engine(name)
+            if pool_engine is None:
+                continue
+            # Connections beyond pool_size are overflow and would be closed
+            # again as soon as they are returned.
+            count = min(self.connections, pool_size)
+            if self.mode == "async":
+                opened += await _open_async_connections(pool_engine, count)
+            else:
+                opened += await run_in_threadpool(_open_connections, pool_engine, count)
+        self.connections_opened = opened
+
+        self.events_loaded = await self._load_upcoming_events()
+        self.duration = round(time.perf_counter() - started_at, 3)
+
+    async def _load_upcoming_events(self):
+        if self.window_hours <= 0 or self.max_events <= 0:
+            return 0
+
+        now = get_utc_now()
+        end = now + timedelta(hours=self.window_hours)
+        version = self.cache.version()
+
+        if self.mode == "async":
+            async with self.session_factory() as db:
+                rows = await EventRepository(db).get_upcoming_event_metadata(now, end, self.max_events)
+        else:
+            rows = await run_in_threadpool(self._read_upcoming_events, now, end)
+
+        for event_id, ticket_price, event_time, first_pool_id, last_pool_id in rows:
+            self.cache.store(event_id, EventMetadata(
+                event_id=event_id,
+                exists=True,
+                ticket_price=ticket_price,
+                event_time=event_time,
+                first_pool_id=first_pool_id,
+                last_pool_id=last_pool_id
+            ), version)
+        return len(rows)
+
+    def _read_upcoming_events(self, start, end):
+        with self.session_factory() as db:
+            return EventRepository(db).get_upcoming_event_metadata(start, end, self.max_events)
+
+
+def _open_connections(pool_engine, count: int):
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(pool_engine.connect())
+    finally:
+        # Closing checks them back into the pool, where they stay open.
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+async def _open_async_connections(pool_engine, count: int):
+    connections = []
+    try:
+        for _ in range(count):
+            connections.append(await pool_engine.connect())
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
+
+
+warmup = Warmup()
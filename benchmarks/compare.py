@@ -0,0 +1,83 @@
+"""Compares two benchmark result files, e.g. from two commits:
+
+    python -m benchmarks.compare benchmarks/results/before.json benchmarks/results/after.json
+
+Exits with status 1 when a metric got worse by more than ``--threshold``
+percent.
+"""
+import argparse
+import json
+import sys
+
+
+# (label, path in the result, whether higher is better)
+METRICS = (
+    ("throughput req/s", ("throughput_rps",), True),
+    ("bookings/s", ("bookings_per_second",), True),
+    ("latency p50 ms", ("latency_ms", "all", "p50"), False),
+    ("latency p95 ms", ("latency_ms", "all", "p95"), False),
+    ("latency p99 ms", ("latency_ms", "all", "p99"), False),
+    ("statements/booking", ("sql", "statements_per_booking"), False),
+    ("commits/booking", ("sql", "commits_per_booking"), False),
+    ("failed pool attempts/booking", ("pool_attempts", "failed_per_booking"), False),
+)
+
+
+def compare(baseline: dict, candidate: dict, threshold: float):
+    rows = []
+    regressions = []
+
+    for label, path, higher_is_better in METRICS:
+        before, after = _lookup(baseline, path), _lookup(candidate, path)
+        change = None
+        if before and after is not None:
+            change = (after - before) / before * 100
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(label)
+        rows.append((label, before, after, change))
+
+    return rows, regressions
+
+
+def _lookup(result: dict, path):
+    for key in path:
+        if not isinstance(result, dict):
+            return None
+        result = result.get(key)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    if baseline.get("scenario") != candidate.get("scenario"):
+        print(f"warning: comparing scenario {baseline.get('scenario')} with {candidate.get('scenario')}")
+
+    rows, regressions = compare(baseline, candidate, args.threshold)
+
+    print(f"{'metric':<30}{baseline.get('git_commit') or 'baseline':>14}{candidate.get('git_commit') or 'candidate':>14}{'change':>10}")
+    for label, before, after, change in rows:
+        change_text = f"{change:+.1f}%" if change is not None else "-"
+        print(f"{label:<30}{_format(before):>14}{_format(after):>14}{change_text:>10}")
+
+    if regressions:
+        print(f"regressed by more than {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def _format(value):
+    return "-" if value is None else f"{value:g}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import time
+from collections import Counter, defaultdict
+
+from prometheus_client import REGISTRY
+from sqlalchemy import event
+
+
+class SqlCounter:
+    """Counts statements and commits on the engines the app talks to."""
+
+    def __init__(self, engines):
+        self.statements = 0
+        self.commits = 0
+
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_statement)
+            event.listen(engine, "commit", self._on_commit)
+
+    def reset(self):
+        self.statements = 0
+        self.commits = 0
+
+    def _on_statement(self, *args):
+        self.statements += 1
+
+    def _on_commit(self, *args):
+        self.commits += 1
+
+
+class RequestRecorder:
+    """Sends requests through the client and records status and latency per
+    request kind ("book", "cancel", ...)."""
+
+    def __init__(self, client):
+        self.client = client
+        self.latencies = defaultdict(list)
+        self.status_codes = defaultdict(Counter)
+
+    async def request(self, kind: str, method: str, url: str, **kwargs):
+        started_at = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.latencies[kind].append(time.perf_counter() - started_at)
+        self.status_codes[kind][response.status_code] += 1
+        return response
+
+    def succeeded(self, kind: str):
+        return self.status_codes[kind][200]
+
+    def summary(self):
+        all_latencies = [latency for latencies in self.latencies.values() for latency in latencies]
+        latency_ms = {"all": latency_summary(all_latencies)}
+        latency_ms.update({kind: latency_summary(latencies) for kind, latencies in self.latencies.items()})
+
+        return {
+            "requests": len(all_latencies),
+            "status_codes": {
+                kind: {str(status_code): count for status_code, count in sorted(counts.items())}
+                for kind, counts in self.status_codes.items()
+            },
+            "latency_ms": latency_ms
+        }
+
+
+def pool_misses():
+    # Conditional pool decrements that found the pool short, counted by the
+    # app whether or not the resharder is on.
+    return REGISTRY.get_sample_value("booking_pool_attempts_total", {"result": "miss"}) or 0
+
+
+def latency_summary(latencies):
+    if not latencies:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+
+    ordered = sorted(latencies)
+    return {
+        "p50": _ms(percentile(ordered, 50)),
+        "p95": _ms(percentile(ordered, 95)),
+        "p99": _ms(percentile(ordered, 99)),
+        "mean": _ms(sum(ordered) / len(ordered)),
+        "max": _ms(ordered[-1])
+    }
+
+
+def percentile(ordered, q: float):
+    # Nearest-rank percentile of an already sorted list.
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def per(value, count):
+    return round(value / count, 3) if count else None
+
+
+def _ms(seconds: float):
+    return round(seconds * 1000, 3)
@@ -0,0 +1,192 @@
+"""Replays a load scenario against the app in-process and saves the results.
+
+The app is driven through httpx's ASGI transport, so no server is started,
+and a local SQLite file stands in for MySQL. The app's own settings (DB_MODE,
+BOOKING_MODE, INVENTORY_BACKEND, ...) are read from the environment as usual:
+
+    BOOKING_MODE=transactional python -m benchmarks.run flash_sale --users 2000
+
+SQLite serializes writers, so absolute numbers are not comparable with a MySQL
+deployment; compare runs of the same scenario between commits or settings.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.scenarios import SCENARIOS
+
+
+SETTINGS = (
+    "DB_MODE",
+    "BOOKING_MODE",
+    "INVENTORY_BACKEND",
+    "POOL_SELECTION_STRATEGY",
+    "POOL_SAMPLE_SIZE",
+    "POOL_BATCH_SIZE",
+    "BOOKING_COALESCE_ENABLED",
+    "ADMISSION_CONTROL_ENABLED",
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a booking benchmark scenario in-process.")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--users", type=int, help="virtual users, each runs the scenario once")
+    parser.add_argument("--concurrency", type=int, help="virtual users running at the same time")
+    parser.add_argument("--events", type=int, help="events created before the run")
+    parser.add_argument("--pool-size", type=int, dest="pool_size", help="seats per event")
+    parser.add_argument("--rounds", type=int, help="book/cancel rounds per user (churn)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database", help="SQLite file to use (recreated), a temporary one by default")
+    parser.add_argument("--output", help="JSON file for the results, benchmarks/results/<scenario>-<time>.json by default")
+    return parser.parse_args()
+
+
+def configure_environment(database: str):
+    # Must run before anything under app/ is imported: settings and database
+    # URLs are read at import time.
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{database}"
+    # A shared event cache file would outlive the recreated database.
+    os.environ["EVENT_CACHE_PATH"] = ""
+    for name in ("DB_USERNAME", "DB_PASSWORD", "DB_HOST", "DB_PORT", "DB_NAME"):
+        os.environ.setdefault(name, "")
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+
+def create_database():
+    """Creates the schema in the database set up by configure_environment and
+    returns the app's sync and async engines. The tests share this setup."""
+    from sqlalchemy import event
+
+    from app.core.db import create_engines, get_engine
+    from app.models.base import Base
+    from app.models.events import Event, EventTicketPool, InventoryLedgerEntry  # noqa: F401
+    from app.models.holdings import UserEventHolding  # noqa: F401
+    from app.models.idempotency import IdempotencyKey  # noqa: F401
+    from app.models.tickets import Ticket, TicketPoolAllocation  # noqa: F401
+
+    create_engines()
+    engine, async_engine = get_engine("sync"), get_engine("async")
+    for sqlite_engine in (engine, async_engine.sync_engine):
+        event.listen(sqlite_engine, "connect", _sqlite_pragmas)
+    Base.metadata.create_all(engine)
+    return engine, async_engine
+
+
+async def run_benchmark(scenario_name: str, options: dict):
+    import httpx
+
+    from app.core import config
+    from app.main import app
+
+    from benchmarks.metrics import SqlCounter, RequestRecorder, per, pool_misses
+
+    engine, async_engine = create_database()
+
+    scenario = SCENARIOS[scenario_name](options)
+    counter = SqlCounter((engine, async_engine.sync_engine))
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            await scenario.prepare(client)
+
+            recorder = RequestRecorder(client)
+            users = iter(range(1000, 1000 + scenario.options["users"]))
+            counter.reset()
+            misses_before = pool_misses()
+
+            async def worker():
+                for user_id in users:
+                    await scenario.run_user(recorder, user_id)
+
+            started_at = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(scenario.options["concurrency"])])
+            duration = time.perf_counter() - started_at
+
+    failed_pool_attempts = int(pool_misses() - misses_before)
+    bookings = recorder.succeeded("book")
+    summary = recorder.summary()
+
+    return {
+        "scenario": scenario_name,
+        "description": scenario.description,
+        "git_commit": _git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "options": scenario.options,
+        "settings": {name: getattr(config, name) for name in SETTINGS},
+        "duration_seconds": round(duration, 3),
+        "requests": summary["requests"],
+        "throughput_rps": round(summary["requests"] / duration, 2),
+        "bookings_per_second": round(bookings / duration, 2),
+        "successful_bookings": bookings,
+        "status_codes": summary["status_codes"],
+        "latency_ms": summary["latency_ms"],
+        "sql": {
+            "statements": counter.statements,
+            "commits": counter.commits,
+            "statements_per_booking": per(counter.statements, bookings),
+            "commits_per_booking": per(counter.commits, bookings)
+        },
+        "pool_attempts": {
+            "failed": failed_pool_attempts,
+            "failed_per_booking": per(failed_pool_attempts, bookings)
+        }
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    options = {
+        name: value for name, value in vars(args).items()
+        if name in ("users", "concurrency", "events", "pool_size", "rounds", "seed") and value is not None
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = args.database or os.path.join(directory, "benchmark.db")
+        if os.path.exists(database):
+            os.remove(database)
+        configure_environment(database)
+        result = asyncio.run(run_benchmark(args.scenario, options))
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results",
+        f"{args.scenario}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    latency = result["latency_ms"]["all"]
+    print(f"{result['scenario']}: {result['requests']} requests in {result['duration_seconds']}s "
+          f"({result['throughput_rps']} req/s, {result['successful_bookings']} bookings)")
+    print(f"latency p50 {latency['p50']}ms  p95 {latency['p95']}ms  p99 {latency['p99']}ms")
+    print(f"per booking: {result['sql']['statements_per_booking']} statements, "
+          f"{result['sql']['commits_per_booking']} commits, "
+          f"{result['pool_attempts']['failed_per_booking']} failed pool attempts")
+    print(f"saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
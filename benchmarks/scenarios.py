@@ -0,0 +1,98 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.metrics import RequestRecorder
+
+
+class Scenario:
+    """A load pattern: ``prepare`` creates the events, then ``run_user`` is
+    called once per virtual user, ``concurrency`` users at a time."""
+
+    name = ""
+    description = ""
+    defaults = {}
+
+    def __init__(self, options: dict):
+        self.options = {**self.defaults, **options}
+        self.random = random.Random(self.options["seed"])
+        self.event_ids = []
+
+    async def prepare(self, client):
+        pool_size = self.options["pool_size"]
+        event_time = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+
+        for start in range(0, self.options["events"], 1000):
+            count = min(1000, self.options["events"] - start)
+            response = await client.post("/api/v1/events/batch", json={"events": [
+                {
+                    "name": f"{self.name} {start + index}",
+                    "address": "Benchmark Hall",
+                    "event_time": event_time,
+                    "pool_size": pool_size,
+                    "ticket_price": 50.0
+                }
+                for index in range(count)
+            ]}, headers={"X-User-Id": "1"})
+            response.raise_for_status()
+            self.event_ids.extend(
+                result["event_id"] for result in response.json()["data"]["results"] if result["success"]
+            )
+
+    async def run_user(self, recorder: RequestRecorder, user_id: int):
+        raise NotImplementedError
+
+    async def book(self, recorder: RequestRecorder, user_id: int, event_id: int, ticket_count: int = 1):
+        response = await recorder.request("book", "POST", "/api/v1/tickets",
+                                          json={"event_id": event_id, "ticket_count": ticket_count},
+                                          headers={"X-User-Id": str(user_id)})
+        if response.status_code == 200:
+            return response.json()["data"]["ticket_id"]
+        return None
+
+    async def cancel(self, recorder: RequestRecorder, user_id: int, ticket_id: int):
+        await recorder.request("cancel", "DELETE", f"/api/v1/tickets/{ticket_id}",
+                               headers={"X-User-Id": str(user_id)})
+
+
+class FlashSale(Scenario):
+    name = "flash_sale"
+    description = "Twice as many buyers as seats hit one event at once"
+    defaults = {"events": 1, "pool_size": 500, "users": 1000, "concurrency": 50}
+
+    async def run_user(self, recorder, user_id):
+        await self.book(recorder, user_id, self.event_ids[0], self.random.randint(1, 2))
+
+
+class CancelRebookChurn(Scenario):
+    name = "churn"
+    description = "Every user books, cancels and books again, several rounds"
+    defaults = {"events": 1, "pool_size": 300, "users": 300, "concurrency": 50, "rounds": 3}
+
+    async def run_user(self, recorder, user_id):
+        event_id = self.event_ids[user_id % len(self.event_ids)]
+        for _ in range(self.options["rounds"]):
+            ticket_id = await self.book(recorder, user_id, event_id)
+            if ticket_id is not None:
+                await self.cancel(recorder, user_id, ticket_id)
+        await self.book(recorder, user_id, event_id)
+
+
+class ManySmallEvents(Scenario):
+    name = "many_events"
+    description = "Bookings spread over many small events"
+    defaults = {"events": 200, "pool_size": 20, "users": 2000, "concurrency": 50}
+
+    async def run_user(self, recorder, user_id):
+        await self.book(recorder, user_id, self.random.choice(self.event_ids))
+
+
+class MegaEvent(Scenario):
+    name = "mega_event"
+    description = "One event with many pools and enough seats for everyone"
+    defaults = {"events": 1, "pool_size": 100000, "users": 5000, "concurrency": 100}
+
+    async def run_user(self, recorder, user_id):
+        await self.book(recorder, user_id, self.event_ids[0], self.random.randint(1, 2))
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (FlashSale, CancelRebookChurn, ManySmallEvents, MegaEvent)}
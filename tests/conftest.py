@@ -1,6 +1,18 @@
+import os
+import tempfile
+from datetime import timedelta
+
 import pytest
 import httpx
 
+from benchmarks.run import configure_environment
+
+# The in-process tests drive the services against a SQLite file, set up the
+# way the benchmarks do it. Settings and database URLs are read when app/ is
+# first imported, so this has to run before any test module imports it.
+configure_environment(os.path.join(tempfile.mkdtemp(prefix="ticketing-tests-"), "tests.db"))
+
+
 @pytest.fixture(scope="session")
 def base_url():
     """Base URL for the running application"""
@@ -11,3 +23,34 @@ def client(base_url):
     """Synchronous client for E2E tests"""
     with httpx.Client(base_url=base_url, timeout=10.0) as client:
         yield client
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Schema of the in-process tests' SQLite database, shared by all of them"""
+    from benchmarks.run import create_database
+    return create_database()
+
+
+@pytest.fixture
+def create_event(database):
+    """Creates an event with one pool per entry of `pool_counts` and returns its id"""
+    from app.core.db import session
+    from app.core.utils import get_utc_now
+    from app.models.events import Event
+    from app.repositories.events import EventRepository
+
+    def create(pool_counts=(10,), ticket_price=50.0, starts_in=timedelta(days=30)):
+        event = Event(
+            name="In-process Event",
+            address="123 Test St",
+            event_time=get_utc_now() + starts_in,
+            pool_size=sum(pool_counts),
+            ticket_price=ticket_price,
+            owner_id=1
+        )
+        with session() as db:
+            [(event_id, _)] = EventRepository(db).save_events_with_pools([event], [list(pool_counts)])
+        return event_id
+
+    return create
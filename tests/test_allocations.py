@@ -0,0 +1,51 @@
+from sqlalchemy import insert
+
+from app.core.db import session
+from app.models.tickets import Ticket, TicketStatus
+from app.repositories.events import EventRepository
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService
+
+
+def service(db):
+    return TicketService(TicketRepository(db), booking_mode="pooled", inventory=None,
+                         availability=AvailabilityIndex(), ledger=None, event_cache=EventMetadataCache(path=""))
+
+
+def pool_counts(event_id):
+    with session() as db:
+        return [pool.ticket_count for pool in EventRepository(db).get_pool_layout(event_id)]
+
+
+def test_cancel_returns_seats_to_the_pools_they_came_from(database, create_event):
+    """A booking spread over pools gives each pool back exactly what it took"""
+    event_id = create_event(pool_counts=(1, 1, 1))
+
+    with session() as db:
+        ticket = service(db).book_ticket(TicketCreate(event_id=event_id, ticket_count=2), 9401)
+    with session() as db:
+        allocations = TicketRepository(db).get_ticket_allocations(ticket.ticket_id)
+    assert sorted(count for _, count in allocations) == [1, 1]
+
+    with session() as db:
+        service(db).cancel_ticket(ticket.ticket_id, 9401)
+
+    assert pool_counts(event_id) == [1, 1, 1]
+
+
+def test_ticket_without_allocations_goes_back_to_the_first_pool(database, create_event):
+    """Tickets booked before allocations were recorded still return their seats"""
+    event_id = create_event(pool_counts=(0, 0))
+    with session() as db:
+        ticket_id = db.execute(insert(Ticket).values(
+            event_id=event_id, user_id=9402, amount=100.0, count=2, status=TicketStatus.booked
+        )).inserted_primary_key[0]
+        db.commit()
+
+    with session() as db:
+        service(db).cancel_ticket(ticket_id, 9402)
+
+    assert pool_counts(event_id) == [2, 0]
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import insert, select, func
+
+from app.core.db import session
+from app.exceptions import ApiBaseException
+from app.models.events import EventTicketPool, ArchivedEventTicketPool
+from app.models.holdings import UserEventHolding
+from app.models.tickets import Ticket, TicketStatus, ArchivedTicket
+from app.repositories.tickets import TicketRepository
+from app.services.availability import AvailabilityIndex
+from app.services.archival import TicketArchiver
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService
+
+
+def add_tickets(event_id, user_ids):
+    with session() as db:
+        db.execute(insert(Ticket), [
+            {"event_id": event_id, "user_id": user_id, "amount": 50.0, "count": 1, "status": TicketStatus.booked}
+            for user_id in user_ids
+        ])
+        db.execute(insert(UserEventHolding), [
+            {"event_id": event_id, "user_id": user_id, "ticket_count": 1} for user_id in user_ids
+        ])
+        db.commit()
+        return db.execute(select(Ticket.id).where(Ticket.event_id == event_id).order_by(Ticket.id)).scalars().all()
+
+
+def rows(model, event_id):
+    with session() as db:
+        return db.execute(select(func.count()).select_from(model).where(model.event_id == event_id)).scalar()
+
+
+def test_finished_events_move_to_the_archive(database, create_event):
+    """Tickets move batch by batch, then the pools and quota rows; upcoming events stay"""
+    finished = create_event(pool_counts=(3, 2), starts_in=-timedelta(days=2))
+    upcoming = create_event(pool_counts=(5,))
+    ticket_ids = add_tickets(finished, range(9701, 9706))
+    add_tickets(upcoming, [9706])
+
+    archiver = TicketArchiver(session_factory=session, after_hours=24, batch_size=2)
+    assert archiver.archive_once() >= 1
+
+    assert rows(Ticket, finished) == 0
+    assert rows(ArchivedTicket, finished) == 5
+    assert rows(EventTicketPool, finished) == 0
+    assert rows(ArchivedEventTicketPool, finished) == 2
+    assert rows(UserEventHolding, finished) == 0
+    assert rows(Ticket, upcoming) == 1
+    assert rows(EventTicketPool, upcoming) == 1
+
+    with session() as db:
+        # Archived tickets keep their ids.
+        ticket = TicketRepository(db).get_ticket_by_ticket_id(ticket_ids[0])
+        assert isinstance(ticket, ArchivedTicket)
+
+        service = TicketService(TicketRepository(db), inventory=None, availability=AvailabilityIndex(),
+                                ledger=None, event_cache=EventMetadataCache(path=""))
+        with pytest.raises(ApiBaseException) as over:
+            service.cancel_ticket(ticket_ids[0], 9701)
+    assert over.value.status_code == 400
+
+
+def test_recently_finished_events_are_kept(database, create_event):
+    """Events are only archived once they ended longer ago than configured"""
+    event_id = create_event(starts_in=-timedelta(hours=1))
+    add_tickets(event_id, [9707])
+
+    TicketArchiver(session_factory=session, after_hours=24).archive_once()
+
+    assert rows(Ticket, event_id) == 1
+    assert rows(ArchivedTicket, event_id) == 0
@@ -0,0 +1,137 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import AVAILABILITY_MAX_AGE_SECONDS
+from app.core.db import session
+from app.exceptions import ApiBaseException
+from app.main import app
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services import events as event_services
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService
+
+
+def service(db, availability):
+    return TicketService(TicketRepository(db), booking_mode="pooled", inventory=None, availability=availability,
+                         ledger=None, event_cache=EventMetadataCache(path=""))
+
+
+def book(availability, event_id, user_id):
+    with session() as db:
+        return service(db, availability).book_ticket(TicketCreate(event_id=event_id, ticket_count=1), user_id)
+
+
+def request(method, path, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+def availability_of(event_id, **headers):
+    return request("GET", f"/api/v1/events/{event_id}/availability", headers=headers)
+
+
+def test_sold_out_event_is_rejected_without_touching_the_pools(database, create_event, monkeypatch):
+    """Once the last seat is gone, bookings get a 404 from the index alone"""
+    event_id = create_event(pool_counts=(1,))
+    availability = AvailabilityIndex()
+    book(availability, event_id, 9201)
+    assert availability.is_sold_out(event_id)
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("pools read for a sold-out event")
+
+    monkeypatch.setattr(TicketRepository, "get_pools_with_tickets", unexpected)
+    monkeypatch.setattr(TicketRepository, "attempt_booking_on_pool", unexpected)
+
+    with pytest.raises(ApiBaseException) as sold_out:
+        book(availability, event_id, 9202)
+    assert sold_out.value.status_code == 404
+
+
+def test_cancellation_reopens_a_sold_out_event(database, create_event):
+    """Seats given back are bookable again right away"""
+    event_id = create_event(pool_counts=(1,))
+    availability = AvailabilityIndex()
+    ticket = book(availability, event_id, 9203)
+
+    with session() as db:
+        service(db, availability).cancel_ticket(ticket.ticket_id, 9203)
+
+    assert not availability.is_sold_out(event_id)
+    assert book(availability, event_id, 9204).event_id == event_id
+
+
+def test_index_follows_bookings_and_misses():
+    """Emptied pools leave the candidates, and a miss caps what a pool is believed to hold"""
+    availability = AvailabilityIndex()
+    availability.refresh(7, [(1, 1), (2, 5), (3, 5)])
+
+    availability.record_booking(7, 1, 1)
+    availability.record_miss(7, 2, 3)
+
+    assert sorted(availability.candidates(7)) == [(2, 2), (3, 5)]
+    assert len(availability.candidates(7, limit=1)) == 1
+
+    availability.record_booking(7, 2, 2)
+    availability.record_booking(7, 3, 5)
+    assert availability.is_sold_out(7)
+    assert availability.candidates(7) == []
+
+
+def test_availability_answers_a_matching_etag_with_304(database, create_event):
+    """The ETag follows the count: a match gets an empty 304, a booking makes it stale"""
+    event_id = create_event(pool_counts=(5, 5))
+
+    response = availability_of(event_id)
+    assert response.status_code == 200
+    assert response.json()["data"] == {
+        "event_id": event_id, "tickets_remaining": 10, "sold_out": False, "approximate": False
+    }
+    assert response.headers["Cache-Control"] == f"max-age={AVAILABILITY_MAX_AGE_SECONDS}"
+    etag = response.headers["ETag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        not_modified = availability_of(event_id, **{"If-None-Match": if_none_match})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["ETag"] == etag
+
+    booked = request("POST", "/api/v1/tickets", json={"event_id": event_id, "ticket_count": 2},
+                     headers={"X-User-Id": "9205"})
+    assert booked.status_code == 200
+
+    response = availability_of(event_id, **{"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["data"]["tickets_remaining"] == 8
+    assert response.headers["ETag"] != etag
+
+
+def test_availability_of_an_unknown_event_is_404(database):
+    """No ETag or 304 for an event that doesn't exist"""
+    response = availability_of(999999, **{"If-None-Match": "*"})
+
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+def test_large_counts_are_rounded_down(database, create_event, monkeypatch):
+    """Counts past the threshold are rounded down and flagged, so the ETag holds through small changes"""
+    monkeypatch.setattr(event_services, "AVAILABILITY_APPROXIMATE_ABOVE", 10)
+    monkeypatch.setattr(event_services, "AVAILABILITY_APPROXIMATE_STEP", 4)
+    event_id = create_event(pool_counts=(15,))
+
+    response = availability_of(event_id)
+    assert response.json()["data"]["tickets_remaining"] == 12
+    assert response.json()["data"]["approximate"]
+    etag = response.headers["ETag"]
+
+    request("POST", "/api/v1/tickets", json={"event_id": event_id, "ticket_count": 2}, headers={"X-User-Id": "9206"})
+
+    assert availability_of(event_id, **{"If-None-Match": etag}).status_code == 304
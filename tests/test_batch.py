@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.controllers.v1 import tickets as tickets_controller
+from app.core.config import POOL_SAMPLE_SIZE
+from app.core.db import session, get_engine
+from app.exceptions import ApiBaseException
+from app.models.tickets import Ticket
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketBatchCreate, TicketBatchEntry
+from app.services.admission import AdmissionLimits, EventAdmissionController
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService, _allocate_batch_seats
+
+
+class RecordingIndex(AvailabilityIndex):
+    """Availability index that remembers the sample sizes asked for"""
+
+    def __init__(self):
+        super().__init__()
+        self.limits = []
+
+    def candidates(self, event_id, limit=None):
+        self.limits.append(limit)
+        return super().candidates(event_id, limit)
+
+
+def book_batch(bookings, user_id, availability=None):
+    with session() as db:
+        service = TicketService(TicketRepository(db), inventory=None, availability=availability or AvailabilityIndex(),
+                                event_cache=EventMetadataCache(path=""))
+        return service.book_tickets_batch(TicketBatchCreate(bookings=bookings), user_id)
+
+
+def test_other_users_need_the_event_owner(database, create_event):
+    """Entries for other users only go through on the caller's own events"""
+    event_id = create_event()
+
+    response = book_batch([
+        TicketBatchEntry(user_id=6001, event_id=event_id, ticket_count=1),
+        TicketBatchEntry(user_id=6002, event_id=event_id, ticket_count=1),
+    ], user_id=6001)
+    assert [result.status_code for result in response.results] == [None, 401]
+
+    # create_event makes user 1 the owner.
+    response = book_batch([
+        TicketBatchEntry(user_id=6003, event_id=event_id, ticket_count=1),
+        TicketBatchEntry(user_id=6004, event_id=event_id, ticket_count=1),
+    ], user_id=1)
+    assert response.booked_count == 2
+
+
+def test_pools_are_sampled_unless_the_group_needs_more(database, create_event):
+    """A small group reads a bounded sample, a large one widens to every pool"""
+    event_id = create_event(pool_counts=(2,) * 20)
+    availability = RecordingIndex()
+
+    book_batch([TicketBatchEntry(user_id=6010, event_id=event_id, ticket_count=1)], 1, availability)
+    assert availability.limits == [POOL_SAMPLE_SIZE]
+
+    availability.limits.clear()
+    response = book_batch([
+        TicketBatchEntry(user_id=user_id, event_id=event_id, ticket_count=2) for user_id in range(6011, 6029)
+    ], 1, availability)
+    assert response.booked_count == 18
+    assert availability.limits[-1] is None
+
+
+def test_ticket_ids_without_returning(database, create_event, monkeypatch):
+    """Without RETURNING the ids come from the rows read back, never from arithmetic on lastrowid"""
+    event_id = create_event()
+    monkeypatch.setattr(get_engine("sync").dialect, "insert_executemany_returning_sort_by_parameter_order", False)
+
+    bookings = [TicketBatchEntry(user_id=user_id, event_id=event_id, ticket_count=1) for user_id in (6030, 6031, 6032)]
+    response = book_batch(bookings, 1)
+
+    with session() as db:
+        owners = {result.ticket.ticket_id: db.get(Ticket, result.ticket.ticket_id).user_id for result in response.results}
+    assert [owners[result.ticket.ticket_id] for result in response.results] == [6030, 6031, 6032]
+
+
+def test_batch_goes_through_admission(monkeypatch):
+    """A group is admitted once per event and releases what it took when shed"""
+    controller = EventAdmissionController(AdmissionLimits(max_in_flight=1))
+    monkeypatch.setattr(tickets_controller, "booking_admission", controller)
+    controller.admit(2)
+
+    batch = TicketBatchCreate(bookings=[
+        TicketBatchEntry(user_id=1, event_id=1, ticket_count=1),
+        TicketBatchEntry(user_id=1, event_id=2, ticket_count=1),
+    ])
+
+    async def admit():
+        dependency = tickets_controller.admit_batch(batch)
+        await dependency.__anext__()
+
+    with pytest.raises(ApiBaseException) as shed:
+        asyncio.run(admit())
+    assert shed.value.status_code == 429
+    assert controller.stats()["in_flight"] == 1
+
+
+def test_batch_seats_go_to_the_entries_in_order():
+    """Entries are filled in order while the seats last, and what's left over goes back"""
+    allocations, returns = _allocate_batch_seats([(1, 2), (2, 3)], [2, 4, 2])
+
+    assert allocations == [[(1, 2)], [], [(2, 2)]]
+    assert returns == [(2, 1)]
@@ -0,0 +1,32 @@
+import asyncio
+
+from benchmarks.run import SETTINGS, run_benchmark
+
+
+def test_flash_sale_reports_failed_pool_attempts(database):
+    """Buyers racing for a few seats miss pools, and the report counts it with the resharder off"""
+    result = asyncio.run(run_benchmark("flash_sale", {"users": 80, "concurrency": 20, "pool_size": 20, "seed": 1}))
+
+    assert result["successful_bookings"] > 0
+    assert result["pool_attempts"]["failed"] > 0
+    assert result["pool_attempts"]["failed_per_booking"] > 0
+
+
+def test_benchmark_report_has_every_field(database):
+    """A tiny run fills in the report that benchmarks.compare reads"""
+    result = asyncio.run(run_benchmark("churn", {"users": 4, "concurrency": 2, "pool_size": 10, "rounds": 1, "seed": 1}))
+
+    assert result["scenario"] == "churn"
+    assert result["options"]["users"] == 4
+    assert set(result["settings"]) == set(SETTINGS)
+    # Two bookings and one cancellation per user.
+    assert result["requests"] == 12
+    assert result["successful_bookings"] == 8
+    assert result["status_codes"] == {"book": {"200": 8}, "cancel": {"200": 4}}
+    assert result["duration_seconds"] > 0
+    assert result["throughput_rps"] > 0
+    assert set(result["latency_ms"]) == {"all", "book", "cancel"}
+    assert set(result["latency_ms"]["all"]) == {"p50", "p95", "p99", "mean", "max"}
+    assert result["sql"]["statements"] > 0
+    assert result["sql"]["statements_per_booking"] == round(result["sql"]["statements"] / 8, 3)
+    assert set(result["pool_attempts"]) == {"failed", "failed_per_booking"}
@@ -0,0 +1,108 @@
+import asyncio
+import gc
+
+from prometheus_client import REGISTRY
+
+from app.core.db import async_session
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketBatchEntry, TicketBatchItemResult, TicketBatchResponse, TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.coalescing import BookingCoalescer
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService
+
+
+def entry(user_id, event_id=1):
+    return TicketBatchEntry(user_id=user_id, event_id=event_id, ticket_count=1)
+
+
+def echo_response(batch):
+    results = [TicketBatchItemResult(index=index, success=False, status_code=400, message=str(booking.user_id))
+               for index, booking in enumerate(batch.bookings)]
+    return TicketBatchResponse(booked_count=0, failed_count=len(results), results=results)
+
+
+def test_bookings_within_the_window_share_a_batch():
+    """Concurrent bookings of one event are booked together, each gets its own result"""
+    batches = []
+
+    async def book_batch(batch):
+        batches.append([booking.user_id for booking in batch.bookings])
+        return echo_response(batch)
+
+    async def scenario():
+        coalescer = BookingCoalescer(book_batch, window_ms=20, max_batch=10)
+        return await asyncio.gather(*(coalescer.submit(entry(user_id)) for user_id in (1, 2, 3)))
+
+    results = asyncio.run(scenario())
+
+    assert batches == [[1, 2, 3]]
+    assert [result.message for result in results] == ["1", "2", "3"]
+
+
+def test_batch_in_flight_survives_garbage_collection_and_drains():
+    """A flushed batch is referenced until it finishes, and drain() waits for it"""
+    finished = []
+
+    async def book_batch(batch):
+        await asyncio.sleep(0.05)
+        finished.append(len(batch.bookings))
+        return echo_response(batch)
+
+    async def scenario():
+        coalescer = BookingCoalescer(book_batch, window_ms=1000, max_batch=2)
+        waiting = [asyncio.ensure_future(coalescer.submit(entry(user_id))) for user_id in (1, 2, 3)]
+        await asyncio.sleep(0)
+        gc.collect()
+        # 1 and 2 filled a batch that is booking; 3 waits in an open one.
+        assert len(coalescer._tasks) == 1
+        await coalescer.drain()
+        assert not coalescer._tasks
+        return await asyncio.gather(*waiting)
+
+    results = asyncio.run(scenario())
+
+    assert sorted(finished) == [1, 2]
+    assert len(results) == 3
+
+
+def test_failed_batch_fails_every_booking():
+    """An error of the batch reaches every caller in it"""
+    async def book_batch(batch):
+        raise RuntimeError("database gone")
+
+    async def scenario():
+        coalescer = BookingCoalescer(book_batch, window_ms=1, max_batch=10)
+        return await asyncio.gather(*(coalescer.submit(entry(user_id)) for user_id in (1, 2)),
+                                    return_exceptions=True)
+
+    assert [type(error) for error in asyncio.run(scenario())] == [RuntimeError, RuntimeError]
+
+
+def test_coalesced_bookings_count_their_pool_attempts(database, create_event):
+    """Each coalesced booking is observed in the pools-tried histogram like a single one"""
+    event_id = create_event(pool_counts=(5, 5))
+    availability = AvailabilityIndex()
+    event_cache = EventMetadataCache(path="")
+    observed_before = REGISTRY.get_sample_value("booking_pools_tried_count") or 0
+
+    def service(db, coalescer=None):
+        return TicketService(TicketRepository(db), inventory=None, availability=availability,
+                                  event_cache=event_cache, coalescer=coalescer)
+
+    async def book_batch(batch):
+        async with async_session() as db:
+            return await service(db).book_tickets_batch(batch)
+
+    async def book(coalescer, user_id):
+        async with async_session() as db:
+            return await service(db, coalescer).book_ticket(TicketCreate(event_id=event_id, ticket_count=1), user_id)
+
+    async def scenario():
+        coalescer = BookingCoalescer(book_batch, window_ms=20, max_batch=10)
+        return await asyncio.gather(*(book(coalescer, user_id) for user_id in range(7001, 7005)))
+
+    tickets = asyncio.run(scenario())
+
+    assert len({ticket.ticket_id for ticket in tickets}) == 4
+    assert REGISTRY.get_sample_value("booking_pools_tried_count") - observed_before == 4
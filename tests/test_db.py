@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+
+def test_importing_the_app_creates_no_engine(tmp_path):
+    """Engines and pools only come up in the lifespan"""
+    script = (
+        "from benchmarks.run import configure_environment\n"
+        f"configure_environment({str(tmp_path / 'import.db')!r})\n"
+        "import app.main\n"
+        "from app.core.db import ENGINES, create_engines, session\n"
+        "assert not ENGINES\n"
+        "create_engines()\n"
+        "assert set(ENGINES) == {'sync', 'async'}\n"
+        "assert session().get_bind() is ENGINES['sync'][0]\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", script], cwd=root, check=True)
@@ -0,0 +1,34 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from app.core.db import session, async_session
+from app.core.utils import get_utc_now
+from app.repositories.idempotency import IdempotencyRepository
+
+
+def claim_twice(user_id, mode):
+    now = get_utc_now()
+    args = (user_id, "key", "fingerprint", now, now + timedelta(hours=1), now - timedelta(minutes=1))
+
+    if mode == "async":
+        async def claim():
+            async with async_session() as db:
+                repo = IdempotencyRepository(db)
+                return await repo.claim(*args), await repo.claim(*args)
+        return asyncio.run(claim())
+
+    with session() as db:
+        repo = IdempotencyRepository(db)
+        return repo.claim(*args), repo.claim(*args)
+
+
+@pytest.mark.parametrize("user_id, mode", [(7401, "sync"), (7402, "async")])
+def test_errors_reach_the_yield_that_raised_them(database, user_id, mode):
+    """A failed call is caught where the repository yielded it, on either session"""
+    first, second = claim_twice(user_id, mode)
+
+    assert first is None
+    # The second insert hits the first one's key and falls back to reading it.
+    assert tuple(second) == ("fingerprint", None, None)
@@ -20,6 +20,18 @@ def test_health_check():
     assert response.status_code == 200
     assert response.json()["success"] == "true"
 
+def test_ready_after_warmup():
+    """Verify the worker reports ready once the warm-up has finished"""
+    import httpx
+    import time
+    for _ in range(50):
+        response = httpx.get("http://localhost:8000/ready")
+        if response.status_code == 200:
+            break
+        time.sleep(0.1)
+    assert response.status_code == 200
+    assert response.json()["warmup"]["ready"] is True
+
 def test_create_event_success(client):
     """Test creating a new event"""
     data = generate_unique_event_data()
@@ -119,3 +131,191 @@ def test_cancel_unauthorized(client):
     
     assert response.status_code == 401
     assert "not allowed" in response.json()["message"]
+
+def test_create_events_batch_reports_per_item_results(client):
+    """Test bulk event creation creates valid items and reports invalid ones"""
+    valid = generate_unique_event_data()
+    big = generate_unique_event_data()
+    big["pool_size"] = 2500
+    invalid = generate_unique_event_data()
+    invalid["pool_size"] = 0
+
+    response = client.post("/events/batch", json={"events": [valid, invalid, big]}, headers={"X-User-Id": "1"})
+
+    assert response.status_code == 200
+    result = response.json()["data"]
+    assert result["created_count"] == 2
+    assert result["failed_count"] == 1
+    assert [item["success"] for item in result["results"]] == [True, False, True]
+    assert result["results"][0]["event_name"] == valid["name"]
+    assert result["results"][1]["errors"]
+
+    # Created events are bookable
+    response = client.post("/tickets", json={"event_id": result["results"][2]["event_id"], "ticket_count": 1}, headers={"X-User-Id": "501"})
+    assert response.status_code == 200
+
+def test_book_tickets_batch_reports_per_entry_results(client):
+    """Test group booking applies quota and availability per entry"""
+    data = generate_unique_event_data()
+    data["pool_size"] = 4
+    response = client.post("/events", json=data, headers={"X-User-Id": "1"})
+    event_id = response.json()["data"]["event_id"]
+
+    bookings = [
+        {"user_id": 601, "event_id": event_id, "ticket_count": 2},
+        {"user_id": 601, "event_id": event_id, "ticket_count": 1},  # quota exceeded
+        {"user_id": 602, "event_id": event_id, "ticket_count": 1},
+        {"user_id": 603, "event_id": event_id, "ticket_count": 2},  # only 1 seat left
+        {"user_id": 604, "event_id": 999999999, "ticket_count": 1},  # unknown event
+    ]
+    response = client.post("/tickets/batch", json={"bookings": bookings}, headers={"X-User-Id": "1"})
+
+    assert response.status_code == 200
+    result = response.json()["data"]
+    assert result["booked_count"] == 2
+    assert result["failed_count"] == 3
+    assert [item["success"] for item in result["results"]] == [True, False, True, False, False]
+    assert [item["status_code"] for item in result["results"]] == [None, 400, None, 400, 404]
+    assert result["results"][0]["ticket"]["amount"] == data["ticket_price"] * 2
+
+    # The seat left over from the short entry is still bookable
+    response = client.post("/tickets", json={"event_id": event_id, "ticket_count": 1}, headers={"X-User-Id": "605"})
+    assert response.status_code == 200
+
+def test_book_tickets_batch_only_for_owned_events(client):
+    """Test group booking for other users needs the event's owner"""
+    data = generate_unique_event_data()
+    response = client.post("/events", json=data, headers={"X-User-Id": "1"})
+    event_id = response.json()["data"]["event_id"]
+
+    bookings = [
+        {"user_id": 611, "event_id": event_id, "ticket_count": 1},
+        {"user_id": 612, "event_id": event_id, "ticket_count": 1},  # someone else
+    ]
+    response = client.post("/tickets/batch", json={"bookings": bookings})
+    assert response.status_code == 422
+
+    response = client.post("/tickets/batch", json={"bookings": bookings}, headers={"X-User-Id": "611"})
+    assert response.status_code == 200
+    result = response.json()["data"]
+    assert [item["success"] for item in result["results"]] == [True, False]
+    assert result["results"][1]["status_code"] == 401
+
+def test_availability_supports_conditional_requests(client):
+    """Test availability counts bookings and answers 304 to a matching ETag"""
+    event_id = test_create_event_success(client)
+
+    response = client.get(f"/events/{event_id}/availability")
+    assert response.status_code == 200
+    assert response.json()["data"]["tickets_remaining"] == 10
+    etag = response.headers["ETag"]
+
+    response = client.get(f"/events/{event_id}/availability", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post("/tickets", json={"event_id": event_id, "ticket_count": 2}, headers={"X-User-Id": "701"})
+
+    response = client.get(f"/events/{event_id}/availability", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["data"]["tickets_remaining"] == 8
+    assert response.headers["ETag"] != etag
+
+    response = client.get("/events/999999999/availability")
+    assert response.status_code == 404
+
+def test_list_tickets_pages_with_cursor(client):
+    """Test listing a user's tickets page by page, newest first"""
+    user_id = str(800 + uuid.uuid4().int % 100000)
+    ticket_ids = []
+    for _ in range(3):
+        event_id = test_create_event_success(client)
+        response = client.post("/tickets", json={"event_id": event_id, "ticket_count": 1}, headers={"X-User-Id": user_id})
+        ticket_ids.append(response.json()["data"]["ticket_id"])
+    client.delete(f"/tickets/{ticket_ids[0]}", headers={"X-User-Id": user_id})
+
+    response = client.get("/tickets", params={"limit": 2}, headers={"X-User-Id": user_id})
+    assert response.status_code == 200
+    page = response.json()["data"]
+    assert [ticket["ticket_id"] for ticket in page["tickets"]] == ticket_ids[:0:-1]
+
+    response = client.get("/tickets", params={"limit": 2, "cursor": page["next_cursor"]}, headers={"X-User-Id": user_id})
+    page = response.json()["data"]
+    assert [ticket["ticket_id"] for ticket in page["tickets"]] == ticket_ids[:1]
+    assert page["next_cursor"] is None
+
+    response = client.get("/tickets", params={"status": "booked"}, headers={"X-User-Id": user_id})
+    assert [ticket["ticket_id"] for ticket in response.json()["data"]["tickets"]] == ticket_ids[:0:-1]
+
+def test_stats_reports_cache_and_admission_counters(client):
+    """Test the stats endpoint exposes the runtime counters"""
+    response = client.get("/stats")
+
+    assert response.status_code == 200
+    stats = response.json()["data"]
+    assert "hits" in stats["event_cache"]
+    assert "admission" in stats
+    assert stats["worker"]["workers"] >= 1
+    assert stats["worker"]["primary_connections"] > 0
+
+def test_idempotency_key_replays_booking(client):
+    """Test a retried booking with the same Idempotency-Key doesn't book twice"""
+    data = generate_unique_event_data()
+    response = client.post("/events", json=data, headers={"X-User-Id": "1"})
+    event_id = response.json()["data"]["event_id"]
+
+    headers = {"X-User-Id": "701", "Idempotency-Key": str(uuid.uuid4())}
+    first = client.post("/tickets", json={"event_id": event_id, "ticket_count": 1}, headers=headers)
+    retry = client.post("/tickets", json={"event_id": event_id, "ticket_count": 1}, headers=headers)
+
+    assert first.status_code == 200
+    assert retry.status_code == 200
+    assert retry.json()["data"]["ticket_id"] == first.json()["data"]["ticket_id"]
+
+    # Reusing the key for a different request is rejected
+    response = client.post("/tickets", json={"event_id": event_id, "ticket_count": 2}, headers=headers)
+    assert response.status_code == 422
+
+    # Only one ticket counts against the quota
+    response = client.post("/tickets", json={"event_id": event_id, "ticket_count": 1}, headers={"X-User-Id": "701"})
+    assert response.status_code == 200
+
+
+def test_hold_then_confirm_ticket(client):
+    """Test a hold is pending until confirmed and counts against the quota"""
+    data = generate_unique_event_data()
+    response = client.post("/events", json=data, headers={"X-User-Id": "1"})
+    event_id = response.json()["data"]["event_id"]
+
+    response = client.post("/tickets/holds", json={"event_id": event_id, "ticket_count": 2}, headers={"X-User-Id": "801"})
+    assert response.status_code == 200
+    hold = response.json()["data"]
+    assert hold["status"] == "pending"
+    assert hold["expires_at"]
+
+    # Held seats count against the quota
+    response = client.post("/tickets", json={"event_id": event_id, "ticket_count": 1}, headers={"X-User-Id": "801"})
+    assert response.status_code == 400
+
+    # Only the holder can confirm
+    response = client.post(f"/tickets/{hold['ticket_id']}/confirm", headers={"X-User-Id": "802"})
+    assert response.status_code == 401
+
+    response = client.post(f"/tickets/{hold['ticket_id']}/confirm", headers={"X-User-Id": "801"})
+    assert response.status_code == 200
+    assert response.json()["data"]["status"] == "booked"
+
+    response = client.post(f"/tickets/{hold['ticket_id']}/confirm", headers={"X-User-Id": "801"})
+    assert response.status_code == 400
+
+
+def test_metrics_reports_booking_latency(client):
+    """Test /metrics exposes per-route latency and SQL counts after a booking"""
+    import httpx
+    event_id = test_create_event_success(client)
+    client.post("/tickets", json={"event_id": event_id, "ticket_count": 1}, headers={"X-User-Id": "901"})
+
+    response = httpx.get("http://localhost:8000/metrics")
+    assert response.status_code == 200
+    assert '/tickets",status="200"}' in response.text
+    assert 'http_request_db_statements_count{method="POST"' in response.text
+    assert "db_pool_checkout_wait_seconds" in response.text
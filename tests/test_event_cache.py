@@ -0,0 +1,115 @@
+import threading
+from datetime import datetime, timezone
+
+from app.services.event_cache import EventMetadata, EventMetadataCache
+
+
+def metadata(event_id, ticket_price=50.0):
+    return EventMetadata(
+        event_id=event_id,
+        exists=True,
+        ticket_price=ticket_price,
+        event_time=datetime(2030, 1, 1, tzinfo=timezone.utc),
+        first_pool_id=event_id * 10,
+        last_pool_id=event_id * 10 + 9
+    )
+
+
+def test_hit_takes_no_lock_and_writes_nothing(tmp_path):
+    """A lookup neither flocks the file nor changes a byte of the table"""
+    cache = EventMetadataCache(path=str(tmp_path / "cache.bin"), slots=64)
+    cache.store(1, metadata(1), cache.version(1))
+    table = bytes(cache._map)
+
+    cache._locked = None
+    assert cache.get(1) == metadata(1)
+    assert cache.get(2) is None
+    assert bytes(cache._map) == table
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_processes_on_one_file_share_entries(tmp_path):
+    """Workers opening the same path see each other's stores and invalidations"""
+    path = str(tmp_path / "cache.bin")
+    first, second = EventMetadataCache(path=path, slots=64), EventMetadataCache(path=path, slots=64)
+
+    first.store(1, metadata(1), first.version(1))
+    assert second.get(1) == metadata(1)
+
+    second.invalidate(1)
+    assert first.get(1) is None
+
+
+def test_invalidation_only_discards_loads_of_its_event():
+    """A load that raced an invalidation of its own event is dropped, loads of other events are kept"""
+    cache = EventMetadataCache(path="", slots=64)
+    first_version, second_version = cache.version(1), cache.version(2)
+
+    cache.invalidate(1)
+    cache.store(1, metadata(1), first_version)
+    cache.store(2, metadata(2), second_version)
+
+    assert cache.get(1) is None
+    assert cache.get(2) == metadata(2)
+
+
+def test_clear_discards_entries_and_loads_in_flight():
+    """clear() drops every entry and every load started before it"""
+    cache = EventMetadataCache(path="", slots=64)
+    cache.store(1, metadata(1), cache.version(1))
+    bulk_version, version = cache.version(), cache.version(2)
+
+    cache.clear()
+    cache.store(2, metadata(2), version)
+    cache.store(3, metadata(3), bulk_version)
+
+    assert cache.get(1) is None and cache.get(2) is None and cache.get(3) is None
+
+
+def test_clear_on_start_drops_entries_of_the_previous_run(tmp_path):
+    """A table reopened after a restart and cleared, as the lifespan does, serves nothing stale"""
+    path = str(tmp_path / "cache.bin")
+    previous = EventMetadataCache(path=path, slots=64)
+    previous.store(1, metadata(1), previous.version(1))
+
+    restarted = EventMetadataCache(path=path, slots=64)
+    assert restarted.get(1) == metadata(1)
+    restarted.clear()
+    assert restarted.get(1) is None
+
+
+def test_full_window_evicts_the_entry_expiring_first():
+    """With every slot taken, a store replaces the oldest entry"""
+    cache = EventMetadataCache(path="", slots=8)
+    for event_id in range(1, 9):
+        cache.store(event_id, metadata(event_id), cache.version(event_id))
+
+    cache.store(9, metadata(9), cache.version(9))
+
+    assert cache.get(1) is None
+    assert all(cache.get(event_id) == metadata(event_id) for event_id in range(2, 10))
+    assert cache.stats()["evictions"] == 1
+
+
+def test_readers_never_see_a_half_written_slot(tmp_path):
+    """Lookups racing a writer that keeps rewriting the slot return a whole entry or a miss"""
+    path = str(tmp_path / "cache.bin")
+    writer_cache, reader_cache = EventMetadataCache(path=path, slots=8), EventMetadataCache(path=path, slots=8)
+    stop = threading.Event()
+
+    def write():
+        price = 0
+        while not stop.is_set():
+            price += 1
+            writer_cache.store(1, metadata(1, ticket_price=price), writer_cache.version(1))
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(20000):
+            found = reader_cache.get(1)
+            if found is not None:
+                assert found == metadata(1, ticket_price=found.ticket_price)
+    finally:
+        stop.set()
+        writer.join()
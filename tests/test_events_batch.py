@@ -0,0 +1,55 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.core.db import session, async_session, get_engine
+from app.core.utils import get_utc_now
+from app.models.events import Event, EventTicketPool
+from app.repositories.events import EventRepository
+from app.schemas.events import EventBatchCreate
+from app.services.events import EventService
+
+
+def batch(*names):
+    return EventBatchCreate(events=[
+        {"name": name, "address": "1 Batch St", "event_time": (get_utc_now() + timedelta(days=10)).isoformat(),
+         "pool_size": 5, "ticket_price": 20.0}
+        for name in names
+    ])
+
+
+def check_created(response, names):
+    assert response.created_count == len(names)
+    with session() as db:
+        for result, name in zip(response.results, names):
+            assert db.get(Event, result.event_id).name == name
+            pooled = db.execute(select(EventTicketPool.ticket_count).where(
+                EventTicketPool.event_id == result.event_id
+            )).scalars().all()
+            assert sum(pooled) == 5
+
+
+@pytest.mark.parametrize("returning", [True, False])
+def test_batch_events_get_their_own_ids(database, monkeypatch, returning):
+    """Every event of a batch is matched to its own id, with or without RETURNING"""
+    monkeypatch.setattr(get_engine("sync").dialect, "insert_executemany_returning_sort_by_parameter_order", returning)
+    names = [f"Sync batch {returning} {index}" for index in range(3)]
+
+    with session() as db:
+        response = EventService(EventRepository(db)).create_events_batch(batch(*names), owner_id=2)
+
+    check_created(response, names)
+
+
+def test_async_batch_events_get_their_own_ids(database, monkeypatch):
+    """The async path reads the ids back the same way"""
+    monkeypatch.setattr(get_engine("async").dialect, "insert_executemany_returning_sort_by_parameter_order", False)
+    names = [f"Async batch {index}" for index in range(3)]
+
+    async def create():
+        async with async_session() as db:
+            return await EventService(EventRepository(db)).create_events_batch(batch(*names), owner_id=2)
+
+    check_created(asyncio.run(create()), names)
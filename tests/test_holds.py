@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.core.db import session
+from app.core.utils import get_utc_now
+from app.exceptions import ApiBaseException
+from app.models.holdings import UserEventHolding
+from app.models.tickets import Ticket, TicketStatus
+from app.repositories.events import EventRepository
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.holds import HoldSweeper
+from app.services.tickets import TicketService
+
+
+def service(db, availability):
+    return TicketService(TicketRepository(db), booking_mode="pooled", inventory=None, availability=availability,
+                         ledger=None, event_cache=EventMetadataCache(path=""))
+
+
+def hold(availability, event_id, user_id, ticket_count=1):
+    with session() as db:
+        return service(db, availability).hold_ticket(TicketCreate(event_id=event_id, ticket_count=ticket_count), user_id)
+
+
+def expire(*ticket_ids):
+    with session() as db:
+        db.execute(update(Ticket).where(Ticket.id.in_(ticket_ids)).values(
+            expires_at=get_utc_now() - timedelta(minutes=1)
+        ))
+        db.commit()
+
+
+def status_of(ticket_id):
+    with session() as db:
+        return db.execute(select(Ticket.status).where(Ticket.id == ticket_id)).scalar()
+
+
+def held(user_id, event_id):
+    with session() as db:
+        return db.execute(select(UserEventHolding.ticket_count).where(
+            UserEventHolding.user_id == user_id,
+            UserEventHolding.event_id == event_id
+        )).scalar()
+
+
+def pool_counts(event_id):
+    with session() as db:
+        return [pool.ticket_count for pool in EventRepository(db).get_pool_layout(event_id)]
+
+
+def test_confirmed_hold_is_booked(database, create_event):
+    """A hold confirmed in time becomes a booking and keeps its seats"""
+    event_id = create_event(pool_counts=(2,))
+    availability = AvailabilityIndex()
+    ticket = hold(availability, event_id, 9501)
+    assert ticket.status == TicketStatus.pending
+
+    with session() as db:
+        confirmed = service(db, availability).confirm_ticket(ticket.ticket_id, 9501)
+
+    assert confirmed.status == TicketStatus.booked
+    assert status_of(ticket.ticket_id) == TicketStatus.booked
+    assert pool_counts(event_id) == [1]
+
+
+def test_expired_hold_cannot_be_confirmed(database, create_event):
+    """Past its expiry a hold is gone, even before the sweeper got to it"""
+    event_id = create_event(pool_counts=(2,))
+    availability = AvailabilityIndex()
+    ticket = hold(availability, event_id, 9502)
+    expire(ticket.ticket_id)
+
+    with session() as db:
+        with pytest.raises(ApiBaseException) as expired:
+            service(db, availability).confirm_ticket(ticket.ticket_id, 9502)
+    assert expired.value.status_code == 410
+
+
+def test_sweeper_releases_expired_holds_in_batches(database, create_event):
+    """Expired holds give back their seats and quota, batch after batch; live ones are kept"""
+    event_id = create_event(pool_counts=(2, 2))
+    availability = AvailabilityIndex()
+    expired = [hold(availability, event_id, user_id).ticket_id for user_id in (9503, 9504, 9505)]
+    live = hold(availability, event_id, 9506).ticket_id
+    expire(*expired)
+
+    sweeper = HoldSweeper(session_factory=session, inventory=None, availability=availability,
+                          batch_size=2, ledger=None)
+    assert sweeper.sweep_once() >= 3
+
+    assert [status_of(ticket_id) for ticket_id in expired] == [TicketStatus.cancelled] * 3
+    assert status_of(live) == TicketStatus.pending
+    assert sum(pool_counts(event_id)) == 3
+    assert [held(user_id, event_id) for user_id in (9503, 9504, 9505, 9506)] == [0, 0, 0, 1]
+
+    with session() as db:
+        with pytest.raises(ApiBaseException) as swept:
+            service(db, availability).confirm_ticket(expired[0], 9503)
+    assert swept.value.status_code == 400
@@ -0,0 +1,73 @@
+from sqlalchemy import insert
+
+from app.core.db import session
+from app.models.tickets import Ticket, TicketStatus
+from app.repositories.events import EventRepository
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.inventory import InMemoryInventory
+from app.services.tickets import TicketService
+
+
+def pool_counts(event_id):
+    with session() as db:
+        return [pool.ticket_count for pool in EventRepository(db).get_pool_layout(event_id)]
+
+
+def book(inventory, event_id, user_id, ticket_count=1):
+    with session() as db:
+        service = TicketService(TicketRepository(db), inventory=inventory, availability=AvailabilityIndex(),
+                                ledger=None, event_cache=EventMetadataCache(path=""))
+        return service.book_ticket(TicketCreate(event_id=event_id, ticket_count=ticket_count), user_id)
+
+
+def test_bookings_reach_the_pools_on_flush(database, create_event):
+    """Bookings only move the counters until the flusher writes their net change back"""
+    event_id = create_event(pool_counts=(3, 3))
+    inventory = InMemoryInventory(session_factory=session)
+
+    book(inventory, event_id, 9101, ticket_count=2)
+    book(inventory, event_id, 9102, ticket_count=2)
+
+    assert inventory.available(event_id) == 2
+    assert sum(pool_counts(event_id)) == 6
+
+    inventory.flush()
+    assert sum(pool_counts(event_id)) == 2
+
+
+def test_reserve_takes_nothing_when_short(database, create_event):
+    """A request the event can't fill leaves every counter as it was"""
+    event_id = create_event(pool_counts=(1, 1))
+    inventory = InMemoryInventory(session_factory=session)
+    with session() as db:
+        inventory.load_event(event_id, *TicketRepository(db).get_event_inventory(event_id))
+
+    assert inventory.reserve(event_id, 3) is None
+    assert inventory.available(event_id) == 2
+
+    allocations = inventory.reserve(event_id, 2)
+    assert sorted(count for _, count in allocations) == [1, 1]
+    assert inventory.available(event_id) == 0
+
+
+def test_load_reconciles_pools_with_the_tickets(database, create_event):
+    """Pool rows that missed a flush before a crash are corrected from the tickets at load"""
+    event_id = create_event(pool_counts=(5, 5))
+    with session() as db:
+        # Booked tickets whose pool decrements never reached the rows.
+        db.execute(insert(Ticket), [
+            {"event_id": event_id, "user_id": 9103, "amount": 100.0, "count": 2, "status": TicketStatus.booked},
+            {"event_id": event_id, "user_id": 9104, "amount": 50.0, "count": 1, "status": TicketStatus.pending},
+            {"event_id": event_id, "user_id": 9105, "amount": 100.0, "count": 2, "status": TicketStatus.cancelled},
+        ])
+        db.commit()
+
+    inventory = InMemoryInventory(session_factory=session)
+    inventory.load_upcoming_events()
+
+    assert inventory.available(event_id) == 7
+    inventory.flush()
+    assert sum(pool_counts(event_id)) == 7
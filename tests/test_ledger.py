@@ -0,0 +1,173 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event, select
+from sqlalchemy.dialects import mysql
+
+from app.core.db import session
+from app.exceptions import ApiBaseException
+from app.models.events import EventTicketPool, InventoryLedgerEntry
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate, TicketBatchCreate, TicketBatchEntry
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.inventory import LedgerCompactor
+from app.services.tickets import TicketService
+
+
+def ledger_service(db, availability, ledger):
+    return TicketService(TicketRepository(db), inventory=None, availability=availability, ledger=ledger,
+                         event_cache=EventMetadataCache(path=""))
+
+
+def race(event_id, user_ids, availability, ledger):
+    """Books one seat per user, all released at once; returns (booked ids, error codes)"""
+    barrier = threading.Barrier(len(user_ids))
+
+    def book(user_id):
+        with session() as db:
+            service = ledger_service(db, availability, ledger)
+            barrier.wait()
+            try:
+                return service.book_ticket(TicketCreate(event_id=event_id, ticket_count=1), user_id).ticket_id, None
+            except ApiBaseException as e:
+                return None, e.status_code
+
+    with ThreadPoolExecutor(len(user_ids)) as pool:
+        results = list(pool.map(book, user_ids))
+    return [ticket_id for ticket_id, _ in results if ticket_id], [code for _, code in results if code]
+
+
+def remaining(event_id):
+    with session() as db:
+        return TicketRepository(db).get_ledger_remaining(event_id)
+
+
+def pool_counts(event_id):
+    with session() as db:
+        return db.execute(select(EventTicketPool.ticket_count).where(
+            EventTicketPool.event_id == event_id
+        ).order_by(EventTicketPool.id)).scalars().all()
+
+
+def test_booking_locks_only_the_pool_it_debits(database, create_event):
+    """A ledger booking locks one pool row, never the event row or the ledger of other pools"""
+    event_id = create_event(pool_counts=(5, 5))
+    locking = []
+
+    def on_execute(orm_execute_state):
+        # Row locks only come from SELECTs; rendered for MySQL, where they apply.
+        if orm_execute_state.is_select:
+            sql = str(orm_execute_state.statement.compile(dialect=mysql.dialect()))
+            if "FOR UPDATE" in sql or "FOR SHARE" in sql or "LOCK IN SHARE MODE" in sql:
+                locking.append(sql)
+
+    with session() as db:
+        event.listen(db, "do_orm_execute", on_execute)
+        ledger_service(db, AvailabilityIndex(), LedgerCompactor(session_factory=session)).book_ticket(
+            TicketCreate(event_id=event_id, ticket_count=2), 4101
+        )
+
+    assert len(locking) == 1
+    assert "FROM event_ticket_pools" in locking[0]
+    assert "WHERE event_ticket_pools.id = %s FOR UPDATE" in locking[0]
+
+
+def test_concurrent_bookings_spread_over_pools(database, create_event):
+    """Racing bookings of one event debit different pools instead of queueing on one row"""
+    event_id = create_event(pool_counts=(2,) * 16)
+    availability = AvailabilityIndex()
+    ledger = LedgerCompactor(session_factory=session)
+
+    booked, errors = race(event_id, list(range(4201, 4217)), availability, ledger)
+
+    assert len(booked) == 16 and not errors
+    with session() as db:
+        pools = db.execute(select(InventoryLedgerEntry.pool_id).where(InventoryLedgerEntry.event_id == event_id)).scalars().all()
+    assert len(set(pools)) > 1
+    assert remaining(event_id) == 16
+
+
+def test_last_seat_race_books_exactly_one(database, create_event):
+    """Two bookings racing for the last seat end with one ticket, not zero"""
+    event_id = create_event(pool_counts=(1,))
+    availability = AvailabilityIndex()
+    ledger = LedgerCompactor(session_factory=session)
+
+    booked, errors = race(event_id, [1001, 1002], availability, ledger)
+
+    assert len(booked) == 1
+    assert errors == [404]
+    assert remaining(event_id) == 0
+    assert availability.is_sold_out(event_id)
+
+
+def test_concurrent_bookings_sell_every_seat_once(database, create_event):
+    """Many racing bookings neither oversell nor undersell, before and after compaction"""
+    event_id = create_event(pool_counts=(4, 4))
+    availability = AvailabilityIndex()
+    ledger = LedgerCompactor(session_factory=session)
+
+    booked, errors = race(event_id, list(range(2001, 2021)), availability, ledger)
+
+    assert len(booked) == 8
+    assert sorted(set(errors)) == [404]
+    assert remaining(event_id) == 0
+
+    ledger.compact_once()
+    assert remaining(event_id) == 0
+
+
+def test_cancel_returns_seat_to_sold_out_event(database, create_event):
+    """A seat cancelled after a sell-out can be booked again"""
+    event_id = create_event(pool_counts=(1,))
+    availability = AvailabilityIndex()
+    ledger = LedgerCompactor(session_factory=session)
+    (ticket_id,), _ = race(event_id, [3001, 3002], availability, ledger)
+
+    with session() as db:
+        service = ledger_service(db, availability, ledger)
+        owner = 3001 if service.repo.get_ticket_by_ticket_id(ticket_id).user_id == 3001 else 3002
+        service.cancel_ticket(ticket_id, owner)
+
+    booked, errors = race(event_id, [3003], availability, ledger)
+    assert len(booked) == 1 and not errors
+
+
+def test_batch_takes_only_the_seats_left(database, create_event):
+    """A group booking fills the entries that fit and commits no overdraft"""
+    event_id = create_event(pool_counts=(3,))
+    availability = AvailabilityIndex()
+    ledger = LedgerCompactor(session_factory=session)
+
+    with session() as db:
+        response = ledger_service(db, availability, ledger).book_tickets_batch(TicketBatchCreate(bookings=[
+            TicketBatchEntry(user_id=4001, event_id=event_id, ticket_count=2),
+            TicketBatchEntry(user_id=4002, event_id=event_id, ticket_count=2),
+            TicketBatchEntry(user_id=4003, event_id=event_id, ticket_count=1),
+        ]))
+
+    assert [result.success for result in response.results] == [True, False, True]
+    assert remaining(event_id) == 0
+
+
+def test_compaction_keeps_every_pool_non_negative(database, create_event):
+    """Folding bookings and cancellations leaves no pool below zero and the seats left unchanged"""
+    event_id = create_event(pool_counts=(1, 1, 1))
+    availability = AvailabilityIndex()
+    ledger = LedgerCompactor(session_factory=session)
+
+    booked, _ = race(event_id, [4301, 4302, 4303], availability, ledger)
+    with session() as db:
+        service = ledger_service(db, availability, ledger)
+        ticket = service.repo.get_ticket_by_ticket_id(booked[0])
+        service.cancel_ticket(ticket.id, ticket.user_id)
+    race(event_id, [4304], availability, ledger)
+
+    assert remaining(event_id) == 0
+    ledger.compact_once()
+
+    assert pool_counts(event_id) == [0, 0, 0]
+    assert remaining(event_id) == 0
+    with session() as db:
+        assert db.execute(select(InventoryLedgerEntry.id).where(InventoryLedgerEntry.event_id == event_id)).first() is None
@@ -0,0 +1,60 @@
+import pytest
+from sqlalchemy import text
+
+from app.core.db import session
+from app.models.tickets import TicketStatus
+from app.repositories.tickets import TicketRepository, _user_tickets_page
+from app.schemas.tickets import TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService
+
+
+def service(db):
+    return TicketService(TicketRepository(db), inventory=None, availability=AvailabilityIndex(),
+                         event_cache=EventMetadataCache(path=""))
+
+
+def book(event_id, user_id):
+    with session() as db:
+        return service(db).book_ticket(TicketCreate(event_id=event_id, ticket_count=1), user_id).ticket_id
+
+
+def pages(user_id, limit, event_id=None, status=None):
+    """Ticket ids of every page, following next_cursor"""
+    result, cursor = [], None
+    with session() as db:
+        while True:
+            page = service(db).list_tickets(user_id, limit, cursor, event_id, status)
+            result.append([ticket.ticket_id for ticket in page.tickets])
+            cursor = page.next_cursor
+            if cursor is None:
+                return result
+
+
+def test_pages_follow_the_cursor_newest_first(database, create_event):
+    """Pages come back newest first, filtered by event and status, and end with no cursor"""
+    first, second, third = create_event(), create_event(), create_event()
+    tickets = [book(first, 7101), book(second, 7101), book(first, 7101), book(third, 7101), book(second, 7102)]
+    with session() as db:
+        service(db).cancel_ticket(tickets[2], 7101)
+
+    assert pages(7101, 2) == [[tickets[3], tickets[2]], [tickets[1], tickets[0]]]
+    assert pages(7101, 1, event_id=first) == [[tickets[2]], [tickets[0]]]
+    assert pages(7101, 10, status=TicketStatus.booked) == [[tickets[3], tickets[1], tickets[0]]]
+    assert pages(7101, 10, event_id=first, status=TicketStatus.cancelled) == [[tickets[2]]]
+    assert pages(7103, 10) == [[]]
+
+
+@pytest.mark.parametrize("event_id, status", [
+    (None, None), (1, None), (None, TicketStatus.booked), (1, TicketStatus.booked)
+])
+def test_pages_read_only_the_listing_index(database, event_id, status):
+    """Every page is a range of the covering index, in id order: no table lookups and no sort"""
+    stmt = _user_tickets_page(7101, 20, before_id=100, event_id=event_id, status=status)
+    with session() as db:
+        compiled = stmt.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+        plan = " ".join(row.detail for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+
+    assert "USING COVERING INDEX ix_tickets_user_id_listing (user_id=? AND id<?)" in plan
+    assert "TEMP B-TREE" not in plan
@@ -0,0 +1,94 @@
+import asyncio
+
+import httpx
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+
+from app.core.config import DB_MODE
+from app.core.db import dispose_engines, get_engine
+from app.main import app
+
+
+def request(method, path, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_booking_is_recorded_per_route(database, create_event):
+    """A booking shows up under its route template with its SQL work and pool outcome"""
+    event_id = create_event()
+    route = {"method": "POST", "route": "/api/v1/tickets"}
+    before = {
+        "requests": sample("http_request_duration_seconds_count", status="200", **route),
+        "statements": sample("http_request_db_statements_sum", **route),
+        "sql_time": sample("http_request_db_duration_seconds_sum", **route),
+        "updates": sample("db_statement_duration_seconds_count", engine=DB_MODE, operation="UPDATE"),
+        "checkouts": sample("db_pool_checkout_wait_seconds_count", engine=DB_MODE),
+        "hits": sample("booking_pool_attempts_total", result="hit"),
+    }
+
+    response = request("POST", "/api/v1/tickets", json={"event_id": event_id, "ticket_count": 1},
+                       headers={"X-User-Id": "7201"})
+    assert response.status_code == 200
+
+    assert sample("http_request_duration_seconds_count", status="200", **route) == before["requests"] + 1
+    assert sample("http_request_db_statements_sum", **route) > before["statements"]
+    assert sample("http_request_db_duration_seconds_sum", **route) > before["sql_time"]
+    # The quota claim and the pool decrement at least.
+    assert sample("db_statement_duration_seconds_count", engine=DB_MODE, operation="UPDATE") >= before["updates"] + 2
+    assert sample("db_pool_checkout_wait_seconds_count", engine=DB_MODE) > before["checkouts"]
+    assert sample("booking_pool_attempts_total", result="hit") == before["hits"] + 1
+
+
+def test_route_labels_keep_ids_out(database, create_event):
+    """Paths with ids are labelled by their template, and unknown paths share one label"""
+    event_id = create_event()
+    booked = request("POST", "/api/v1/tickets", json={"event_id": event_id, "ticket_count": 1},
+                     headers={"X-User-Id": "7202"})
+    ticket_id = booked.json()["data"]["ticket_id"]
+    cancelled = sample("http_request_duration_seconds_count",
+                       method="DELETE", route="/api/v1/tickets/{ticket_id}", status="200")
+    unmatched = sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404")
+
+    assert request("DELETE", f"/api/v1/tickets/{ticket_id}", headers={"X-User-Id": "7202"}).status_code == 200
+    assert request("GET", f"/api/v1/nothing/{ticket_id}").status_code == 404
+
+    assert sample("http_request_duration_seconds_count",
+                  method="DELETE", route="/api/v1/tickets/{ticket_id}", status="200") == cancelled + 1
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched", status="404") == unmatched + 1
+
+
+def test_pool_metrics_survive_dispose(database, create_event):
+    """Pools recreated by dispose_engines() keep reporting under their engine's name"""
+    event_id = create_event()
+    asyncio.run(dispose_engines())
+    checkouts = sample("db_pool_checkout_wait_seconds_count", engine=DB_MODE)
+
+    request("POST", "/api/v1/tickets", json={"event_id": event_id, "ticket_count": 1}, headers={"X-User-Id": "7204"})
+
+    assert sample("db_pool_checkout_wait_seconds_count", engine=DB_MODE) > checkouts
+    assert sample("db_pool_checked_out_connections", engine=DB_MODE) == get_engine(DB_MODE).pool.checkedout()
+
+
+def test_metrics_endpoint_exposes_every_family(database, create_event):
+    """/metrics serves the text format with the request, SQL, pool, booking and cache families"""
+    event_id = create_event()
+    request("POST", "/api/v1/tickets", json={"event_id": event_id, "ticket_count": 1}, headers={"X-User-Id": "7203"})
+
+    response = request("GET", "/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    families = {family.name for family in text_string_to_metric_families(response.text)}
+    assert {
+        "http_request_duration_seconds", "http_request_db_statements", "http_request_db_duration_seconds",
+        "db_statement_duration_seconds", "db_pool_checkout_wait_seconds", "db_pool_checked_out_connections",
+        "db_pool_capacity_connections", "booking_pools_tried", "booking_pool_attempts", "event_cache_lookups",
+    } <= families
@@ -0,0 +1,64 @@
+import pytest
+
+from app.core.config import POOL_SAMPLE_SIZE
+from app.core.db import session
+from app.exceptions import ApiBaseException
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService
+
+
+def book(event_id, user_id, pool_selection, availability=None):
+    with session() as db:
+        service = TicketService(TicketRepository(db), booking_mode="pooled", inventory=None,
+                                availability=availability or AvailabilityIndex(), pool_selection=pool_selection,
+                                ledger=None, event_cache=EventMetadataCache(path=""))
+        return service.book_ticket(TicketCreate(event_id=event_id, ticket_count=1), user_id)
+
+
+def test_probe_reads_a_bounded_window_of_stocked_pools(database, create_event):
+    """Every probe returns at most the sample size, only non-empty pools, wrapping past the last id"""
+    event_id = create_event(pool_counts=(1, 0) * 10)
+
+    with session() as db:
+        repo = TicketRepository(db)
+        for _ in range(20):
+            pools = repo.probe_pools_with_tickets(event_id, 4)
+            assert len(pools) == 4
+            assert all(count == 1 for _, count in pools)
+
+        # Fewer stocked pools than the sample: all of them, whatever the start.
+        assert len(repo.probe_pools_with_tickets(event_id, 50)) == 10
+
+
+def test_probe_strategy_books_and_detects_sold_out(database, create_event):
+    """Probing books from the window it reads, and an empty window marks the event sold out"""
+    event_id = create_event(pool_counts=(1, 1))
+    availability = AvailabilityIndex()
+
+    book(event_id, 9301, "probe", availability)
+    book(event_id, 9302, "probe", availability)
+
+    with pytest.raises(ApiBaseException) as sold_out:
+        book(event_id, 9303, "probe", availability)
+    assert sold_out.value.status_code == 404
+    assert availability.is_sold_out(event_id)
+
+
+def test_index_strategy_samples_the_candidates(database, create_event):
+    """A single booking tries at most the sample size of pools, not every pool of the event"""
+    event_id = create_event(pool_counts=(1,) * (POOL_SAMPLE_SIZE * 3))
+
+    class RecordingIndex(AvailabilityIndex):
+        def refresh(self, event_id, pool_counts, limit=None):
+            sample = super().refresh(event_id, pool_counts, limit)
+            self.sampled = len(sample)
+            return sample
+
+    availability = RecordingIndex()
+    book(event_id, 9304, "index", availability)
+
+    assert availability.sampled == POOL_SAMPLE_SIZE
+    assert len(availability.candidates(event_id)) == POOL_SAMPLE_SIZE * 3 - 1
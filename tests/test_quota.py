@@ -0,0 +1,118 @@
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.exc import OperationalError
+
+from app.core.db import session
+from app.exceptions import ApiBaseException
+from app.models.holdings import UserEventHolding
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import MAX_TICKETS_PER_USER, TicketService
+
+
+def service(db):
+    return TicketService(TicketRepository(db), inventory=None, availability=AvailabilityIndex(),
+                         event_cache=EventMetadataCache(path=""))
+
+
+def book(event_id, user_id, ticket_count=1):
+    with session() as db:
+        return service(db).book_ticket(TicketCreate(event_id=event_id, ticket_count=ticket_count), user_id)
+
+
+def held(user_id, event_id):
+    with session() as db:
+        return db.execute(select(UserEventHolding.ticket_count).where(
+            UserEventHolding.user_id == user_id,
+            UserEventHolding.event_id == event_id
+        )).scalar()
+
+
+def test_first_booking_creates_the_holding(database, create_event):
+    """The first booking of a user creates the holdings row and claims on it"""
+    event_id = create_event()
+
+    book(event_id, 8001)
+
+    assert held(8001, event_id) == 1
+
+
+def test_later_claims_are_a_single_update(database, create_event):
+    """Once the holdings row exists, a claim is one conditional UPDATE and inserts nothing"""
+    event_id = create_event()
+    statements = []
+
+    def on_statement(conn, cursor, statement, *args):
+        if "user_event_holdings" in statement:
+            statements.append(statement.split()[0])
+
+    with session() as db:
+        repo = TicketRepository(db)
+        event.listen(db.get_bind(), "before_cursor_execute", on_statement)
+        try:
+            assert repo.reserve_user_quota(8007, event_id, 1, MAX_TICKETS_PER_USER)
+            first = list(statements)
+            statements.clear()
+            assert repo.reserve_user_quota(8007, event_id, 1, MAX_TICKETS_PER_USER)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", on_statement)
+        repo.commit()
+
+    assert first == ["UPDATE", "INSERT", "UPDATE"]
+    assert statements == ["UPDATE"]
+    assert held(8007, event_id) == 2
+
+
+def test_quota_is_enforced_across_bookings(database, create_event):
+    """Bookings past the per-user limit are refused and claim nothing"""
+    event_id = create_event()
+    book(event_id, 8002, MAX_TICKETS_PER_USER)
+
+    with pytest.raises(ApiBaseException) as exceeded:
+        book(event_id, 8002)
+    assert exceeded.value.status_code == 400
+    assert held(8002, event_id) == MAX_TICKETS_PER_USER
+
+
+def test_uncommitted_claims_respect_the_limit(database, create_event):
+    """Two claims of one user in flight together never exceed the limit"""
+    event_id = create_event()
+
+    with session() as db:
+        repo = TicketRepository(db)
+        assert repo.reserve_user_quota(8003, event_id, 1, MAX_TICKETS_PER_USER)
+        assert repo.reserve_user_quota(8003, event_id, MAX_TICKETS_PER_USER - 1, MAX_TICKETS_PER_USER)
+        assert not repo.reserve_user_quota(8003, event_id, 1, MAX_TICKETS_PER_USER)
+        assert not repo.reserve_user_quota(8004, event_id, MAX_TICKETS_PER_USER + 1, MAX_TICKETS_PER_USER)
+        repo.commit()
+
+    assert held(8003, event_id) == MAX_TICKETS_PER_USER
+    assert held(8004, event_id) is None
+
+
+def test_cancel_releases_the_quota(database, create_event):
+    """A cancelled ticket gives its quota back"""
+    event_id = create_event()
+    ticket = book(event_id, 8005, MAX_TICKETS_PER_USER)
+
+    with session() as db:
+        service(db).cancel_ticket(ticket.ticket_id, 8005)
+
+    assert held(8005, event_id) == 0
+    book(event_id, 8005)
+
+
+def test_lock_conflict_on_the_claim_is_retryable(database, create_event, monkeypatch):
+    """A deadlock while claiming quota is answered with a 409, not a 500"""
+    event_id = create_event()
+
+    def deadlocked(*args):
+        raise OperationalError("UPDATE user_event_holdings", {}, Exception(1213, "Deadlock found"))
+
+    monkeypatch.setattr(TicketRepository, "reserve_user_quota", deadlocked)
+
+    with pytest.raises(ApiBaseException) as conflict:
+        book(event_id, 8006)
+    assert conflict.value.status_code == 409
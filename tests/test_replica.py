@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import session, RecentWriters
+from app.models.base import Base
+from app.repositories.events import EventRepository
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService
+
+
+@pytest.fixture
+def lagging_replica(database, tmp_path):
+    """A replica that hasn't replicated anything yet: the schema, no rows"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(engine)
+    engine.dispose()
+
+
+def test_rows_missing_on_the_replica_are_read_from_the_primary(create_event, lagging_replica):
+    """A booking and its cancel work while the replica lags behind both"""
+    event_id = create_event(pool_counts=(2,))
+
+    with session() as db, lagging_replica() as replica_db:
+        service = TicketService(TicketRepository(db, replica_db), booking_mode="pooled", inventory=None,
+                                availability=AvailabilityIndex(), ledger=None, event_cache=EventMetadataCache(path=""))
+        ticket = service.book_ticket(TicketCreate(event_id=event_id, ticket_count=1), 9601)
+        cancelled = service.cancel_ticket(ticket.ticket_id, 9601)
+
+    assert cancelled.event_id == event_id
+
+
+def test_event_reads_fall_back_to_the_primary(create_event, lagging_replica):
+    """Pool layout and remaining seats of an event the replica doesn't have yet"""
+    event_id = create_event(pool_counts=(2, 3))
+
+    with session() as db, lagging_replica() as replica_db:
+        repo = EventRepository(db, replica_db)
+        assert [pool.ticket_count for pool in repo.get_pool_layout(event_id)] == [2, 3]
+        assert repo.get_tickets_remaining(event_id) == 5
+        assert repo.get_tickets_remaining(10 ** 9) is None
+
+
+def test_recent_writers_read_the_primary_until_they_expire():
+    """A user who just wrote is tracked for the configured time only"""
+    writers = RecentWriters(ttl=60)
+    writers.record(9602)
+    assert writers.contains(9602)
+    assert not writers.contains(9603)
+
+    disabled = RecentWriters(ttl=0)
+    disabled.record(9602)
+    assert not disabled.contains(9602)
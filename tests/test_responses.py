@@ -0,0 +1,82 @@
+import asyncio
+import httpx
+import orjson
+from fastapi.routing import serialize_response
+
+from app.core.responses import ORJSONResponse, dump_json, error_response, success_response
+from app.main import app
+from app.models.tickets import TicketStatus
+from app.schemas.events import EventAvailabilityResponse
+from app.schemas.response import ApiErrorResponse, ApiSuccessResponse
+from app.schemas.tickets import TicketCreateResponse, TicketHoldResponse, TicketListResponse
+from benchmarks.serialization import cases
+
+
+def request(method, path, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+def test_success_body_matches_the_response_model():
+    """success_response writes what FastAPI would after validating against the route's response_model"""
+    for name, message, data, field in cases():
+        expected = asyncio.run(serialize_response(
+            field=field, response_content=ApiSuccessResponse(message=message, data=data), dump_json=True
+        ))
+        response = success_response(message, data)
+
+        assert orjson.loads(response.body) == orjson.loads(expected), name
+        assert response.headers["content-type"] == "application/json"
+
+
+def test_error_body_matches_the_error_model():
+    """error_response writes ApiErrorResponse, details and headers included"""
+    details = {"event_id": 42, "pools": [1, 2]}
+    response = error_response("Event with ID 42 not found", 404, details, headers={"Retry-After": "1"})
+
+    assert response.status_code == 404
+    assert response.headers["Retry-After"] == "1"
+    assert orjson.loads(response.body) == ApiErrorResponse(
+        message="Event with ID 42 not found", details=details
+    ).model_dump(mode="json")
+    assert orjson.loads(error_response("Sold out", 404).body) == {"success": False, "message": "Sold out", "details": None}
+
+
+def test_models_inside_plain_containers_are_encoded():
+    """Dicts and lists of models, enums, datetimes and int keys all come out as JSON"""
+    ticket = TicketCreateResponse(ticket_id=1, status=TicketStatus.booked, event_id=2, amount=50.0, ticket_count=1)
+
+    assert orjson.loads(dump_json({1: [ticket], "status": TicketStatus.pending})) == {
+        "1": [ticket.model_dump(mode="json")], "status": "pending"
+    }
+    assert orjson.loads(ORJSONResponse({"tickets": [ticket]}).body) == {"tickets": [ticket.model_dump(mode="json")]}
+
+
+def test_routes_return_their_declared_models(database, create_event):
+    """Bodies sent by the routes parse as their response_model, for successes and errors"""
+    event_id = create_event(pool_counts=(5,))
+    headers = {"X-User-Id": "7301"}
+
+    booked = request("POST", "/api/v1/tickets", json={"event_id": event_id, "ticket_count": 1}, headers=headers)
+    held = request("POST", "/api/v1/tickets/holds", json={"event_id": event_id, "ticket_count": 1}, headers=headers)
+    listed = request("GET", "/api/v1/tickets", headers=headers)
+    availability = request("GET", f"/api/v1/events/{event_id}/availability")
+
+    for response, model in ((booked, TicketCreateResponse), (held, TicketHoldResponse),
+                            (listed, TicketListResponse), (availability, EventAvailabilityResponse)):
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert ApiSuccessResponse[model].model_validate_json(response.content).data is not None
+    assert [ticket["status"] for ticket in listed.json()["data"]["tickets"]] == ["pending", "booked"]
+
+    refused = request("POST", "/api/v1/tickets", json={"event_id": event_id, "ticket_count": 2}, headers=headers)
+    assert refused.status_code == 400
+    assert ApiErrorResponse.model_validate_json(refused.content).success is False
+
+    # FastAPI's own validation errors go through the default ORJSONResponse.
+    invalid = request("POST", "/api/v1/tickets", json={"event_id": event_id}, headers=headers)
+    assert invalid.status_code == 422
+    assert invalid.json()["detail"][0]["loc"] == ["body", "ticket_count"]
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app.core.db import session
+from app.exceptions import ApiBaseException
+from app.models.holdings import UserEventHolding
+from app.models.tickets import Ticket
+from app.repositories.events import EventRepository
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.tickets import TicketService
+
+
+def book(event_id, user_id, ticket_count=1):
+    with session() as db:
+        service = TicketService(TicketRepository(db), booking_mode="transactional", inventory=None,
+                                availability=AvailabilityIndex(), ledger=None, event_cache=EventMetadataCache(path=""))
+        return service.book_ticket(TicketCreate(event_id=event_id, ticket_count=ticket_count), user_id)
+
+
+def pool_counts(event_id):
+    with session() as db:
+        return [pool.ticket_count for pool in EventRepository(db).get_pool_layout(event_id)]
+
+
+def state_of(event_id, user_id):
+    with session() as db:
+        held = db.execute(select(UserEventHolding.ticket_count).where(
+            UserEventHolding.user_id == user_id,
+            UserEventHolding.event_id == event_id
+        )).scalar()
+        tickets = db.execute(select(Ticket.id).where(Ticket.user_id == user_id)).all()
+    return held or 0, len(tickets)
+
+
+def test_booking_spanning_pools_commits_once(database, create_event):
+    """A booking taking seats from several pools books all of them with its allocations"""
+    event_id = create_event(pool_counts=(1, 1))
+
+    ticket = book(event_id, 9001, ticket_count=2)
+
+    assert ticket.ticket_count == 2
+    assert pool_counts(event_id) == [0, 0]
+    assert state_of(event_id, 9001) == (2, 1)
+
+
+def test_shortfall_rolls_everything_back(database, create_event):
+    """Seats and quota taken before the pools ran short are never committed"""
+    event_id = create_event(pool_counts=(1,))
+
+    with pytest.raises(ApiBaseException) as shortfall:
+        book(event_id, 9002, ticket_count=2)
+
+    assert shortfall.value.status_code == 400
+    assert pool_counts(event_id) == [1]
+    assert state_of(event_id, 9002) == (0, 0)
+
+
+def test_lock_conflict_is_retryable(database, create_event, monkeypatch):
+    """A lock wait timeout on a pool row rolls back and asks for a retry"""
+    event_id = create_event(pool_counts=(5,))
+
+    def timed_out(self, pool_id, ticket_count, commit=True):
+        raise OperationalError("UPDATE event_ticket_pools", {}, Exception(1205, "Lock wait timeout exceeded"))
+
+    monkeypatch.setattr(TicketRepository, "attempt_booking_on_pool", timed_out)
+
+    with pytest.raises(ApiBaseException) as conflict:
+        book(event_id, 9003)
+
+    assert conflict.value.status_code == 409
+    assert state_of(event_id, 9003) == (0, 0)
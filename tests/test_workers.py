@@ -0,0 +1,228 @@
+import asyncio
+
+import orjson
+import pytest
+from sqlalchemy import select, func
+
+from app.controllers.v1 import tickets as tickets_controller
+from app.core.db import session, async_session
+from app.core.responses import success_response
+from app.exceptions import ApiBaseException
+from app.main import api_exception_handler
+from app.models.tickets import Ticket
+from app.repositories.tickets import TicketRepository
+from app.schemas.tickets import TicketCreate
+from app.services.admission import AdmissionLimits, EventAdmissionController
+from app.services.availability import AvailabilityIndex
+from app.services.event_cache import EventMetadataCache
+from app.services.idempotency import IdempotencyStore, SharedIdempotencyKeys
+from app.services.resharding import PoolContentionTracker
+from app.services.tickets import TicketService
+
+
+def worker():
+    """The idempotency store of one API worker, sharing keys through the DB"""
+    return IdempotencyStore(shared=SharedIdempotencyKeys(session_factory=async_session, mode="async"))
+
+
+def booking(event_id, user_id):
+    """The idempotent call of the booking route: books and renders the response"""
+    async def book():
+        async with async_session() as db:
+            service = TicketService(TicketRepository(db), inventory=None, availability=AvailabilityIndex(),
+                                         event_cache=EventMetadataCache(path=""))
+            ticket = await service.book_ticket(TicketCreate(event_id=event_id, ticket_count=1), user_id)
+            return success_response("Ticket booked successfully", ticket)
+    return book
+
+
+def sent(response):
+    return response.status_code, dict(response.headers), response.body
+
+
+def data(response):
+    return orjson.loads(response.body)["data"]
+
+
+def tickets_of(user_id):
+    with session() as db:
+        return db.execute(select(func.count()).where(Ticket.user_id == user_id)).scalar()
+
+
+def test_retry_on_another_worker_is_replayed(database, create_event):
+    """A retry on a second worker gets the first worker's response back as it was, errors included"""
+    event_id = create_event()
+    first, second = worker(), worker()
+
+    async def refused():
+        raise ApiBaseException(message="Event sold out or does not exist", status_code=404,
+                               details={"event_id": event_id}, headers={"X-Sold-Out": "true"})
+
+    async def scenario():
+        original = await first.run((5001, "retry"), ("book", event_id, 1), booking(event_id, 5001))
+        retried = await second.run((5001, "retry"), ("book", event_id, 1), booking(event_id, 5001))
+
+        with pytest.raises(ApiBaseException) as error:
+            await first.run((5001, "refused"), ("book", event_id, 1), refused)
+        # What the client of the first worker was sent.
+        original_error = await api_exception_handler(None, error.value)
+        retried_error = await second.run((5001, "refused"), ("book", event_id, 1), booking(event_id, 5001))
+        return original, retried, original_error, retried_error
+
+    original, retried, original_error, retried_error = asyncio.run(scenario())
+
+    assert sent(retried) == sent(original)
+    assert sent(retried_error) == sent(original_error)
+    assert retried_error.headers["X-Sold-Out"] == "true"
+    assert orjson.loads(retried_error.body)["details"] == {"event_id": event_id}
+    assert tickets_of(5001) == 1
+    assert second.stats()["shared"]["replayed"] == 2
+
+
+def test_duplicate_while_running_elsewhere_must_retry(database, create_event):
+    """A duplicate reaching another worker mid-request gets a retryable 409, then the stored outcome"""
+    event_id = create_event()
+    first, second = worker(), worker()
+
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_booking():
+            started.set()
+            await release.wait()
+            return await booking(event_id, 5002)()
+
+        running = asyncio.create_task(first.run((5002, "slow"), ("book", event_id, 1), slow_booking))
+        await started.wait()
+        with pytest.raises(ApiBaseException) as conflict:
+            await second.run((5002, "slow"), ("book", event_id, 1), booking(event_id, 5002))
+        release.set()
+        original = await running
+        retried = await second.run((5002, "slow"), ("book", event_id, 1), booking(event_id, 5002))
+        return conflict.value.status_code, original, retried
+
+    status_code, original, retried = asyncio.run(scenario())
+
+    assert status_code == 409
+    assert sent(retried) == sent(original)
+    assert tickets_of(5002) == 1
+
+
+def test_key_reused_for_another_request_on_another_worker(database, create_event):
+    """The same key with a different request is rejected on every worker"""
+    event_id = create_event()
+    first, second = worker(), worker()
+
+    async def scenario():
+        await first.run((5003, "reused"), ("book", event_id, 1), booking(event_id, 5003))
+        await second.run((5003, "reused"), ("book", event_id, 2), booking(event_id, 5003))
+
+    with pytest.raises(ApiBaseException) as error:
+        asyncio.run(scenario())
+    assert error.value.status_code == 422
+
+
+def test_retryable_failure_frees_the_key(database, create_event):
+    """A 409 is not stored, so the retry on another worker books"""
+    event_id = create_event()
+    first, second = worker(), worker()
+
+    async def conflicted():
+        raise ApiBaseException(message="Booking conflicted with a concurrent request, please retry", status_code=409)
+
+    async def scenario():
+        with pytest.raises(ApiBaseException):
+            await first.run((5004, "conflict"), ("book", event_id, 1), conflicted)
+        return await second.run((5004, "conflict"), ("book", event_id, 1), booking(event_id, 5004))
+
+    assert data(asyncio.run(scenario()))["event_id"] == event_id
+    assert tickets_of(5004) == 1
+
+
+def test_workers_split_the_admission_limits():
+    """Two workers together admit the configured burst of an event, not twice as much"""
+    limits = AdmissionLimits(rate=10, burst=10, max_in_flight=0)
+    workers = [EventAdmissionController(limits, workers=2) for _ in range(2)]
+
+    admitted = 0
+    for controller in workers:
+        for _ in range(10):
+            try:
+                controller.admit(7)
+                admitted += 1
+            except ApiBaseException:
+                pass
+
+    assert admitted == 10
+
+
+def test_contention_rates_are_scaled_to_all_workers():
+    """A worker seeing a quarter of the bookings reports the rate of the whole API"""
+    single, one_of_four = PoolContentionTracker(workers=1), PoolContentionTracker(workers=4)
+    for tracker in (single, one_of_four):
+        for _ in range(10):
+            tracker.record(7, True)
+
+    events, elapsed = single.drain()
+    assert one_of_four.rate(events[7], elapsed) == pytest.approx(4 * single.rate(events[7], elapsed))
+
+
+def test_rates_below_one_per_second_still_admit():
+    """A bucket refilling slower than once a second, or a worker's share of one, still holds a token"""
+    for controller in (EventAdmissionController(AdmissionLimits(rate=0.5, max_in_flight=0), workers=1),
+                       EventAdmissionController(AdmissionLimits(rate=2, max_in_flight=0), workers=4)):
+        controller.admit(7)
+        with pytest.raises(ApiBaseException) as shed:
+            controller.admit(7)
+        assert shed.value.status_code == 429
+
+
+def test_admission_stats_list_only_the_busiest_events():
+    """stats() stays small however many events were admitted"""
+    controller = EventAdmissionController(AdmissionLimits(max_in_flight=5), workers=1)
+    for event_id in range(100):
+        controller.admit(event_id)
+        if event_id != 42:
+            controller.release(event_id)
+
+    stats = controller.stats(top=3)
+    assert stats["admitted"] == 100
+    assert stats["events_tracked"] == 100
+    assert len(stats["events"]) == 3
+    assert stats["events"][42]["in_flight"] == 1
+
+
+def test_replayed_retry_is_not_shed(monkeypatch):
+    """A retry of a finished request gets its outcome even while the event is at its limit"""
+    controller = EventAdmissionController(AdmissionLimits(max_in_flight=1), workers=1)
+    monkeypatch.setattr(tickets_controller, "booking_admission", controller)
+    monkeypatch.setattr(tickets_controller, "idempotency_store", IdempotencyStore())
+
+    async def booked():
+        return {"ticket_id": 1}
+
+    def request():
+        return tickets_controller.run_idempotent(
+            "replayed", 5005, ("book", 7, 1), "Ticket booked successfully",
+            lambda: tickets_controller.run_admitted(7, booked)
+        )
+
+    async def scenario():
+        original = await request()
+        controller.admit(7)
+        return original, await request()
+
+    original, retried = asyncio.run(scenario())
+    assert sent(retried) == sent(original)
+    assert data(retried) == {"ticket_id": 1}
+    assert controller.stats()["shed"] == 0
+
+
+def test_contention_is_not_kept_without_a_resharder():
+    """Nothing drains a disabled tracker, so it keeps no per-event counts"""
+    tracker = PoolContentionTracker(workers=1, enabled=False)
+    for event_id in range(100):
+        tracker.record(event_id, False)
+
+    assert tracker.snapshot(7) == (0.0, 0)
+    assert tracker.drain()[0] == {}